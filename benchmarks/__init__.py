@@ -0,0 +1 @@
+"""Performance benchmarks, see :mod:`benchmarks.suite`."""
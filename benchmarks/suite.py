@@ -0,0 +1,382 @@
+"""Benchmarks of the entity and system manager hot paths.
+
+Each scenario builds a world of a given number of entities, then times one
+operation on it. The best time of several repetitions is kept, so that
+results are as stable as the machine allows. Results are written as JSON and
+compared with a baseline saved beforehand on the same machine: any scenario
+slower than the baseline by more than the tolerance fails the run, and so
+does a missing baseline, unless ``--no-compare`` is given::
+
+    python -m benchmarks --save-baseline
+    ...
+    python -m benchmarks
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+import six
+
+from ecs.archetypes import ArchetypeEntityManager
+from ecs.managers import EntityManager, SystemManager
+from ecs.models import Component, System
+from ecs.pooling import pooled
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_SIZES = (10000, 100000)
+
+ENTITY_MANAGERS = {
+    'dict': EntityManager,
+    'archetype': ArchetypeEntityManager,
+}
+
+
+class Position(Component):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+
+class Velocity(Component):
+    __slots__ = ('dx', 'dy')
+
+    def __init__(self, dx=0.0, dy=0.0):
+        self.dx = dx
+        self.dy = dy
+
+
+class Health(Component):
+    __slots__ = ('points',)
+
+    def __init__(self, points=100):
+        self.points = points
+
+
+@pooled(capacity=100000)
+class Projectile(Component):
+    __slots__ = ('speed',)
+
+    def __init__(self, speed=1.0):
+        self.speed = speed
+
+
+class Movement(System):
+    def update(self, dt):
+        for _, position, velocity in self.entity_manager.query(
+                Position, Velocity):
+            position.x += velocity.dx * dt
+            position.y += velocity.dy * dt
+
+
+class Regeneration(System):
+    def update(self, dt):
+        for _, health in self.entity_manager.pairs_for_type(Health):
+            health.points += 1
+
+
+def populate(entity_manager, size):
+    """Create ``size`` entities, each with a position, every other one with
+    a velocity and every fourth one with health.
+
+    :return: the entities
+    :rtype: :class:`list` of :class:`ecs.models.Entity`
+    """
+    entities = []
+    for i in six.moves.range(size):
+        entity = entity_manager.create_entity()
+        entity_manager.add_component(entity, Position(i, i))
+        if i % 2 == 0:
+            entity_manager.add_component(entity, Velocity(1.0, 1.0))
+        if i % 4 == 0:
+            entity_manager.add_component(entity, Health())
+        entities.append(entity)
+    return entities
+
+
+# Each scenario takes an entity manager class and a size, and returns a
+# callable to time, after doing its setup.
+
+def bench_populate(manager_type, size):
+    return lambda: populate(manager_type(), size)
+
+
+def bench_bulk_populate(manager_type, size):
+    """Populate as :func:`populate` does, with the bulk APIs."""
+    def run():
+        entity_manager = manager_type()
+        entities = entity_manager.create_entities(size)
+        entity_manager.add_components_bulk(
+            Position, entities,
+            [Position(i, i) for i in six.moves.range(size)])
+        entity_manager.add_components_bulk(
+            Velocity, entities[::2],
+            [Velocity(1.0, 1.0) for _ in entities[::2]])
+        entity_manager.add_components_bulk(
+            Health, entities[::4], [Health() for _ in entities[::4]])
+    return run
+
+
+def bench_pairs_for_type(manager_type, size):
+    entity_manager = manager_type()
+    populate(entity_manager, size)
+
+    def run():
+        for _ in entity_manager.pairs_for_type(Position):
+            pass
+    return run
+
+
+def bench_query(manager_type, size):
+    entity_manager = manager_type()
+    populate(entity_manager, size)
+
+    def run():
+        for _ in entity_manager.query(Position, Velocity, Health):
+            pass
+    return run
+
+
+def bench_component_churn(manager_type, size):
+    """Add and remove a component on a tenth of the entities."""
+    entity_manager = manager_type()
+    entities = populate(entity_manager, size)[1::10]
+    add_component = entity_manager.add_component
+    remove_component = entity_manager.remove_component
+
+    def run():
+        for entity in entities:
+            add_component(entity, Health())
+        for entity in entities:
+            remove_component(entity, Health)
+    return run
+
+
+def bench_pooled_churn(manager_type, size):
+    """Add and remove a pooled component on a tenth of the entities."""
+    entity_manager = manager_type()
+    entities = populate(entity_manager, size)[1::10]
+    add_component = entity_manager.add_component
+    remove_component = entity_manager.remove_component
+    acquire = Projectile.pool.acquire
+
+    def run():
+        for entity in entities:
+            add_component(entity, acquire())
+        for entity in entities:
+            remove_component(entity, Projectile)
+    return run
+
+
+def bench_spatial_query(manager_type, size):
+    """Move a tenth of the entities and find the neighbours of as many,
+    through a spatial index.
+    """
+    entity_manager = manager_type()
+    entities = populate(entity_manager, size)[::10]
+    index = entity_manager.spatial_index(Position, cell_size=16.0)
+    modify_component = entity_manager.modify_component
+    within_radius = index.within_radius
+
+    def run():
+        for entity in entities:
+            modify_component(entity, Position).x += 1.0
+        index.refresh()
+        for entity in entities:
+            within_radius(index.position(entity), 8.0)
+    return run
+
+
+def bench_spawn_despawn(manager_type, size):
+    """Remove a tenth of the entities and spawn as many."""
+    entity_manager = manager_type()
+    entities = populate(entity_manager, size)
+    count = size // 10
+
+    def run():
+        for entity in entities[:count]:
+            entity_manager.remove_entity(entity)
+        del entities[:count]
+        entities.extend(populate(entity_manager, count))
+    return run
+
+
+def bench_remove_entity(manager_type, size):
+    entity_manager = manager_type()
+    entities = populate(entity_manager, size)
+
+    def run():
+        for entity in entities:
+            entity_manager.remove_entity(entity)
+    return run
+
+
+def bench_system_update(manager_type, size):
+    entity_manager = manager_type()
+    populate(entity_manager, size)
+    system_manager = SystemManager(entity_manager)
+    system_manager.add_system(Movement())
+    system_manager.add_system(Regeneration())
+    return lambda: system_manager.update(1.0 / 60)
+
+
+SCENARIOS = (
+    ('populate', bench_populate),
+    ('bulk_populate', bench_bulk_populate),
+    ('pairs_for_type', bench_pairs_for_type),
+    ('query', bench_query),
+    ('component_churn', bench_component_churn),
+    ('pooled_churn', bench_pooled_churn),
+    ('spatial_query', bench_spatial_query),
+    ('spawn_despawn', bench_spawn_despawn),
+    ('remove_entity', bench_remove_entity),
+    ('system_update', bench_system_update),
+)
+
+# Scenarios which consume their world, and so need a new one for each run.
+_DESTRUCTIVE = ('remove_entity',)
+
+
+def time_scenario(scenario, manager_type, size, repeat):
+    """Return the best time of ``repeat`` runs of a scenario.
+
+    :rtype: :class:`float`
+    """
+    name, bench = scenario
+    times = []
+    run = None
+    for _ in six.moves.range(repeat):
+        if run is None or name in _DESTRUCTIVE:
+            run = bench(manager_type, size)
+        times.append(timeit.timeit(run, number=1))
+    return min(times)
+
+
+def run_benchmarks(manager_names, sizes, repeat, only=None, out=None):
+    """Run the scenarios for each entity manager and world size.
+
+    :param manager_names: keys of :data:`ENTITY_MANAGERS`
+    :type manager_names: iterable of :class:`str`
+    :param sizes: numbers of entities
+    :type sizes: iterable of :class:`int`
+    :param repeat: number of runs of each scenario, the best one being kept
+    :type repeat: :class:`int`
+    :param only: names of the scenarios to run, by default all
+    :type only: iterable of :class:`str`
+    :param out: file to which progress is written, if any
+    :type out: file-like object
+    :return: mapping of ``'manager/scenario/size'`` to time in seconds
+    :rtype: :class:`dict`
+    """
+    results = {}
+    for manager_name in manager_names:
+        for size in sizes:
+            for scenario in SCENARIOS:
+                if only and scenario[0] not in only:
+                    continue
+                key = '{0}/{1}/{2}'.format(manager_name, scenario[0], size)
+                results[key] = time_scenario(
+                    scenario, ENTITY_MANAGERS[manager_name], size, repeat)
+                if out is not None:
+                    print('{0:<40} {1:10.6f} s'.format(key, results[key]),
+                          file=out)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the scenarios slower than in the baseline by more than the
+    tolerance. Scenarios missing from either side are ignored.
+
+    :param results: results of :func:`run_benchmarks`
+    :type results: :class:`dict`
+    :param baseline: results of a previous run
+    :type baseline: :class:`dict`
+    :param tolerance: allowed slowdown, as a fraction of the baseline time
+    :type tolerance: :class:`float`
+    :return: ``(key, baseline time, time)`` tuples, sorted by key
+    :rtype: :class:`list`
+    """
+    return [(key, baseline[key], results[key]) for key in sorted(results)
+            if key in baseline and
+            results[key] > baseline[key] * (1 + tolerance)]
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark the entity and system managers.')
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+        help='numbers of entities, e.g. 10000 100000 1000000')
+    parser.add_argument(
+        '--managers', nargs='+', choices=sorted(ENTITY_MANAGERS),
+        default=sorted(ENTITY_MANAGERS), help='entity managers to benchmark')
+    parser.add_argument(
+        '--only', nargs='+', choices=[name for name, _ in SCENARIOS],
+        help='scenarios to run')
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help='runs of each scenario, the best one being kept')
+    parser.add_argument('--output', help='file to write the results to')
+    parser.add_argument(
+        '--baseline', default=DEFAULT_BASELINE,
+        help='results to compare with (default: %(default)s)')
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help='store the results as the new baseline instead of comparing')
+    parser.add_argument(
+        '--no-compare', action='store_true',
+        help='only run the benchmarks, without a baseline')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2,
+        help='allowed slowdown relative to the baseline (default: '
+             '%(default)s)')
+    return parser.parse_args(argv)
+
+
+def _dump(path, results):
+    with open(path, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line.
+
+    :return: exit code, 1 if a scenario regressed, 2 if there is no
+        baseline to compare with
+    :rtype: :class:`int`
+    """
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    results = run_benchmarks(
+        args.managers, args.sizes, args.repeat, args.only, sys.stdout)
+    if args.output:
+        _dump(args.output, results)
+    if args.save_baseline:
+        _dump(args.baseline, results)
+        print('Baseline saved to {0}'.format(args.baseline))
+        return 0
+    if args.no_compare:
+        return 0
+    if not os.path.exists(args.baseline):
+        print('No baseline at {0}; run with --save-baseline to store one, '
+              'or with --no-compare.'.format(args.baseline), file=sys.stderr)
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.tolerance)
+    for key, baseline_time, time in regressions:
+        print('REGRESSION {0}: {1:.6f} s, baseline {2:.6f} s ({3:+.0%})'
+              .format(key, time, baseline_time, time / baseline_time - 1),
+              file=sys.stderr)
+    return 1 if regressions else 0
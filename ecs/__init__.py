@@ -2,8 +2,9 @@
 
 from ecs import metadata as _metadata
 # Provide a common namespace for these classes.
-from ecs.models import Entity, Component, System  # NOQA
+from ecs.models import Entity, Component, System, slotted  # NOQA
 from ecs.managers import EntityManager, SystemManager  # NOQA
+from ecs.archetypes import ArchetypeEntityManager  # NOQA
 
 
 __version__ = _metadata.version
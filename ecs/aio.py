@@ -0,0 +1,179 @@
+"""System manager integrated with an :mod:`asyncio` event loop.
+
+:class:`AsyncSystemManager` runs a frame without blocking the event loop for
+its whole duration: :class:`AsyncSystem` instances may await I/O, and other
+systems run on an executor while the loop keeps handling network traffic.
+Its :meth:`AsyncSystemManager.run` method ticks at a fixed rate:
+
+.. code-block:: python
+
+    system_manager = AsyncSystemManager(entity_manager)
+    system_manager.add_system(Movement())
+    system_manager.add_system(Persistence())  # an AsyncSystem
+    system_manager.add_system(Input(), offload=False)
+    loop.create_task(system_manager.run(rate=30))
+
+Systems still run one after another, in priority order, so the entity
+manager is never used by two systems at once. It is not thread-safe though,
+so while a frame is running, coroutines outside of the systems must not use
+it directly but record their changes in
+:attr:`ecs.managers.SystemManager.commands`.
+
+Profiling only times the systems which aren't :class:`AsyncSystem`
+instances, and not the frames as a whole. This module requires Python 3.5
+or later.
+"""
+
+import asyncio
+from abc import abstractmethod
+
+from ecs.commands import SYNC_SYSTEM
+from ecs.managers import SystemManager
+from ecs.models import System
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except AttributeError:  # Python < 3.7
+        return asyncio.get_event_loop()
+
+
+class AsyncSystem(System):
+    """System whose :meth:`update` is a coroutine, run on the event loop by
+    an :class:`AsyncSystemManager`. The next system only runs once it is
+    done.
+    """
+    @abstractmethod
+    async def update(self, dt):
+        """Run the system for this frame.
+
+        :param dt: delta time, or elapsed time for this frame
+        :type dt: :class:`float`
+        """
+
+
+class AsyncSystemManager(SystemManager):
+    """System manager whose frames are run by the :meth:`update_async`
+    coroutine. :class:`AsyncSystem` instances are awaited, other systems are
+    run on an executor unless added with ``offload=False``.
+    """
+    _runs_coroutines = True
+
+    def __init__(self, entity_manager, executor=None, sync=SYNC_SYSTEM):
+        """:param entity_manager: this manager's entity manager
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param executor: executor on which to run offloaded systems, by
+            default the event loop's default executor
+        :type executor: :class:`concurrent.futures.Executor`
+        :param sync: when the commands recorded in :attr:`commands` are
+            applied, one of :data:`ecs.commands.SYNC_POINTS`
+        :type sync: :class:`str`
+        """
+        super(AsyncSystemManager, self).__init__(entity_manager, sync)
+        self._executor = executor
+        # Systems run on the event loop's thread.
+        self._inline = set()
+        self._running = False
+
+    def add_system(self, system_instance, priority=0, offload=True,
+                   **schedule):
+        """Add a :class:`ecs.models.System` instance to the manager. See
+        :meth:`ecs.managers.SystemManager.add_system`.
+
+        :param offload: whether a system which isn't an :class:`AsyncSystem`
+            runs on the executor, which is worth it unless it is quick
+        :type offload: :class:`bool`
+        """
+        super(AsyncSystemManager, self).add_system(
+            system_instance, priority, **schedule)
+        if not offload or isinstance(system_instance, AsyncSystem):
+            self._inline.add(system_instance)
+
+    def remove_system(self, system_type):
+        """Tell the manager to no longer run the system of this type."""
+        self._inline.discard(self._system_types.get(system_type))
+        super(AsyncSystemManager, self).remove_system(system_type)
+
+    def update(self, dt):
+        """Not supported, since it can't await the :class:`AsyncSystem`
+        instances; run frames with :meth:`update_async` instead.
+
+        :raises: :class:`TypeError` always
+        """
+        raise TypeError('AsyncSystemManager frames are run by update_async()')
+
+    async def update_async(self, dt):
+        """Run each system's ``update()`` method for this frame, in the same
+        order and with the same sync points as
+        :meth:`ecs.managers.SystemManager.update` would, yielding to the event
+        loop while offloaded systems run and while async systems await.
+
+        :param dt: delta time, or elapsed time for this frame
+        :type dt: :class:`float`
+        """
+        loop = _running_loop()
+        executor = self._executor
+        commands = self._commands
+        sync_points = self._sync_points
+        schedules = self._schedules
+        inline = self._inline
+        disabled = self._disabled
+        self._frame += 1
+        for system in list(self._systems):
+            if system in disabled:
+                continue
+            schedule = schedules.get(system)
+            steps = (dt,) if schedule is None else schedule.plan(dt)
+            for step in steps:
+                if isinstance(system, AsyncSystem):
+                    # Bypass the profiler, whose wrappers can't time
+                    # coroutines.
+                    await type(system).update(system, step)
+                    continue
+                # Looked up on each run, since profiling replaces it.
+                update = system.update
+                if system in inline:
+                    update(step)
+                else:
+                    await loop.run_in_executor(executor, update, step)
+            if commands and system in sync_points:
+                commands.flush()
+
+    async def run(self, rate, max_frames=None):
+        """Run frames at a fixed rate until :meth:`stop` is called, or the
+        task is cancelled. Each frame is given the time elapsed since the
+        previous one. When a frame overruns its period, the next one starts
+        right away, and the schedule restarts from there rather than running
+        the missed frames in a burst.
+
+        :param rate: number of frames per second
+        :type rate: :class:`float`
+        :param max_frames: number of frames after which to stop, by default
+            unlimited
+        :type max_frames: :class:`int`
+        """
+        loop = _running_loop()
+        period = 1.0 / rate
+        self._running = True
+        frames = 0
+        next_frame = previous = loop.time()
+        try:
+            while self._running and (
+                    max_frames is None or frames < max_frames):
+                now = loop.time()
+                await self.update_async(now - previous)
+                previous = now
+                frames += 1
+                next_frame += period
+                delay = next_frame - loop.time()
+                if delay < 0:
+                    next_frame -= delay
+                    delay = 0
+                await asyncio.sleep(delay)
+        finally:
+            self._running = False
+
+    def stop(self):
+        """Make :meth:`run` return once the current frame is done."""
+        self._running = False
@@ -0,0 +1,601 @@
+"""Entity manager grouping entities into tables by component signature."""
+
+from itertools import chain
+
+import six
+
+from ecs.columns import ColumnarComponent, ColumnProxy
+from ecs.exceptions import (
+    NonexistentComponentTypeForEntity, StaleEntityError)
+from ecs.managers import EntityManager, _fill_table
+
+
+class Archetype(object):
+    """Table holding the components of all entities which possess exactly the
+    same set of component types. Components are stored in one list per type,
+    with one row per entity, and rows are kept dense: removing an entity
+    moves the last row into its place.
+    """
+    __slots__ = ('component_types', 'entities', 'columns', '_rows', '_edges')
+
+    def __init__(self, component_types):
+        """:param component_types: component types of the entities
+        :type component_types: :class:`frozenset` of :class:`type`
+        """
+        self.component_types = component_types
+        """The component types of this archetype."""
+        self.entities = []
+        """The entities of this archetype, in row order."""
+        self.columns = dict((type_, []) for type_ in component_types)
+        """Mapping of component type to the list of its components, in row
+        order."""
+        self._rows = {}
+        # Archetype reached by adding, or removing, a component type. Cached
+        # to avoid building a set each time an entity moves.
+        self._edges = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, entity):
+        return entity in self._rows
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, ', '.join(
+            sorted(type_.__name__ for type_ in self.component_types)))
+
+    def get(self, entity, component_type):
+        """Return the component of ``component_type`` in the entity's row."""
+        return self.columns[component_type][self._rows[entity]]
+
+    def set(self, entity, component_instance):
+        """Replace a component in the entity's row."""
+        self.columns[type(component_instance)][self._rows[entity]] = (
+            component_instance)
+
+    def append(self, entity, components):
+        """Add a row for the entity.
+
+        :param components: mapping of each component type of this archetype
+            to the entity's component
+        :type components: :class:`dict`
+        """
+        self._rows[entity] = len(self.entities)
+        self.entities.append(entity)
+        for component_type, column in six.iteritems(self.columns):
+            column.append(components[component_type])
+
+    def extend(self, entities, columns):
+        """Add a row for each entity.
+
+        :param entities: entities which are not in this archetype
+        :type entities: :class:`list` of :class:`ecs.models.Entity`
+        :param columns: mapping of each component type of this archetype to
+            the list of the entities' components
+        :type columns: :class:`dict`
+        """
+        start = len(self.entities)
+        self._rows.update(six.moves.zip(
+            entities, six.moves.range(start, start + len(entities))))
+        self.entities.extend(entities)
+        for component_type, column in six.iteritems(self.columns):
+            column.extend(columns[component_type])
+
+    def pop(self, entity):
+        """Remove the entity's row.
+
+        :return: mapping of each component type of this archetype to the
+            entity's component
+        :rtype: :class:`dict`
+        """
+        row = self._rows.pop(entity)
+        last_entity = self.entities.pop()
+        components = {}
+        if row == len(self.entities):
+            for component_type, column in six.iteritems(self.columns):
+                components[component_type] = column.pop()
+        else:
+            self.entities[row] = last_entity
+            self._rows[last_entity] = row
+            for component_type, column in six.iteritems(self.columns):
+                components[component_type] = column[row]
+                column[row] = column.pop()
+        return components
+
+
+class ArchetypeView(object):
+    """Persistent query results of an :class:`ArchetypeEntityManager`. It
+    holds the archetypes matching the query, which the manager extends when
+    new archetypes are created, so iterating over it walks the matching
+    tables linearly. Views are not to be instantiated directly; use
+    :meth:`ArchetypeEntityManager.view` instead.
+    """
+    __slots__ = ('_component_types', '_archetypes', '__weakref__')
+
+    def __init__(self, component_types, archetypes):
+        """:param component_types: types of the components in each row
+        :type component_types: :class:`tuple` of :class:`type`
+        :param archetypes: archetypes currently matching the query
+        :type archetypes: :class:`list` of :class:`Archetype`
+        """
+        self._component_types = component_types
+        self._archetypes = archetypes
+
+    @property
+    def component_types(self):
+        """Get the component types of this view.
+
+        :return: component types, in row order
+        :rtype: :class:`tuple` of :class:`type`
+        """
+        return self._component_types
+
+    def __iter__(self):
+        """Return an iterator over ``(entity, component_instance, ...)``
+        tuples, as :meth:`ArchetypeEntityManager.query` does, on a snapshot
+        of the matching rows.
+        """
+        return _iter_archetypes(self._archetypes, self._component_types)
+
+    def __len__(self):
+        return sum(len(archetype) for archetype in self._archetypes)
+
+    def __contains__(self, entity):
+        return any(entity in archetype for archetype in self._archetypes)
+
+    def __repr__(self):
+        return '{0}({1})'.format(
+            type(self).__name__,
+            ', '.join(type_.__name__ for type_ in self._component_types))
+
+    def _archetype_added(self, archetype):
+        if archetype.component_types.issuperset(self._component_types):
+            self._archetypes.append(archetype)
+
+
+def _iter_archetypes(archetypes, component_types):
+    # The rows are copied up front: entities moved between archetypes while
+    # iterating would otherwise be skipped or visited twice.
+    return chain.from_iterable([
+        six.moves.zip(list(archetype.entities), *[
+            list(archetype.columns[type_]) for type_ in component_types])
+        for archetype in archetypes])
+
+
+class ArchetypeEntityManager(EntityManager):
+    """Entity manager with the same public API as :class:`EntityManager`,
+    which groups entities by their exact set of component types into
+    :class:`Archetype` tables. Adding or removing a component moves the
+    entity's row to another archetype, which makes these operations somewhat
+    slower. In exchange, queries walk the rows of the matching archetypes
+    linearly instead of probing one dictionary per component type, which
+    pays off for systems touching several component types.
+
+    Query results are computed from a snapshot of the matching rows taken
+    when iteration starts, so components may be added and removed while
+    iterating; the changes are not reflected by the ongoing iteration.
+
+    Columnar components (see :mod:`ecs.columns`) are kept in column stores
+    aligned on entity indices, as :class:`EntityManager` does, and the
+    archetypes hold proxies on their rows.
+    """
+    def __init__(self):
+        # Archetypes replace the database and reverse indices of
+        # EntityManager, so only its entity allocation state is set up.
+        self._init_entities()
+        self._archetypes = {}
+        self._archetypes_by_type = {}
+        self._entity_archetypes = {}
+        self._column_stores = {}
+
+    @property
+    def database(self):
+        """Get a copy of this manager's components, in the format of
+        :attr:`EntityManager.database`. It is built on each access, in time
+        proportional to the number of components of the whole world, so it
+        should only be used for debugging or serialization. Modifying it
+        does not affect the manager.
+
+        :return: the database
+        :rtype: :class:`dict`
+        """
+        database = {}
+        for archetype in six.itervalues(self._archetypes):
+            if not archetype.entities:
+                continue
+            for component_type, column in six.iteritems(archetype.columns):
+                database.setdefault(component_type, {}).update(
+                    six.moves.zip(archetype.entities, column))
+        return database
+
+    @property
+    def archetypes(self):
+        """Get the archetypes created so far. Direct modification is not
+        permitted.
+
+        :rtype: iterable of :class:`Archetype`
+        """
+        return six.itervalues(self._archetypes)
+
+    def _archetype(self, component_types):
+        try:
+            return self._archetypes[component_types]
+        except KeyError:
+            pass
+        archetype = self._archetypes[component_types] = Archetype(
+            component_types)
+        for component_type in component_types:
+            self._archetypes_by_type.setdefault(
+                component_type, []).append(archetype)
+            self._register_pool(component_type)
+        for view in list(self._views.values()):
+            view._archetype_added(archetype)
+        return archetype
+
+    def _neighbour(self, archetype, component_type):
+        """Return the archetype reached from ``archetype`` by adding or
+        removing ``component_type``, or ``None`` if there are no component
+        types left.
+        """
+        try:
+            return archetype._edges[component_type]
+        except KeyError:
+            pass
+        if component_type in archetype.component_types:
+            component_types = archetype.component_types.difference(
+                [component_type])
+        else:
+            component_types = archetype.component_types.union(
+                [component_type])
+        neighbour = archetype._edges[component_type] = (
+            self._archetype(component_types) if component_types else None)
+        return neighbour
+
+    def add_component(self, entity, component_instance):
+        """Add a component to the database and associate it with the given
+        entity. Unless the entity already has a component of the same type,
+        which is then replaced, the entity is moved to another archetype.
+
+        :param entity: entity to associate
+        :type entity: :class:`ecs.models.Entity`
+        :param component_instance: component to add to the entity
+        :type component_instance: :class:`ecs.models.Component`
+        :raises: :exc:`ecs.exceptions.StaleEntityError` when the entity is
+            not alive
+        """
+        if not self.is_alive(entity):
+            raise StaleEntityError(entity)
+        component_type = type(component_instance)
+        columnar = isinstance(
+            component_instance, (ColumnarComponent, ColumnProxy))
+        if columnar and isinstance(component_instance, ColumnProxy):
+            component_type = component_instance._store.component_type
+        previous = None
+        if component_type in self._remove_hooks:
+            previous = self._replaced_components(component_type, (entity,))
+        if columnar:
+            component_type, component_instance = self._store_columnar(
+                entity, component_instance)
+        self._place(entity, component_type, component_instance, columnar)
+        if previous:
+            self._call_replaced_hooks(component_type, previous)
+        if component_type in self._add_hooks:
+            self._call_add_hooks(entity, component_type)
+
+    def _place(self, entity, component_type, component_instance, columnar):
+        """Put a component in the entity's row, moving the entity to another
+        archetype unless it already has a component of the same type.
+        """
+        archetype = self._entity_archetypes.get(entity)
+        replaced = (archetype is not None and
+                    component_type in archetype.component_types)
+        if archetype is None:
+            archetype = self._archetype(frozenset([component_type]))
+            archetype.append(entity, {component_type: component_instance})
+            self._entity_archetypes[entity] = archetype
+        elif replaced:
+            # The proxy of a columnar component is already in place.
+            if not columnar:
+                archetype.set(entity, component_instance)
+        else:
+            components = archetype.pop(entity)
+            components[component_type] = component_instance
+            archetype = self._neighbour(archetype, component_type)
+            archetype.append(entity, components)
+            self._entity_archetypes[entity] = archetype
+        changes = self._changes.get(component_type)
+        if changes is not None:
+            self._record_addition(changes, entity, replaced)
+
+    def add_components_bulk(self, component_type, entities, instances=None,
+                            columns=None):
+        """Add components of one type to many entities at once. Entities
+        without components are appended to their archetype in one go. See
+        :meth:`EntityManager.add_components_bulk`.
+
+        :param component_type: type of the added components
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param entities: entities to associate, each with one component
+        :type entities: iterable of :class:`ecs.models.Entity`
+        :param instances: components of ``component_type``, one per entity
+        :type instances: iterable of :class:`ecs.models.Component`
+        :param columns: for a columnar type, mapping of field name to the
+            values of the field, one per entity, or a single value for all
+        :type columns: :class:`dict`
+        :raises: :exc:`ecs.exceptions.StaleEntityError` when one of the
+            entities is not alive, in which case no component is added
+        """
+        entities = list(entities)
+        self._check_alive(entities)
+        previous = None
+        if component_type in self._remove_hooks:
+            previous = self._replaced_components(component_type, entities)
+        columnar = issubclass(component_type, ColumnarComponent)
+        instances = self._bulk_instances(
+            component_type, entities, instances, columns)
+        # Entities without components, by entity so that only the last
+        # component given for an entity is kept.
+        new_entities = {}
+        for entity, component_instance in six.moves.zip(entities, instances):
+            if entity in self._entity_archetypes:
+                self._place(
+                    entity, component_type, component_instance, columnar)
+            else:
+                new_entities[entity] = component_instance
+        if new_entities:
+            self._record_additions(
+                self._changes.get(component_type), new_entities, ())
+            archetype = self._archetype(frozenset([component_type]))
+            archetype.extend(
+                list(new_entities), {component_type: list(
+                    six.itervalues(new_entities))})
+            self._entity_archetypes.update(
+                dict.fromkeys(new_entities, archetype))
+        if previous:
+            self._call_replaced_hooks(component_type, previous)
+        if component_type in self._add_hooks:
+            self._call_bulk_add_hooks(component_type, entities)
+
+    def _bulk_instances(self, component_type, entities, instances, columns):
+        """Check the components given to :meth:`add_components_bulk`, and
+        write those of a columnar type to its column store.
+
+        :return: the components, as proxies for a columnar type
+        :rtype: :class:`list`
+        """
+        if issubclass(component_type, ColumnarComponent):
+            store = self._column_stores.get(component_type)
+            created = store is None
+            if created:
+                store = self._column_stores[component_type] = (
+                    self._new_table(component_type))
+            try:
+                _fill_table(
+                    store, component_type, entities, instances, columns)
+            except Exception:
+                if created:
+                    del self._column_stores[component_type]
+                raise
+            return [store[entity] for entity in entities]
+        if columns is not None:
+            raise TypeError('{0} is not a columnar component type'.format(
+                component_type.__name__))
+        instances = list(instances)
+        if len(instances) != len(entities):
+            raise ValueError('{0} entities given for {1} components'.format(
+                len(entities), len(instances)))
+        return instances
+
+    def _store_columnar(self, entity, component_instance):
+        """Write a columnar component, or the values of a proxy, to the
+        column store of its type.
+
+        :return: the component type and a proxy on the entity's row
+        :rtype: :class:`tuple`
+        """
+        if isinstance(component_instance, ColumnProxy):
+            component_type = component_instance._store.component_type
+        else:
+            component_type = type(component_instance)
+        store = self._column_stores.get(component_type)
+        created = store is None
+        if created:
+            store = self._column_stores[component_type] = self._new_table(
+                component_type)
+        try:
+            store[entity] = component_instance
+        except Exception:
+            if created:
+                del self._column_stores[component_type]
+            raise
+        return component_type, store[entity]
+
+    def _remove_columnar(self, entity, component_type):
+        store = self._column_stores.get(component_type)
+        if store is not None:
+            del store[entity]
+
+    def remove_component(self, entity, component_type):
+        """Remove the component of ``component_type`` associated with
+        entity from the database, moving the entity to another archetype.
+        See :meth:`EntityManager.remove_component`.
+
+        :param entity: entity to associate
+        :type entity: :class:`ecs.models.Entity`
+        :param component_type: component type to remove from the entity
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        """
+        if component_type in self._remove_hooks:
+            self._call_remove_hooks(entity, component_type)
+        archetype = self._entity_archetypes.get(entity)
+        if (archetype is None or
+                component_type not in archetype.component_types):
+            return
+        components = archetype.pop(entity)
+        del components[component_type]
+        self._remove_columnar(entity, component_type)
+        self._record_removal(entity, component_type)
+        archetype = self._neighbour(archetype, component_type)
+        if archetype is None:
+            del self._entity_archetypes[entity]
+        else:
+            archetype.append(entity, components)
+            self._entity_archetypes[entity] = archetype
+
+    def pairs_for_type(self, component_type):
+        """Return an iterator over ``(entity, component_instance)`` tuples for
+        all entities in the database possessing a component of
+        ``component_type``. See :meth:`EntityManager.pairs_for_type`.
+
+        :param component_type: a type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :return: iterator on ``(entity, component_instance)`` tuples
+        :rtype: :class:`iter` on
+            (:class:`ecs.models.Entity`, :class:`ecs.models.Component`)
+        """
+        return _iter_archetypes(
+            self._archetypes_by_type.get(component_type, ()),
+            (component_type,))
+
+    def query(self, *component_types):
+        """Return an iterator over ``(entity, component_instance, ...)``
+        tuples for all entities in the database possessing a component of
+        every one of ``component_types``, walking the matching archetypes.
+        See :meth:`EntityManager.query`.
+
+        :param component_types: types of created components
+        :type component_types: :class:`type` which is :class:`Component`
+            subclass
+        :return: iterator on ``(entity, component_instance, ...)`` tuples
+        :rtype: :class:`iter` on
+            (:class:`ecs.models.Entity`, :class:`ecs.models.Component`, ...)
+        """
+        return _iter_archetypes(
+            self._matching_archetypes(component_types), component_types)
+
+    def _matching_archetypes(self, component_types):
+        if not component_types:
+            return []
+        try:
+            candidates = min(
+                (self._archetypes_by_type[type_] for type_ in component_types),
+                key=len)
+        except KeyError:
+            return []
+        return [archetype for archetype in candidates
+                if archetype.component_types.issuperset(component_types)]
+
+    def view(self, *component_types):
+        """Return a persistent view over the results of :meth:`query` for
+        ``component_types``. See :meth:`EntityManager.view`.
+
+        :param component_types: types of created components
+        :type component_types: :class:`type` which is :class:`Component`
+            subclass
+        :return: view on ``(entity, component_instance, ...)`` tuples
+        :rtype: :class:`ArchetypeView`
+        """
+        try:
+            return self._views[component_types]
+        except KeyError:
+            pass
+        view = self._views[component_types] = ArchetypeView(
+            component_types, self._matching_archetypes(component_types))
+        return view
+
+    def columns(self, component_type):
+        """Return the column store of a columnar component type. See
+        :meth:`EntityManager.columns`.
+
+        :param component_type: a type of columnar component
+        :type component_type: :class:`type` which is
+            :class:`ecs.columns.ColumnarComponent` subclass
+        :return: column store of ``component_type``
+        :rtype: :class:`ecs.columns.ComponentColumns`
+        :raises: :exc:`TypeError` when ``component_type`` is not columnar
+        """
+        if not issubclass(component_type, ColumnarComponent):
+            raise TypeError('{0} is not a columnar component type'.format(
+                component_type.__name__))
+        store = self._column_stores.get(component_type)
+        if store is None:
+            store = self._new_table(component_type)
+        store.reserve(self._next_index)
+        return store
+
+    def component_for_entity(self, entity, component_type):
+        """Return the instance of ``component_type`` for the entity from the
+        database.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :param component_type: a type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :return: component instance
+        :rtype: :class:`ecs.models.Component`
+        :raises: :exc:`NonexistentComponentTypeForEntity` when
+            ``component_type`` does not exist on the given entity
+        """
+        try:
+            return self._entity_archetypes[entity].get(entity, component_type)
+        except KeyError:
+            raise NonexistentComponentTypeForEntity(
+                entity, component_type)
+
+    def components_for_entity(self, entity):
+        """Return all component instances associated with the entity.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :return: component instances, or an empty tuple if the entity has no
+            components
+        :rtype: :class:`tuple` of :class:`ecs.models.Component`
+        """
+        archetype = self._entity_archetypes.get(entity)
+        if archetype is None:
+            return ()
+        return tuple(
+            archetype.get(entity, component_type)
+            for component_type in archetype.component_types)
+
+    def has_component(self, entity, component_type):
+        """Return whether the entity has a component of ``component_type``.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :param component_type: a type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :rtype: :class:`bool`
+        """
+        archetype = self._entity_archetypes.get(entity)
+        return (archetype is not None and
+                component_type in archetype.component_types)
+
+    def remove_entity(self, entity):
+        """Remove the entity's row from its archetype, and release its index
+        for reuse by :meth:`create_entity`.
+
+        :param entity: entity to remove
+        :type entity: :class:`ecs.models.Entity`
+        """
+        remove_hooks = self._remove_hooks
+        if remove_hooks and entity in self._entity_archetypes:
+            for component_type in (
+                    self._entity_archetypes[entity].component_types):
+                if component_type in remove_hooks:
+                    self._call_remove_hooks(entity, component_type)
+        archetype = self._entity_archetypes.pop(entity, None)
+        if archetype is not None:
+            archetype.pop(entity)
+            if self._column_stores:
+                for component_type in archetype.component_types:
+                    self._remove_columnar(entity, component_type)
+            if self._changes:
+                for component_type in archetype.component_types:
+                    self._record_removal(entity, component_type)
+        self._release_entity(entity)
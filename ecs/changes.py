@@ -0,0 +1,112 @@
+"""Tracking of the components added, changed and removed over time.
+
+An entity manager only tracks the component types for which
+:meth:`ecs.managers.EntityManager.track_changes` was called; other types
+cost nothing. Each change is stamped with the manager's
+:attr:`ecs.managers.EntityManager.change_tick`, so that a system which keeps
+the tick of its last run only visits what happened since:
+
+.. code-block:: python
+
+    class RenderSync(System):
+        def __init__(self):
+            super(RenderSync, self).__init__()
+            self.last_tick = 0
+
+        def update(self, dt):
+            entity_manager = self.entity_manager
+            for entity in entity_manager.removed(Sprite, self.last_tick):
+                pass # destroy the entity's sprite
+            for entity in entity_manager.added(Sprite, self.last_tick):
+                pass # create it
+            for entity in entity_manager.changed(Sprite, self.last_tick):
+                pass # update it
+            self.last_tick = entity_manager.change_tick
+
+Replacing a component with :meth:`ecs.managers.EntityManager.add_component`
+counts as a change. Components modified in place are not noticed, so systems
+modifying them call :meth:`ecs.managers.EntityManager.mark_changed`, or get
+them from :meth:`ecs.managers.EntityManager.modify_component`, which marks
+them changed.
+"""
+
+try:
+    from collections import OrderedDict
+except ImportError:  # Python 2.6
+    from ordereddict import OrderedDict
+
+import six
+
+
+class ChangeLog(object):
+    """Changes to the components of one type. Each entity appears at most
+    once in each of the added, changed and removed logs, stamped with the
+    tick of its latest change, and the logs are kept in tick order, so
+    reading the changes since a tick only visits those changes.
+    """
+    __slots__ = ('_added', '_changed', '_removed')
+
+    def __init__(self):
+        self._added = OrderedDict()
+        self._changed = OrderedDict()
+        self._removed = OrderedDict()
+
+    def __len__(self):
+        return len(self._added) + len(self._changed) + len(self._removed)
+
+    def record_added(self, entity, tick):
+        """Record that the entity was given a component it didn't have."""
+        self._removed.pop(entity, None)
+        self._changed.pop(entity, None)
+        self._added.pop(entity, None)
+        self._added[entity] = tick
+
+    def record_changed(self, entity, tick):
+        """Record that the entity's component was replaced or modified."""
+        self._changed.pop(entity, None)
+        self._changed[entity] = tick
+
+    def record_removed(self, entity, tick):
+        """Record that the entity's component was removed, forgetting its
+        addition and changes.
+        """
+        self._added.pop(entity, None)
+        self._changed.pop(entity, None)
+        self._removed[entity] = tick
+
+    def added(self, since):
+        """Return the entities given a component after tick ``since``, which
+        still have it, in order of addition.
+        """
+        return _since(self._added, since)
+
+    def changed(self, since):
+        """Return the entities whose component changed after tick ``since``,
+        in order of their latest change.
+        """
+        return _since(self._changed, since)
+
+    def removed(self, since):
+        """Return the entities whose component was removed after tick
+        ``since``, and which haven't been given one again.
+        """
+        return _since(self._removed, since)
+
+    def discard(self, until):
+        """Forget the changes made up to tick ``until``."""
+        for log in (self._added, self._changed, self._removed):
+            while log:
+                entity, tick = next(six.iteritems(log))
+                if tick > until:
+                    break
+                del log[entity]
+
+
+def _since(log, since):
+    entities = []
+    for entity in reversed(log):
+        if log[entity] <= since:
+            break
+        entities.append(entity)
+    entities.reverse()
+    return entities
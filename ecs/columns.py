@@ -0,0 +1,441 @@
+"""Struct-of-arrays storage for components, backed by NumPy columns.
+
+Components deriving from :class:`ColumnarComponent` are not stored as Python
+objects by the entity manager. Each of their fields is instead packed into a
+NumPy array, with one row per entity, so that systems may update all of them
+at once with vectorized expressions:
+
+.. code-block:: python
+
+    class Position(ColumnarComponent):
+        fields = (('x', 'f8'), ('y', 'f8'))
+
+    positions = entity_manager.columns(Position)
+    velocities = entity_manager.columns(Velocity)
+    ...
+    positions.column('x')[:] += velocities.column('dx') * dt
+
+Row ``i`` of every column holds the component of the entity whose index is
+``i``, so the columns of different types line up. Rows of entities lacking a
+component are zero, which the example above relies on for entities without a
+velocity; :attr:`ComponentColumns.mask` tells which rows are occupied. As
+entity indices are reused, the columns stay about as long as the largest
+number of entities alive at once.
+
+NumPy is only required once a columnar component is added to an entity
+manager. Column stores may also be moved to shared memory, see
+:meth:`ComponentColumns.share`, so that other processes can work on them.
+"""
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+
+import weakref
+
+import six
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # Python < 3.8
+    SharedMemory = None
+
+from ecs.models import Component
+
+
+class ColumnarComponent(Component):
+    """Class from which components stored in packed columns should derive.
+    Subclasses declare their fields in :attr:`fields`. Instances are only
+    used to carry the initial values of a component; once added to an entity
+    manager, the component is accessed through a :class:`ColumnProxy`.
+    """
+    fields = ()
+    """Sequence of ``(name, dtype)`` pairs, where ``dtype`` is anything
+    accepted by :class:`numpy.dtype`."""
+
+    @staticmethod
+    def storage(component_type):
+        return ComponentColumns(component_type)
+
+    def __init__(self, *args, **kwargs):
+        """Field values may be given positionally, in the order of
+        :attr:`fields`, or by name. Missing fields default to zero.
+        """
+        names = [name for name, _ in self.fields]
+        if len(args) > len(names):
+            raise TypeError('{0} takes at most {1} field values'.format(
+                type(self).__name__, len(names)))
+        values = dict(zip(names, args))
+        for name in kwargs:
+            if name not in names:
+                raise TypeError("{0} has no field `{1}'".format(
+                    type(self).__name__, name))
+        values.update(kwargs)
+        for name in names:
+            setattr(self, name, values.get(name, 0))
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, ', '.join(
+            '{0}={1!r}'.format(name, getattr(self, name))
+            for name, _ in self.fields))
+
+
+class ColumnProxy(object):
+    """Lightweight handle on the row of one entity in a
+    :class:`ComponentColumns` store. Reading and writing a field goes straight
+    to the underlying column. A subclass with one property per field is
+    generated for each columnar component type.
+    """
+    __slots__ = ('_store', '_entity')
+
+    def __init__(self, store, entity):
+        self._store = store
+        self._entity = entity
+
+    @property
+    def entity(self):
+        """Get the entity whose component this proxy refers to.
+
+        :rtype: :class:`ecs.models.Entity`
+        """
+        return self._entity
+
+    def detach(self):
+        """Return a standalone instance of the component type holding a copy
+        of the current field values.
+
+        :rtype: :class:`ColumnarComponent`
+        """
+        component_type = self._store.component_type
+        return component_type(**dict(
+            (name, getattr(self, name)) for name, _ in component_type.fields))
+
+    def __repr__(self):
+        return '<{0} of {1!r}>'.format(
+            type(self).__name__, self._entity)
+
+
+def _field_property(name):
+    def get(proxy):
+        store = proxy._store
+        return store._columns[name][store._row(proxy._entity)]
+
+    def set_(proxy, value):
+        store = proxy._store
+        store._columns[name][store._row(proxy._entity)] = value
+    return property(get, set_)
+
+
+class ComponentColumns(MutableMapping):
+    """Table of an entity manager's database holding all components of one
+    :class:`ColumnarComponent` type. It maps entities to
+    :class:`ColumnProxy` instances like the other tables of the database, but
+    also exposes each field as a NumPy array. The component of an entity is
+    stored in the row numbered after the entity's index, so the columns of
+    all stores of a manager are aligned. Rows of entities which don't possess
+    a component of the type are zeroed when the component is removed.
+    """
+    _initial_capacity = 16
+
+    def __init__(self, component_type):
+        """:param component_type: type of the stored components
+        :type component_type: :class:`type` which is
+            :class:`ColumnarComponent` subclass
+        """
+        if numpy is None:
+            raise ImportError(
+                'NumPy is required to store columnar components')
+        self.component_type = component_type
+        self._dtypes = [
+            (name, numpy.dtype(dtype)) for name, dtype
+            in component_type.fields]
+        # Shared memory blocks backing the columns, by field name, once the
+        # store has been shared.
+        self._blocks = None
+        self._columns = dict(
+            (name, self._allocate(self._initial_capacity, dtype)[0])
+            for name, dtype in self._dtypes)
+        self._capacity = self._initial_capacity
+        self._present = numpy.zeros(self._capacity, bool)
+        # Number of rows exposed by the columns, and entity of each occupied
+        # row, by index.
+        self._size = 0
+        self._entities = {}
+        self._proxy_type = type(
+            component_type.__name__ + 'Proxy', (ColumnProxy,), dict(
+                [(name, _field_property(name)) for name, _ in self._dtypes],
+                __slots__=()))
+
+    @property
+    def entities(self):
+        """Get the entities possessing a component of this type, in the order
+        in which they were added.
+
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        return list(six.itervalues(self._entities))
+
+    @property
+    def mask(self):
+        """Get a boolean array telling, for each row of the columns, whether
+        the entity of that index possesses a component of this type.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._present[:self._size]
+
+    def column(self, name):
+        """Return the rows of a field, row ``i`` holding the component of the
+        entity whose index is ``i``. The returned array is a view, so
+        assigning to its elements updates the components.
+
+        :param name: field name
+        :type name: :class:`str`
+        :rtype: :class:`numpy.ndarray`
+        """
+        return self._columns[name][:self._size]
+
+    def reserve(self, size):
+        """Make the columns expose at least ``size`` rows, e.g. one per
+        entity index handed out by the entity manager, so that they line up
+        with the columns of other stores.
+
+        :param size: number of rows
+        :type size: :class:`int`
+        """
+        if size > self._capacity:
+            capacity = self._capacity
+            while capacity < size:
+                capacity *= 2
+            self._resize(capacity)
+        if size > self._size:
+            self._size = size
+
+    def rows_for(self, entities):
+        """Return the row of each entity, e.g. to gather values with
+        ``column(name)[rows]``.
+
+        :param entities: entities, each of which must be in this store
+        :type entities: iterable of :class:`ecs.models.Entity`
+        :rtype: :class:`numpy.ndarray` of row indices
+        :raises: :exc:`KeyError` for an entity which is not in this store
+        """
+        return numpy.fromiter(
+            (self._row(entity) for entity in entities), numpy.intp)
+
+    def _row(self, entity):
+        row = entity.index
+        if self._entities.get(row) != entity:
+            raise KeyError(entity)
+        return row
+
+    @property
+    def shared(self):
+        """Get whether the columns live in shared memory.
+
+        :rtype: :class:`bool`
+        """
+        return self._blocks is not None
+
+    def share(self):
+        """Move the columns to :mod:`multiprocessing.shared_memory` blocks,
+        which other processes may attach to using the descriptors returned by
+        :meth:`shared_columns`. Does nothing if they already are. The blocks
+        are released when the store is garbage collected.
+        """
+        if self._blocks is not None:
+            return
+        if SharedMemory is None:
+            raise ImportError(
+                'multiprocessing.shared_memory is required to share columns')
+        self._blocks = {}
+        weakref.finalize(self, _unlink_blocks, self._blocks)
+        self._resize(self._capacity)
+
+    def shared_columns(self):
+        """Return descriptors of the shared columns, small enough to be sent
+        to another process each frame. Arrays are obtained from them with
+        :func:`attach_columns`. The descriptors are invalidated when the
+        columns grow.
+
+        :return: ``(field name, block name, dtype string, capacity)`` tuples
+            and the number of exposed rows
+        :rtype: :class:`tuple` of (:class:`tuple`, :class:`int`)
+        """
+        return tuple(
+            (name, self._blocks[name].name, dtype.str, self._capacity)
+            for name, dtype in self._dtypes), self._size
+
+    def _allocate(self, capacity, dtype):
+        """Return a zeroed column and, once shared, the block backing it."""
+        if self._blocks is None:
+            return numpy.zeros(capacity, dtype), None
+        block = SharedMemory(
+            create=True, size=max(1, capacity * dtype.itemsize))
+        column = _block_array(block, capacity, dtype)
+        column[:] = 0
+        return column, block
+
+    def _resize(self, capacity):
+        size = self._size
+        for name, dtype in self._dtypes:
+            column, block = self._allocate(capacity, dtype)
+            # Copy before letting go of the old column: its block must stay
+            # mapped until the copy is done.
+            column[:size] = self._columns[name][:size]
+            self._columns[name] = column
+            if block is not None:
+                old_block = self._blocks.get(name)
+                self._blocks[name] = block
+                if old_block is not None:
+                    # Remove the name only. The memory is unmapped once the
+                    # arrays backed by the block are garbage collected.
+                    old_block.unlink()
+        if capacity != self._capacity:
+            present = numpy.zeros(capacity, bool)
+            present[:size] = self._present[:size]
+            self._present = present
+        self._capacity = capacity
+
+    def __getitem__(self, entity):
+        self._row(entity)
+        return self._proxy_type(self, entity)
+
+    def __setitem__(self, entity, component_instance):
+        # Convert every value before touching the store, so that an invalid
+        # component leaves it unchanged.
+        values = []
+        for name, dtype in self._dtypes:
+            value = numpy.asarray(getattr(component_instance, name), dtype)
+            if value.shape != self._columns[name].shape[1:]:
+                raise ValueError(
+                    "field `{0}' of {1} expects a value of shape {2}".format(
+                        name, self.component_type.__name__,
+                        self._columns[name].shape[1:]))
+            values.append((name, value))
+        row = entity.index
+        self.reserve(row + 1)
+        for name, value in values:
+            self._columns[name][row] = value
+        self._present[row] = True
+        self._entities[row] = entity
+
+    def set_many(self, entities, values):
+        """Add or replace the components of many entities at once, writing
+        each field with a single vectorized assignment.
+
+        :param entities: entities whose components are set
+        :type entities: sequence of :class:`ecs.models.Entity`
+        :param values: mapping of field name to the values of the field, one
+            per entity, or a single value for all of them. Missing fields are
+            zero.
+        :type values: :class:`dict`
+        :raises: :exc:`TypeError` for an unknown field, :exc:`ValueError`
+            for values which don't fit the columns, in which case the store
+            is left unchanged
+        """
+        for name in values:
+            if name not in self._columns:
+                raise TypeError("{0} has no field `{1}'".format(
+                    self.component_type.__name__, name))
+        rows = numpy.fromiter(
+            (entity.index for entity in entities), numpy.intp, len(entities))
+        arrays = [
+            (name, numpy.broadcast_to(
+                numpy.asarray(values.get(name, 0), dtype),
+                rows.shape + self._columns[name].shape[1:]))
+            for name, dtype in self._dtypes]
+        if not len(rows):
+            return
+        self.reserve(int(rows.max()) + 1)
+        for name, array in arrays:
+            self._columns[name][rows] = array
+        self._present[rows] = True
+        self._entities.update(six.moves.zip(rows.tolist(), entities))
+
+    def __delitem__(self, entity):
+        row = self._row(entity)
+        del self._entities[row]
+        self._present[row] = False
+        for column in six.itervalues(self._columns):
+            column[row] = 0
+
+    def __contains__(self, entity):
+        return self._entities.get(entity.index) == entity
+
+    def __iter__(self):
+        return six.itervalues(self._entities)
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __repr__(self):
+        return '{0}({1}, {2} components)'.format(
+            type(self).__name__, self.component_type.__name__,
+            len(self._entities))
+
+
+class _BlockBuffer(object):
+    """Owner of a shared memory block, exposing it through the NumPy array
+    interface. Arrays built on it keep it, and so the block's mapping, alive:
+    NumPy doesn't hold a buffer export on a memoryview it wraps, which would
+    otherwise let the block be unmapped under a live array.
+    """
+    def __init__(self, block, capacity, dtype):
+        self.block = block
+        address = numpy.frombuffer(
+            block.buf, numpy.uint8).__array_interface__['data'][0]
+        self.__array_interface__ = {
+            'shape': (capacity,),
+            'typestr': dtype.str,
+            'data': (address, False),
+            'version': 3,
+        }
+
+
+def _block_array(block, capacity, dtype):
+    return numpy.asarray(_BlockBuffer(block, capacity, dtype))
+
+
+def _unlink_blocks(blocks):
+    for block in blocks.values():
+        block.unlink()
+    blocks.clear()
+
+
+# Blocks attached by this process, by (component type, field name), so that
+# each column is only mapped once however many frames use it.
+_attached_blocks = {}
+
+
+def attach_columns(component_type, descriptors):
+    """Return the arrays of a column store shared by another process. Each
+    column stays mapped in this process until the store moves it to another
+    block.
+
+    :param component_type: type of the stored components
+    :type component_type: :class:`type` which is :class:`ColumnarComponent`
+        subclass
+    :param descriptors: descriptors returned by
+        :meth:`ComponentColumns.shared_columns`
+    :return: mapping of field name to array of the live rows
+    :rtype: :class:`dict` of :class:`str` to :class:`numpy.ndarray`
+    """
+    fields, size = descriptors
+    columns = {}
+    for name, block_name, dtype, capacity in fields:
+        key = (component_type, name)
+        block = _attached_blocks.get(key)
+        if block is None or block.name != block_name:
+            # A block replaced here is unmapped once the arrays built on it
+            # are garbage collected.
+            block = _attached_blocks[key] = SharedMemory(name=block_name)
+        columns[name] = _block_array(
+            block, capacity, numpy.dtype(dtype))[:size]
+    return columns
@@ -0,0 +1,121 @@
+"""Deferred structural changes.
+
+Adding or removing components while iterating over the tables of an entity
+manager changes them under the iterator. Systems instead record such changes
+in a :class:`CommandBuffer`, which their system manager flushes at sync
+points, after the iteration is over:
+
+.. code-block:: python
+
+    class Expiry(System):
+        def update(self, dt):
+            for entity, lifetime in self.entity_manager.pairs_for_type(
+                    Lifetime):
+                lifetime.remaining -= dt
+                if lifetime.remaining <= 0:
+                    self.commands.remove_entity(entity)
+
+The sync points of a :class:`ecs.managers.SystemManager` are chosen by its
+``sync`` argument: after each system (:data:`SYNC_SYSTEM`, the default),
+after the last system of each priority (:data:`SYNC_PRIORITY`), or once at
+the end of the frame (:data:`SYNC_FRAME`).
+"""
+
+import threading
+
+SYNC_SYSTEM = 'system'
+"""Flush commands after each system."""
+SYNC_PRIORITY = 'priority'
+"""Flush commands after the last system of each priority."""
+SYNC_FRAME = 'frame'
+"""Flush commands once all systems have run."""
+SYNC_POINTS = (SYNC_SYSTEM, SYNC_PRIORITY, SYNC_FRAME)
+
+_ADD_COMPONENT = 0
+_REMOVE_COMPONENT = 1
+_REMOVE_ENTITY = 2
+
+
+class CommandBuffer(object):
+    """Queue of structural changes to an entity manager, applied in the
+    order in which they were recorded by :meth:`flush`. Recording a command
+    only appends to a list, which is thread-safe, and entities are created
+    under a lock, so systems running concurrently may share a buffer.
+    """
+    def __init__(self, entity_manager):
+        """:param entity_manager: entity manager to which commands apply
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        """
+        self.entity_manager = entity_manager
+        self._commands = []
+        # Serializes the entity manager's allocation of entities.
+        self._create_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._commands)
+
+    def create_entity(self, *component_instances):
+        """Create an entity right away, which doesn't change the database,
+        and record the addition of its components. Entities are created
+        under a lock held by this buffer, so concurrent systems must not
+        create them otherwise.
+
+        :param component_instances: components to add to the entity
+        :type component_instances: :class:`ecs.models.Component`
+        :return: the new entity
+        :rtype: :class:`ecs.models.Entity`
+        """
+        with self._create_lock:
+            entity = self.entity_manager.create_entity()
+        append = self._commands.append
+        for component_instance in component_instances:
+            append((_ADD_COMPONENT, (entity, component_instance)))
+        return entity
+
+    def add_component(self, entity, component_instance):
+        """Record a call to
+        :meth:`ecs.managers.EntityManager.add_component`.
+        """
+        self._commands.append(
+            (_ADD_COMPONENT, (entity, component_instance)))
+
+    def remove_component(self, entity, component_type):
+        """Record a call to
+        :meth:`ecs.managers.EntityManager.remove_component`.
+        """
+        self._commands.append(
+            (_REMOVE_COMPONENT, (entity, component_type)))
+
+    def remove_entity(self, entity):
+        """Record a call to
+        :meth:`ecs.managers.EntityManager.remove_entity`.
+        """
+        self._commands.append((_REMOVE_ENTITY, (entity,)))
+
+    def clear(self):
+        """Drop the recorded commands without applying them."""
+        del self._commands[:]
+
+    def flush(self):
+        """Apply the recorded commands, in order, including those recorded
+        while flushing. If a command raises an exception, the commands
+        following it are kept for the next flush.
+        """
+        entity_manager = self.entity_manager
+        operations = (
+            entity_manager.add_component,
+            entity_manager.remove_component,
+            entity_manager.remove_entity)
+        while self._commands:
+            commands = self._commands
+            self._commands = []
+            for i, (operation, args) in enumerate(commands):
+                try:
+                    operations[operation](*args)
+                except Exception:
+                    self._commands[:0] = commands[i + 1:]
+                    raise
+
+    def __repr__(self):
+        return '<{0} of {1} commands>'.format(
+            type(self).__name__, len(self._commands))
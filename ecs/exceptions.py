@@ -18,6 +18,19 @@ class NonexistentComponentTypeForEntity(Exception):
             self.component_type.__name__, self.entity)
 
 
+class StaleEntityError(Exception):
+    """Error indicating that an entity is not alive in the entity manager:
+    it has been removed, or was never created by the manager."""
+    def __init__(self, entity):
+        """:param entity: entity which is not alive
+        :type entity: :class:`Entity`
+        """
+        self.entity = entity
+
+    def __str__(self):
+        return "Stale entity: `{0}'".format(self.entity)
+
+
 class DuplicateSystemTypeError(Exception):
     """Error indicating that the system type already exists in the system
     manager."""
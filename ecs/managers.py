@@ -1,18 +1,64 @@
 """Entity and System Managers."""
 
+import inspect
+import weakref
+from bisect import bisect_left, bisect_right
+from collections import deque
+
 import six
 
+from ecs.changes import ChangeLog
+from ecs.columns import ColumnarComponent, ColumnProxy, ComponentColumns
+from ecs.commands import (
+    CommandBuffer, SYNC_POINTS, SYNC_PRIORITY, SYNC_SYSTEM)
 from ecs.exceptions import (
     NonexistentComponentTypeForEntity, DuplicateSystemTypeError,
-    SystemAlreadyAddedToManagerError)
-from ecs.models import Entity
+    StaleEntityError, SystemAlreadyAddedToManagerError)
+from ecs.models import Entity, ENTITY_INDEX_BITS
+from ecs.profiling import Profiler
+from ecs.scheduling import FixedStep, Interval
+from ecs.spatial import SpatialIndex
+from ecs.views import QueryView
 
 
 class EntityManager(object):
     """Provide database-like access to components based on an entity key."""
     def __init__(self):
+        self._init_entities()
         self._database = {}
-        self._next_guid = 0
+        # Reverse index of the component types held by each entity, so that
+        # per-entity operations don't need to visit every component type.
+        self._entity_types = {}
+        # Views are indexed by each of their component types so that only the
+        # views concerned by a change need to be visited.
+        self._views_by_type = {}
+
+    def _init_entities(self):
+        """Initialize the state shared by all storage engines: entity
+        allocation, views and change tracking.
+        """
+        self._next_index = 0
+        # Indices of removed entities, reused oldest first, and the current
+        # generation of every index handed out so far.
+        self._free_indices = deque()
+        self._generations = []
+        # Number of indices ever released, from which the number taken from
+        # the free indices since a given time is derived.
+        self._released = 0
+        # Views are only maintained while referenced elsewhere.
+        self._views = weakref.WeakValueDictionary()
+        # Change logs of the tracked component types, and tick of the latest
+        # recorded change.
+        self._changes = {}
+        self._change_tick = 0
+        # Lifecycle hooks, as a tuple of callbacks per component type, so
+        # that managers without hooks only check that these are empty.
+        self._add_hooks = {}
+        self._remove_hooks = {}
+        # Spatial indices, by indexed component type, and the types whose
+        # changes are only tracked for them, which they discard once read.
+        self._spatial_indices = {}
+        self._indexed_changes = set()
 
     @property
     def database(self):
@@ -25,37 +71,250 @@ class EntityManager(object):
         return self._database
 
     def create_entity(self):
-        """Return a new entity instance with the current lowest GUID value.
-        Does not store a reference to it, and does not make any entries in the
-        database referencing it.
+        """Return a new entity instance. The index of a removed entity is
+        reused if there is one, with its generation incremented so that the
+        new entity does not compare equal to the removed one. Otherwise, the
+        current lowest unused index is taken. Does not store a reference to
+        the entity, and does not make any entries in the database referencing
+        it.
 
         :return: the new entity
         :rtype: :class:`ecs.models.Entity`
         """
-        entity = Entity(self._next_guid)
-        self._next_guid += 1
-        return entity
+        if self._free_indices:
+            index = self._free_indices.popleft()
+            return Entity(
+                self._generations[index] << ENTITY_INDEX_BITS | index)
+        index = self._next_index
+        self._next_index += 1
+        self._generations.append(0)
+        return Entity(index)
+
+    def create_entities(self, count):
+        """Return ``count`` new entities, as :meth:`create_entity` would one
+        by one, but in bulk.
+
+        :param count: number of entities to create
+        :type count: :class:`int`
+        :return: the new entities
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        free_indices = self._free_indices
+        generations = self._generations
+        reused = min(count, len(free_indices))
+        entities = [
+            Entity(generations[index] << ENTITY_INDEX_BITS | index)
+            for index in [free_indices.popleft() for _ in range(reused)]]
+        start = self._next_index
+        self._next_index += count - reused
+        generations.extend([0] * (count - reused))
+        entities.extend(map(Entity, range(start, self._next_index)))
+        return entities
+
+    def is_alive(self, entity):
+        """Return whether the entity was created by this manager and has not
+        been removed since. An entity handle kept after its removal is stale,
+        even once its index has been reused.
+
+        :param entity: entity to check
+        :type entity: :class:`ecs.models.Entity`
+        :rtype: :class:`bool`
+        """
+        index = entity.index
+        return (index < self._next_index and
+                self._generations[index] == entity.generation)
+
+    @staticmethod
+    def _new_table(component_type):
+        """Return an empty table of the database for ``component_type``, as
+        selected by its :attr:`ecs.models.Component.storage` attribute.
+        """
+        storage = getattr(component_type, 'storage', None)
+        if storage is None:
+            return {}
+        return storage(component_type)
 
     def add_component(self, entity, component_instance):
         """Add a component to the database and associate it with the given
-        entity.
+        entity. A proxy obtained for a columnar component may be added too;
+        its current values are then copied.
 
         :param entity: entity to associate
         :type entity: :class:`ecs.models.Entity`
         :param component_instance: component to add to the entity
         :type component_instance: :class:`ecs.models.Component`
+        :raises: :exc:`ecs.exceptions.StaleEntityError` when the entity is
+            not alive
         """
+        if not self.is_alive(entity):
+            raise StaleEntityError(entity)
         component_type = type(component_instance)
         if component_type not in self._database:
-            self._database[component_type] = {}
+            component_type = self._ensure_table(component_instance)
+
+        table = self._database[component_type]
+        replaced = entity in table
+        previous = None
+        if replaced and component_type in self._remove_hooks:
+            previous = self._replaced_components(component_type, (entity,))
+        self._store(table, component_type, entity, component_instance,
+                    replaced)
+        try:
+            self._entity_types[entity].add(component_type)
+        except KeyError:
+            self._entity_types[entity] = set([component_type])
+
+        views = self._views_by_type.get(component_type)
+        if views:
+            for view in six.itervalues(views):
+                view._entity_changed(entity, self._database)
+        if previous:
+            self._call_replaced_hooks(component_type, previous)
+        if component_type in self._add_hooks:
+            self._call_add_hooks(entity, component_type)
+
+    def _store(self, table, component_type, entity, component_instance,
+               replaced):
+        """Store a component in the table of its type and record the
+        addition. If the component can't be stored, nothing is recorded and
+        the table is dropped if it was just created.
+        """
+        try:
+            table[entity] = component_instance
+        except Exception:
+            if not table:
+                del self._database[component_type]
+            raise
+        changes = self._changes.get(component_type)
+        if changes is not None:
+            self._record_addition(changes, entity, replaced)
+
+    def _ensure_table(self, component_instance):
+        """Create the table of a component's type, unless it exists.
+
+        :return: the component type
+        :rtype: :class:`type`
+        """
+        component_type = type(component_instance)
+        if issubclass(component_type, ColumnProxy):
+            # A proxy obtained from a column store stands for a component of
+            # the store's type.
+            component_type = component_instance._store.component_type
+        if component_type not in self._database:
+            self._database[component_type] = self._new_table(component_type)
+            self._register_pool(component_type)
+        return component_type
+
+    def add_components_bulk(self, component_type, entities, instances=None,
+                            columns=None):
+        """Add components of one type to many entities at once. The table of
+        the type is looked up once and, for plain dictionaries and column
+        stores, filled in a single pass. For a columnar component type, the
+        values may be given per field instead of as instances:
+
+        .. code-block:: python
+
+            particles = entity_manager.create_entities(50000)
+            entity_manager.add_components_bulk(
+                Position, particles, columns={'x': xs, 'y': ys})
 
-        self._database[component_type][entity] = component_instance
+        :param component_type: type of the added components
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param entities: entities to associate, each with one component
+        :type entities: iterable of :class:`ecs.models.Entity`
+        :param instances: components of ``component_type``, one per entity
+        :type instances: iterable of :class:`ecs.models.Component`
+        :param columns: for a columnar type, mapping of field name to the
+            values of the field, one per entity, or a single value for all
+        :type columns: :class:`dict`
+        :raises: :exc:`ecs.exceptions.StaleEntityError` when one of the
+            entities is not alive, in which case no component is added
+        """
+        entities = list(entities)
+        self._check_alive(entities)
+        previous = None
+        if component_type in self._remove_hooks:
+            previous = self._replaced_components(component_type, entities)
+        table = self._database.get(component_type)
+        changes = self._changes.get(component_type)
+        replaced = _replaced_entities(changes, table, entities)
+        if table is None:
+            self._register_pool(component_type)
+            table = self._new_table(component_type)
+            # Only registered once filled, so that a failure leaves no empty
+            # table behind.
+            _fill_table(table, component_type, entities, instances, columns)
+            if table:
+                self._database[component_type] = table
+        else:
+            _fill_table(table, component_type, entities, instances, columns)
+        self._record_additions(changes, entities, replaced)
+        self._add_entity_types(component_type, entities)
+
+        views = self._views_by_type.get(component_type)
+        if views:
+            for view in six.itervalues(views):
+                for entity in entities:
+                    view._entity_changed(entity, self._database)
+        if previous:
+            self._call_replaced_hooks(component_type, previous)
+        if component_type in self._add_hooks:
+            self._call_bulk_add_hooks(component_type, entities)
+
+    def _add_entity_types(self, component_type, entities):
+        # Looked up rather than caught: entities are often new, and raising
+        # KeyError for each of them would dominate the cost.
+        entity_types = self._entity_types
+        for entity in entities:
+            types = entity_types.get(entity)
+            if types is None:
+                entity_types[entity] = set([component_type])
+            else:
+                types.add(component_type)
+
+    def _record_addition(self, changes, entity, replaced):
+        """Record that a component was given to the entity, which already
+        had one if ``replaced``.
+        """
+        self._change_tick += 1
+        if replaced:
+            changes.record_changed(entity, self._change_tick)
+        else:
+            changes.record_added(entity, self._change_tick)
+
+    def _record_additions(self, changes, entities, replaced):
+        """Record, with a single tick, that components were given to the
+        entities, those in ``replaced`` already having one. Does nothing if
+        ``changes`` is ``None``, i.e. the type is not tracked.
+        """
+        if changes is None:
+            return
+        self._change_tick += 1
+        tick = self._change_tick
+        for entity in entities:
+            if entity in replaced:
+                changes.record_changed(entity, tick)
+            else:
+                changes.record_added(entity, tick)
+
+    def _record_removal(self, entity, component_type):
+        changes = self._changes.get(component_type)
+        if changes is not None:
+            self._change_tick += 1
+            changes.record_removed(entity, self._change_tick)
+
+    def _check_alive(self, entities):
+        is_alive = self.is_alive
+        for entity in entities:
+            if not is_alive(entity):
+                raise StaleEntityError(entity)
 
     def remove_component(self, entity, component_type):
         """Remove the component of ``component_type`` associated with
-        entity from the database. Doesn't do any kind of data-teardown. It is
-        up to the system calling this code to do that. In the future, a
-        callback system may be used to implement type-specific destructors.
+        entity from the database. Doesn't do any kind of data-teardown
+        itself; type-specific destructors are registered with
+        :meth:`on_remove`.
 
         :param entity: entity to associate
         :type entity: :class:`ecs.models.Entity`
@@ -63,12 +322,25 @@ class EntityManager(object):
         :type component_type: :class:`type` which is :class:`Component`
             subclass
         """
+        if component_type in self._remove_hooks:
+            self._call_remove_hooks(entity, component_type)
         try:
-            del self._database[component_type][entity]
-            if self._database[component_type] == {}:
+            table = self._database[component_type]
+            del table[entity]
+            if not table:
                 del self._database[component_type]
         except KeyError:
-            pass
+            return
+        self._record_removal(entity, component_type)
+        entity_types = self._entity_types[entity]
+        entity_types.discard(component_type)
+        if not entity_types:
+            del self._entity_types[entity]
+
+        views = self._views_by_type.get(component_type)
+        if views:
+            for view in six.itervalues(views):
+                view._entity_removed(entity)
 
     def pairs_for_type(self, component_type):
         """Return an iterator over ``(entity, component_instance)`` tuples for
@@ -95,9 +367,173 @@ entity_manager.pairs_for_type(Renderable):
         except KeyError:
             return six.iteritems({})
 
+    def query(self, *component_types):
+        """Return an iterator over ``(entity, component_instance, ...)``
+        tuples for all entities in the database possessing a component of
+        every one of ``component_types``. The components are yielded in the
+        same order as the requested types. It should be used in a loop like
+        this, where ``Position`` and ``Velocity`` are component types:
+
+        .. code-block:: python
+
+            for entity, position, velocity in \
+entity_manager.query(Position, Velocity):
+                pass # do something
+
+        The smallest of the requested component tables is walked and the
+        others are probed, so no exceptions are raised for entities which
+        lack one of the types.
+
+        :param component_types: types of created components
+        :type component_types: :class:`type` which is :class:`Component`
+            subclass
+        :return: iterator on ``(entity, component_instance, ...)`` tuples
+        :rtype: :class:`iter` on
+            (:class:`ecs.models.Entity`, :class:`ecs.models.Component`, ...)
+        """
+        try:
+            tables = [self._database[type_] for type_ in component_types]
+        except KeyError:
+            # At least one of the types has no components at all.
+            return iter(())
+        if not tables:
+            return iter(())
+        return self._iter_query(tables)
+
+    @staticmethod
+    def _iter_query(tables):
+        smallest = min(tables, key=len)
+        if len(tables) == 1:
+            for entity, component in six.iteritems(smallest):
+                yield entity, component
+            return
+        others = [table for table in tables if table is not smallest]
+        for entity in smallest:
+            for table in others:
+                if entity not in table:
+                    break
+            else:
+                yield (entity,) + tuple(table[entity] for table in tables)
+
+    def view(self, *component_types):
+        """Return a persistent view over the results of :meth:`query` for
+        ``component_types``. The view is created on first use and from then
+        on kept up to date by this manager, so iterating over it each frame
+        costs time proportional to the number of matching entities only:
+
+        .. code-block:: python
+
+            self.movers = entity_manager.view(Position, Velocity)
+            ...
+            for entity, position, velocity in self.movers:
+                pass # do something
+
+        Views are dropped once nothing references them anymore, so unused
+        queries cost nothing.
+
+        :param component_types: types of created components
+        :type component_types: :class:`type` which is :class:`Component`
+            subclass
+        :return: view on ``(entity, component_instance, ...)`` tuples
+        :rtype: :class:`ecs.views.QueryView`
+        """
+        try:
+            return self._views[component_types]
+        except KeyError:
+            pass
+        view = QueryView(component_types, self.query(*component_types))
+        self._views[component_types] = view
+        for component_type in set(component_types):
+            # By id(), since weakref.WeakSet is missing on Python 2.6.
+            self._views_by_type.setdefault(
+                component_type, weakref.WeakValueDictionary())[id(view)] = view
+        return view
+
+    def spatial_index(self, component_type, cell_size=None,
+                      fields=('x', 'y')):
+        """Return the spatial index of the entities having a component of
+        ``component_type``, by the coordinates in its ``fields``, for radius,
+        box and nearest-neighbour queries. The index is created on first use
+        and from then on kept up to date by this manager, until
+        :meth:`remove_spatial_index` is called. See :mod:`ecs.spatial`.
+
+        The index reads the changes of ``component_type``, tracking them if
+        they aren't yet. It then discards them once applied, until
+        :meth:`track_changes` is called for another reader; otherwise they
+        are kept until :meth:`discard_changes` is called.
+
+        :param component_type: a position-like component type
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param cell_size: side of the index's grid cells, required to create
+            the index
+        :type cell_size: :class:`float`
+        :param fields: names of the coordinate attributes of the components
+        :type fields: :class:`tuple` of :class:`str`
+        :return: the spatial index
+        :rtype: :class:`ecs.spatial.SpatialIndex`
+        :raises: :class:`ValueError` when the index doesn't exist yet and no
+            ``cell_size`` is given
+        """
+        try:
+            return self._spatial_indices[component_type]
+        except KeyError:
+            pass
+        if cell_size is None:
+            raise ValueError('cell_size is required to index {0}'.format(
+                component_type.__name__))
+        tracked = component_type in self._changes
+        index = SpatialIndex(self, component_type, cell_size, fields)
+        self._spatial_indices[component_type] = index
+        if not tracked:
+            self._indexed_changes.add(component_type)
+        return index
+
+    def remove_spatial_index(self, component_type):
+        """Stop maintaining the spatial index of ``component_type``. Does
+        nothing if there is none.
+
+        :param component_type: the indexed component type
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        """
+        index = self._spatial_indices.pop(component_type, None)
+        if index is not None:
+            index._detach()
+        if component_type in self._indexed_changes:
+            self._indexed_changes.remove(component_type)
+            del self._changes[component_type]
+
+    def columns(self, component_type):
+        """Return the table holding all components of a columnar component
+        type, whose fields are exposed as NumPy arrays with one row per
+        entity index handed out by this manager, so that the columns of
+        different types line up. If there are no components of this type in
+        the database, an empty store which is not part of the database is
+        returned. The table is dropped from the database once its last
+        component is removed, so it should be requested again after
+        structural changes.
+
+        :param component_type: a type of columnar component
+        :type component_type: :class:`type` which is
+            :class:`ecs.columns.ColumnarComponent` subclass
+        :return: column store of ``component_type``
+        :rtype: :class:`ecs.columns.ComponentColumns`
+        :raises: :exc:`TypeError` when ``component_type`` is not columnar
+        """
+        if not issubclass(component_type, ColumnarComponent):
+            raise TypeError('{0} is not a columnar component type'.format(
+                component_type.__name__))
+        table = self._database.get(component_type)
+        if table is None:
+            table = self._new_table(component_type)
+        table.reserve(self._next_index)
+        return table
+
     def component_for_entity(self, entity, component_type):
         """Return the instance of ``component_type`` for the entity from the
-        database.
+        database. For a columnar component type, a proxy on the entity's row
+        in the column store is returned instead.
 
         :param entity: associated entity
         :type entity: :class:`ecs.models.Entity`
@@ -115,37 +551,461 @@ entity_manager.pairs_for_type(Renderable):
             raise NonexistentComponentTypeForEntity(
                 entity, component_type)
 
+    def components_for_entity(self, entity):
+        """Return all component instances associated with the entity. Only
+        the entity's own components are visited.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :return: component instances, or an empty tuple if the entity has no
+            components
+        :rtype: :class:`tuple` of :class:`ecs.models.Component`
+        """
+        return tuple(
+            self._database[component_type][entity]
+            for component_type in self._entity_types.get(entity, ()))
+
+    def has_component(self, entity, component_type):
+        """Return whether the entity has a component of ``component_type``.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :param component_type: a type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :rtype: :class:`bool`
+        """
+        return component_type in self._entity_types.get(entity, ())
+
     def remove_entity(self, entity):
         """Remove all components from the database that are associated with
         the entity, with the side-effect that the entity is also no longer
-        in the database.
+        in the database. Only the component types held by the entity are
+        visited. The entity's index is then released for reuse by
+        :meth:`create_entity`.
 
         :param entity: entity to remove
         :type entity: :class:`ecs.models.Entity`
         """
-        # For Python 2, don't use iterkeys(), otherwise we will get a
-        # RuntimeError about mutating the length of the dictionary at runtime.
-        # For Python 3, we can't even use keys(), because that is a view object
-        # that acts like iterkeys(). We therefore make a copy using list() to
-        # avoid modifying the iterator.
-        for comp_type in list(self._database.keys()):
-            try:
-                del self._database[comp_type][entity]
-                if self._database[comp_type] == {}:
-                    del self._database[comp_type]
-            except KeyError:
-                pass
+        remove_hooks = self._remove_hooks
+        if remove_hooks:
+            for component_type in list(self._entity_types.get(entity, ())):
+                if component_type in remove_hooks:
+                    self._call_remove_hooks(entity, component_type)
+        for component_type in self._entity_types.pop(entity, ()):
+            table = self._database[component_type]
+            del table[entity]
+            if not table:
+                del self._database[component_type]
+            self._record_removal(entity, component_type)
+
+            views = self._views_by_type.get(component_type)
+            if views:
+                for view in six.itervalues(views):
+                    view._entity_removed(entity)
+
+        self._release_entity(entity)
+
+    def track_changes(self, *component_types):
+        """Start recording which components of ``component_types`` are
+        added, changed and removed, for :meth:`added`, :meth:`changed` and
+        :meth:`removed`. Components of types which are not tracked are added
+        and removed without any overhead. See :mod:`ecs.changes`.
+
+        :param component_types: types of created components
+        :type component_types: :class:`type` which is :class:`Component`
+            subclass
+        """
+        for component_type in component_types:
+            if component_type not in self._changes:
+                self._changes[component_type] = ChangeLog()
+            # Another reader than a spatial index.
+            self._indexed_changes.discard(component_type)
+
+    @property
+    def change_tick(self):
+        """Get the tick of the latest recorded change. Changes recorded from
+        now on have a greater tick, so a reader keeps it to later get the
+        changes made since.
+
+        :rtype: :class:`int`
+        """
+        return self._change_tick
+
+    def _change_log(self, component_type):
+        try:
+            return self._changes[component_type]
+        except KeyError:
+            raise ValueError('changes to {0} are not tracked'.format(
+                component_type.__name__))
+
+    def added(self, component_type, since=0):
+        """Return the entities which were given a component of
+        ``component_type`` after tick ``since``, and still have it.
+
+        :param component_type: a tracked type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param since: tick, as given by :attr:`change_tick`
+        :type since: :class:`int`
+        :return: entities, in order of addition
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        :raises: :exc:`ValueError` when changes to ``component_type`` are
+            not tracked
+        """
+        return self._change_log(component_type).added(since)
+
+    def changed(self, component_type, since=0):
+        """Return the entities whose component of ``component_type`` was
+        replaced or marked changed after tick ``since``. Entities whose
+        component was added since are only returned by :meth:`added`,
+        unless it changed again afterwards.
+
+        :param component_type: a tracked type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param since: tick, as given by :attr:`change_tick`
+        :type since: :class:`int`
+        :return: entities, in order of their latest change
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        :raises: :exc:`ValueError` when changes to ``component_type`` are
+            not tracked
+        """
+        return self._change_log(component_type).changed(since)
+
+    def removed(self, component_type, since=0):
+        """Return the entities whose component of ``component_type`` was
+        removed after tick ``since``, by :meth:`remove_component` or
+        :meth:`remove_entity`, and which haven't been given one again.
+
+        :param component_type: a tracked type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param since: tick, as given by :attr:`change_tick`
+        :type since: :class:`int`
+        :return: entities, in order of removal
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        :raises: :exc:`ValueError` when changes to ``component_type`` are
+            not tracked
+        """
+        return self._change_log(component_type).removed(since)
+
+    def mark_changed(self, entity, component_type):
+        """Record that the entity's component of ``component_type`` was
+        modified in place. Does nothing if changes to the type are not
+        tracked.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :param component_type: a type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :raises: :exc:`NonexistentComponentTypeForEntity` when
+            ``component_type`` does not exist on the given entity
+        """
+        changes = self._changes.get(component_type)
+        if changes is None:
+            return
+        if not self.has_component(entity, component_type):
+            raise NonexistentComponentTypeForEntity(entity, component_type)
+        self._change_tick += 1
+        changes.record_changed(entity, self._change_tick)
+
+    def modify_component(self, entity, component_type):
+        """Return the instance of ``component_type`` for the entity, as
+        :meth:`component_for_entity` does, and mark it changed, for the
+        caller to modify it.
+
+        :param entity: associated entity
+        :type entity: :class:`ecs.models.Entity`
+        :param component_type: a type of created component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :return: component instance
+        :rtype: :class:`ecs.models.Component`
+        :raises: :exc:`NonexistentComponentTypeForEntity` when
+            ``component_type`` does not exist on the given entity
+        """
+        component_instance = self.component_for_entity(entity, component_type)
+        self.mark_changed(entity, component_type)
+        return component_instance
+
+    def discard_changes(self, until):
+        """Forget the changes recorded up to tick ``until``, once every
+        reader has seen them, so that the change logs don't grow with the
+        number of removed components.
+
+        :param until: tick, as given by :attr:`change_tick`
+        :type until: :class:`int`
+        """
+        for changes in six.itervalues(self._changes):
+            changes.discard(until)
+
+    def _discard_indexed_changes(self, component_type, until):
+        """Forget the changes of ``component_type`` up to tick ``until``,
+        once read by its spatial index, if it is their only reader.
+        """
+        if component_type in self._indexed_changes:
+            self._changes[component_type].discard(until)
+
+    def on_add(self, component_type, callback):
+        """Register a callback called with ``(entity, component_instance)``
+        once a component of ``component_type`` has been added to an entity,
+        including when it replaces another one. For a columnar component
+        type, the callback gets a proxy, as :meth:`component_for_entity`
+        returns. Component types without callbacks are added without
+        overhead.
+
+        :param component_type: a type of component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param callback: callable taking an entity and a component
+        """
+        _add_hook(self._add_hooks, component_type, callback)
+
+    def on_remove(self, component_type, callback):
+        """Register a callback called with ``(entity, component_instance)``
+        just before a component of ``component_type`` is removed from an
+        entity, by :meth:`remove_component` or :meth:`remove_entity`, or
+        replaced by another one, e.g. to release the resources it holds. The
+        component is still in the database when the callback is called,
+        unless it is replaced: the callback is then called once the new
+        component is stored, with a copy of the replaced one for a columnar
+        type.
+
+        :param component_type: a type of component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param callback: callable taking an entity and a component
+        """
+        _add_hook(self._remove_hooks, component_type, callback)
+
+    def remove_hook(self, component_type, callback):
+        """Unregister a callback registered with :meth:`on_add` or
+        :meth:`on_remove` for ``component_type``. Does nothing if it isn't
+        registered.
+
+        :param component_type: a type of component
+        :type component_type: :class:`type` which is :class:`Component`
+            subclass
+        :param callback: registered callback
+        """
+        for hooks in (self._add_hooks, self._remove_hooks):
+            callbacks = tuple(
+                hook for hook in hooks.get(component_type, ())
+                if hook != callback)
+            if callbacks:
+                hooks[component_type] = callbacks
+            else:
+                hooks.pop(component_type, None)
+
+    def _call_add_hooks(self, entity, component_type):
+        hooks = self._add_hooks.get(component_type)
+        if hooks:
+            component_instance = self.component_for_entity(
+                entity, component_type)
+            for hook in hooks:
+                hook(entity, component_instance)
+
+    def _call_bulk_add_hooks(self, component_type, entities):
+        for entity in entities:
+            self._call_add_hooks(entity, component_type)
+
+    def _replaced_components(self, component_type, entities):
+        """Return ``(entity, component_instance)`` pairs of the components of
+        ``component_type`` which the entities have, about to be replaced,
+        for :meth:`_call_replaced_hooks`. Columnar components are copied,
+        since their rows are overwritten.
+        """
+        has_component = self.has_component
+        component_for_entity = self.component_for_entity
+        replaced = []
+        for entity in entities:
+            if has_component(entity, component_type):
+                component_instance = component_for_entity(
+                    entity, component_type)
+                if isinstance(component_instance, ColumnProxy):
+                    component_instance = component_instance.detach()
+                replaced.append((entity, component_instance))
+        return replaced
+
+    def _call_replaced_hooks(self, component_type, replaced):
+        """Call the remove hooks of the components returned by
+        :meth:`_replaced_components`, once their replacements are stored,
+        except those added again in their own place.
+        """
+        hooks = self._remove_hooks.get(component_type, ())
+        for entity, component_instance in replaced:
+            if self.component_for_entity(
+                    entity, component_type) is component_instance:
+                continue
+            for hook in hooks:
+                hook(entity, component_instance)
+
+    def _call_remove_hooks(self, entity, component_type):
+        """Call the remove hooks of the entity's component of
+        ``component_type``, if it has one.
+        """
+        hooks = self._remove_hooks.get(component_type)
+        if hooks and self.has_component(entity, component_type):
+            component_instance = self.component_for_entity(
+                entity, component_type)
+            for hook in hooks:
+                hook(entity, component_instance)
+
+    def _register_pool(self, component_type):
+        """Return the removed components of ``component_type`` to its pool,
+        if it has one of its own.
+        """
+        pool = getattr(component_type, 'pool', None)
+        if pool is not None and pool.component_type is component_type:
+            recycle = pool._recycle
+            if recycle not in self._remove_hooks.get(component_type, ()):
+                self.on_remove(component_type, recycle)
+
+    def _load_entities(self, generations, free_indices):
+        """Restore the entity allocation state of another manager, e.g. from
+        a snapshot, into this one, which must not have created entities.
+
+        :param generations: current generation of each index
+        :type generations: :class:`list` of :class:`int`
+        :param free_indices: indices available for reuse, oldest first
+        :type free_indices: :class:`list` of :class:`int`
+        """
+        if self._next_index:
+            raise ValueError('entities may only be loaded into an empty '
+                             'entity manager')
+        self._generations = list(generations)
+        self._next_index = len(self._generations)
+        self._free_indices = deque(free_indices)
+
+    def _patch_entities(self, next_index, indices, generations,
+                        taken_free, released):
+        """Bring the entity allocation state up to date with another
+        manager's, e.g. from a delta. The entities of indices whose
+        generation changed have been removed from the other manager, so they
+        are removed from this one.
+
+        :param next_index: lowest index never handed out
+        :type next_index: :class:`int`
+        :param indices: indices whose generation changed or which are new
+        :type indices: :class:`list` of :class:`int`
+        :param generations: new generation of each of ``indices``
+        :type generations: :class:`list` of :class:`int`
+        :param taken_free: number of free indices taken, oldest first
+        :type taken_free: :class:`int`
+        :param released: indices made available for reuse since, and still
+            available, oldest first
+        :type released: :class:`list` of :class:`int`
+        """
+        free_indices = self._free_indices
+        destroyed = [
+            entity for entity in (
+                Entity(self._generations[index] << ENTITY_INDEX_BITS | index)
+                for index in indices if index < self._next_index)
+            if self.is_alive(entity)]
+        for entity in destroyed:
+            self.remove_entity(entity)
+        # Their indices were released again, out of the other manager's
+        # order, which released lists.
+        for _ in destroyed:
+            free_indices.pop()
+        for _ in range(taken_free):
+            free_indices.popleft()
+        free_indices.extend(released)
+        if next_index > self._next_index:
+            self._generations.extend([0] * (next_index - self._next_index))
+            self._next_index = next_index
+        for index, generation in six.moves.zip(indices, generations):
+            self._generations[index] = generation
+
+    def _release_entity(self, entity):
+        """Make the index of a removed entity available for reuse."""
+        if self.is_alive(entity):
+            self._generations[entity.index] += 1
+            self._free_indices.append(entity.index)
+            self._released += 1
+
+
+def _add_hook(hooks, component_type, callback):
+    hooks[component_type] = hooks.get(component_type, ()) + (callback,)
+
+
+def _replaced_entities(changes, table, entities):
+    """Return the entities which already have a component in ``table``,
+    if changes are tracked, for :meth:`EntityManager._record_additions`.
+    """
+    if changes is None or table is None:
+        return frozenset()
+    return frozenset(entity for entity in entities if entity in table)
+
+
+def _fill_table(table, component_type, entities, instances, columns):
+    """Store the components of many entities in a table, as given to
+    :meth:`EntityManager.add_components_bulk`.
+    """
+    if columns is None:
+        instances = list(instances)
+        if len(instances) != len(entities):
+            raise ValueError('{0} entities given for {1} components'.format(
+                len(entities), len(instances)))
+        if type(table) is dict:
+            table.update(six.moves.zip(entities, instances))
+            return
+        if not isinstance(table, ComponentColumns):
+            for entity, component_instance in six.moves.zip(
+                    entities, instances):
+                table[entity] = component_instance
+            return
+        columns = dict(
+            (name, [getattr(component_instance, name)
+                    for component_instance in instances])
+            for name, _ in component_type.fields)
+    elif not isinstance(table, ComponentColumns):
+        raise TypeError('{0} is not a columnar component type'.format(
+            component_type.__name__))
+    table.set_many(entities, columns)
+
+
+def _is_coroutine_function(function):
+    # Coroutines only exist from Python 3.5 on.
+    iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', None)
+    return iscoroutinefunction is not None and iscoroutinefunction(function)
 
 
 class SystemManager(object):
     """A container and manager for :class:`ecs.models.System` objects."""
-    def __init__(self, entity_manager):
+    # Whether systems whose update() is a coroutine may be added.
+    _runs_coroutines = False
+
+    def __init__(self, entity_manager, sync=SYNC_SYSTEM):
         """:param entity_manager: this manager's entity manager
         :type entity_manager: :class:`SystemManager`
+        :param sync: when the commands recorded in :attr:`commands` are
+            applied, one of :data:`ecs.commands.SYNC_POINTS`
+        :type sync: :class:`str`
         """
+        if sync not in SYNC_POINTS:
+            raise ValueError('sync must be one of {0}'.format(
+                ', '.join(SYNC_POINTS)))
         self._systems = []
+        # Priorities of the systems, in the same order, to insert by
+        # bisection.
+        self._priorities = []
         self._system_types = {}
+        self._disabled = set()
         self._entity_manager = entity_manager
+        self._profiler = None
+        self._commands = CommandBuffer(entity_manager)
+        self._sync = sync
+        # Systems after which commands are flushed.
+        self._sync_points = frozenset()
+        # Schedules of the systems which don't run once per frame.
+        self._schedules = {}
+        self._frame = 0
+        # (update, schedule, sync point) tuples of the enabled systems, which
+        # update() iterates, built on first use after a change.
+        self._dispatch = None
 
     # Allow getting the list of systems but not directly setting it.
     @property
@@ -157,31 +1017,107 @@ class SystemManager(object):
         """
         return self._systems
 
-    def add_system(self, system_instance, priority=0):
-        """Add a :class:`ecs.models.System` instance to the manager.
+    @property
+    def commands(self):
+        """Get the buffer in which systems record structural changes to the
+        entity manager, applied at this manager's sync points. See
+        :mod:`ecs.commands`.
+
+        :rtype: :class:`ecs.commands.CommandBuffer`
+        """
+        return self._commands
+
+    def _systems_changed(self):
+        """Called when systems are added, removed, enabled or disabled."""
+        self._dispatch = None
+        self._update_sync_points()
+
+    def _update_sync_points(self):
+        disabled = self._disabled
+        systems = [system for system in self._systems
+                   if system not in disabled]
+        if self._sync == SYNC_SYSTEM:
+            sync_points = systems
+        elif self._sync == SYNC_PRIORITY:
+            sync_points = [
+                system for system, next_system
+                in zip(systems, systems[1:] + [None])
+                if next_system is None or
+                next_system.priority != system.priority]
+        else:
+            sync_points = systems[-1:]
+        self._sync_points = frozenset(sync_points)
+
+    def add_system(self, system_instance, priority=0, fixed_step=None,
+                   max_steps=5, interval=1):
+        """Add a :class:`ecs.models.System` instance to the manager. By
+        default, the system runs once per frame; see :mod:`ecs.scheduling`
+        for systems running at other rates.
 
         :param system_instance: instance of a system
         :param priority: non-negative integer (default: 0)
+        :param fixed_step: if given, the system runs with this delta time, as
+            many times per frame as the elapsed time allows
+        :param max_steps: maximum number of fixed steps run in a frame, the
+            excess time being dropped
+        :param interval: number of frames between runs of the system, which
+            is given the time elapsed since its previous run
         :type system_instance: :class:`ecs.models.System`
         :type priority: :class:`int`
+        :type fixed_step: :class:`float`
+        :type max_steps: :class:`int`
+        :type interval: :class:`int`
         :raises: :class:`ecs.exceptions.DuplicateSystemTypeError` when the
             system type is already present in this manager
         :raises: :class:`ecs.exceptions.SystemAlreadyAddedToManagerError` when
             the system already belongs to a system manager
+        :raises: :class:`ValueError` when both ``fixed_step`` and
+            ``interval`` are given, or either is not positive
+        :raises: :class:`TypeError` when the system's ``update()`` is a
+            coroutine, which only :class:`ecs.aio.AsyncSystemManager` runs
         """
         system_type = type(system_instance)
+        if not self._runs_coroutines and _is_coroutine_function(
+                system_type.update):
+            raise TypeError('{0} is an async system, which requires an '
+                            'AsyncSystemManager'.format(system_type.__name__))
         if system_type in self._system_types:
             raise DuplicateSystemTypeError(system_type)
         if system_instance.system_manager is not None:
             raise SystemAlreadyAddedToManagerError(
                 system_instance, self, system_instance.system_manager)
+        schedule = self._make_schedule(fixed_step, max_steps, interval)
         system_instance.entity_manager = self._entity_manager
         system_instance.system_manager = self
         self._system_types[system_type] = system_instance
-        self._systems.append(system_instance)
+        if schedule is not None:
+            self._schedules[system_instance] = schedule
 
         system_instance.priority = priority
-        self._systems.sort(key=lambda x: x.priority)
+        # After the systems of the same priority, which were added earlier.
+        index = bisect_right(self._priorities, priority)
+        self._systems.insert(index, system_instance)
+        self._priorities.insert(index, priority)
+        self._systems_changed()
+        if self._profiler is not None:
+            self._profiler.system_added(system_instance)
+
+    def _make_schedule(self, fixed_step, max_steps, interval):
+        if fixed_step is not None:
+            if interval != 1:
+                raise ValueError('fixed_step and interval are exclusive')
+            return FixedStep(fixed_step, max_steps)
+        if interval == 1:
+            return None
+        if interval < 1:
+            raise ValueError('interval must be positive')
+        # Spread systems of the same interval over the frames.
+        phases = [schedule.phase
+                  for schedule in six.itervalues(self._schedules)
+                  if isinstance(schedule, Interval) and
+                  schedule.interval == interval]
+        phase = min(range(interval), key=phases.count)
+        return Interval(interval, phase, self._frame)
 
     def remove_system(self, system_type):
         """Tell the manager to no longer run the system of this type.
@@ -190,24 +1126,148 @@ class SystemManager(object):
         :type system_type: :class:`type`
         """
         system = self._system_types[system_type]
+        if self._profiler is not None:
+            self._profiler.system_removed(system)
         system.entity_manager = None
         system.system_manager = None
-        self._systems.remove(system)
+        index = bisect_left(self._priorities, system.priority)
+        while self._systems[index] is not system:
+            index += 1
+        del self._systems[index]
+        del self._priorities[index]
         del self._system_types[system_type]
+        self._schedules.pop(system, None)
+        self._disabled.discard(system)
+        self._systems_changed()
+
+    def enable_system(self, system_type):
+        """Run the system of this type again, at its place in the order,
+        after it was disabled with :meth:`disable_system`. Does nothing if
+        it is enabled.
+
+        :param system_type: type of the system
+        :type system_type: :class:`type`
+        """
+        system = self._system_types[system_type]
+        if system in self._disabled:
+            self._disabled.remove(system)
+            self._systems_changed()
+
+    def disable_system(self, system_type):
+        """Stop running the system of this type without removing it, which
+        is cheaper than removing and adding it again. Its schedule, if any,
+        is paused.
+
+        :param system_type: type of the system
+        :type system_type: :class:`type`
+        """
+        system = self._system_types[system_type]
+        if system not in self._disabled:
+            self._disabled.add(system)
+            self._systems_changed()
+
+    def is_enabled(self, system_type):
+        """Return whether the system of this type is run.
+
+        :param system_type: type of the system
+        :type system_type: :class:`type`
+        :rtype: :class:`bool`
+        """
+        return self._system_types[system_type] not in self._disabled
+
+    def schedule(self, system_type):
+        """Get the schedule of the system of this type, e.g. to interpolate
+        rendering with :attr:`ecs.scheduling.FixedStep.alpha`.
+
+        :param system_type: type of the system
+        :type system_type: :class:`type`
+        :return: the system's schedule, or ``None`` if it runs once per
+            frame
+        :rtype: :class:`ecs.scheduling.FixedStep` or
+            :class:`ecs.scheduling.Interval`
+        """
+        return self._schedules.get(self._system_types[system_type])
+
+    @property
+    def profiler(self):
+        """Get the profiler of this manager, or ``None`` if profiling is
+        disabled.
+
+        :rtype: :class:`ecs.profiling.Profiler`
+        """
+        return self._profiler
+
+    def enable_profiling(self, window=300, report=None, report_interval=None):
+        """Start recording the wall and CPU time of each frame and of each
+        system's ``update()``. The methods are replaced by timing wrappers
+        until :meth:`disable_profiling` is called, so profiling costs nothing
+        while disabled. Does nothing but return the current profiler if
+        profiling is already enabled.
+
+        :param window: number of latest frames kept for statistics
+        :type window: :class:`int`
+        :param report: callable called with the profiler every
+            ``report_interval`` frames
+        :type report: callable
+        :param report_interval: number of frames between reports, by default
+            ``window``
+        :type report_interval: :class:`int`
+        :return: the profiler
+        :rtype: :class:`ecs.profiling.Profiler`
+        """
+        if self._profiler is None:
+            self._profiler = Profiler(self, window, report, report_interval)
+            self._profiler.install()
+            # The dispatch holds the replaced methods.
+            self._dispatch = None
+        return self._profiler
+
+    def disable_profiling(self):
+        """Stop recording timings and restore the original ``update()``
+        methods. The profiler, returned by :meth:`enable_profiling`, keeps
+        its timings.
+        """
+        if self._profiler is not None:
+            self._profiler.uninstall()
+            self._profiler = None
+            self._dispatch = None
+
+    def _build_dispatch(self):
+        disabled = self._disabled
+        schedules = self._schedules
+        sync_points = self._sync_points
+        self._dispatch = tuple(
+            (system.update, schedules.get(system), system in sync_points)
+            for system in self._systems if system not in disabled)
+        return self._dispatch
 
     def update(self, dt):
-        """Run each system's ``update()`` method for this frame. The systems
-        are run in the order in which they were added.
+        """Run each enabled system's ``update()`` method for this frame. The
+        systems are run in the order in which they were added, those with a
+        schedule as many times as it tells, possibly none. Recorded commands
+        are applied at each sync point.
 
         :param dt: delta time, or elapsed time for this frame
         :type dt: :class:`float`
         """
-        # Iterating over a list of systems instead of values in a dictionary is
-        # noticeably faster. We maintain a list in addition to a dictionary
-        # specifically for this purpose.
+        # Iterating over a tuple of bound methods instead of values in a
+        # dictionary, or systems whose methods are looked up, is noticeably
+        # faster. The tuple is rebuilt whenever systems change, and whenever
+        # profiling replaces their methods.
         #
         # Though initially we had the entity manager being passed through to
         # each update() method, this turns out to cause quite a large
         # performance penalty. So now it is just set on each system.
-        for system in self._systems:
-            system.update(dt)
+        dispatch = self._dispatch
+        if dispatch is None:
+            dispatch = self._build_dispatch()
+        commands = self._commands
+        self._frame += 1
+        for update, schedule, sync_point in dispatch:
+            if schedule is None:
+                update(dt)
+            else:
+                for step in schedule.plan(dt):
+                    update(step)
+            if sync_point and commands:
+                commands.flush()
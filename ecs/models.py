@@ -5,15 +5,42 @@ from abc import ABCMeta, abstractmethod
 import six
 
 
+ENTITY_INDEX_BITS = 32
+"""Number of low bits of an entity GUID which hold the entity's index. The
+remaining high bits hold its generation."""
+_ENTITY_INDEX_MASK = (1 << ENTITY_INDEX_BITS) - 1
+
+
 class Entity(object):
     __slots__ = ("_guid",)
-    """Encapsulation of a GUID to use in the entity database."""
+    """Encapsulation of a GUID to use in the entity database. The GUID packs
+    a small, dense index, which may be reused once the entity is removed, and
+    a generation counter which tells apart successive users of an index.
+    """
     def __init__(self, guid):
         """:param guid: globally unique identifier
         :type guid: :class:`int`
         """
         self._guid = guid
 
+    @property
+    def index(self):
+        """Get the index part of this entity's GUID. Indices are reused by
+        the entity manager, which keeps them small and dense.
+
+        :rtype: :class:`int`
+        """
+        return self._guid & _ENTITY_INDEX_MASK
+
+    @property
+    def generation(self):
+        """Get the generation part of this entity's GUID, i.e., how many
+        times its index had been reused when it was created.
+
+        :rtype: :class:`int`
+        """
+        return self._guid >> ENTITY_INDEX_BITS
+
     def __repr__(self):
         return '{0}({1})'.format(type(self).__name__, self._guid)
 
@@ -23,10 +50,162 @@ class Entity(object):
     def __eq__(self, other):
         return self._guid == hash(other)
 
+    def __ne__(self, other):
+        # Not derived from __eq__() on Python 2.
+        return not self == other
+
 
 class Component(object):
-    """Class from which all components should derive."""
-    pass
+    """Class from which all components should derive. It has no instance
+    dictionary of its own, so subclasses declaring ``__slots__``, e.g. with
+    :func:`slotted`, are compact.
+    """
+    __slots__ = ()
+
+    storage = None
+    """Factory of the table in which an entity manager stores the components
+    of this type, called with the component type. The table must behave like
+    a :class:`dict` mapping entities to components. ``None``, the default,
+    selects a plain :class:`dict`; see :mod:`ecs.storage` for alternatives.
+    """
+    pool = None
+    """:class:`ecs.pooling.ComponentPool` to which entity managers return
+    the removed components of this type, or ``None``, the default, to leave
+    them to the garbage collector. See :mod:`ecs.pooling`.
+    """
+
+
+# Mutable defaults would be shared by all instances.
+_MUTABLE_DEFAULTS = (list, dict, set, bytearray)
+
+
+def slotted(component_type):
+    """Class decorator turning the class attributes of a component type into
+    fields stored in ``__slots__``. Instances then have no ``__dict__``,
+    which makes them much smaller and their attributes faster to access. An
+    ``__init__()`` taking the fields positionally or by name, in the order
+    listed by ``__fields__``, and defaulting to the class attribute values is
+    generated, along with ``__eq__()`` and ``__repr__()``:
+
+    .. code-block:: python
+
+        @slotted
+        class Position(Component):
+            __fields__ = ('x', 'y')
+            x = 0.0
+            y = 0.0
+
+        Position(1.0, y=2.0)
+
+    ``__fields__`` is required when the class defines more than one new
+    field, since class attributes aren't ordered on every supported Python.
+    Fields of slotted base classes come first; a subclass may redefine one
+    of them to change its default. Methods, properties and the
+    :attr:`Component.storage` and :attr:`Component.pool` settings are not
+    fields. Instances compare equal when they are of the same type and their
+    fields are equal, and are therefore not hashable.
+
+    :param component_type: component type to convert, which must derive from
+        :class:`Component`
+    :type component_type: :class:`type`
+    :return: a new class replacing ``component_type``
+    :rtype: :class:`type`
+    :raises: :exc:`ValueError` when a default value is a mutable
+        collection, which would be shared by all instances, when the order
+        of the fields isn't given by ``__fields__``, or when the class
+        declares its own ``__slots__``
+    """
+    if '__slots__' in component_type.__dict__:
+        raise ValueError('{0} declares __slots__, which slotted '
+                         'generates'.format(component_type.__name__))
+    attributes = {}
+    namespace = {}
+    for name, value in six.iteritems(dict(component_type.__dict__)):
+        if name in ('__dict__', '__weakref__', '__fields__'):
+            continue
+        if _is_field(name, value):
+            if isinstance(value, _MUTABLE_DEFAULTS):
+                raise ValueError(
+                    "mutable default for field `{0}' of {1}".format(
+                        name, component_type.__name__))
+            attributes[name] = value
+        else:
+            namespace[name] = value
+    # Redefined fields of base classes keep their place and slot.
+    inherited = getattr(component_type, 'field_defaults', ())
+    defaults = dict(inherited)
+    own_fields = [(name, attributes[name]) for name in _field_order(
+        component_type, attributes, defaults)]
+    new_fields = [(name, value) for name, value in own_fields
+                  if name not in defaults]
+    defaults.update(own_fields)
+    field_defaults = tuple(
+        (name, defaults[name]) for name, _ in inherited) + tuple(new_fields)
+    names = [name for name, _ in field_defaults]
+    namespace.update(
+        __slots__=tuple(name for name, _ in new_fields),
+        field_defaults=field_defaults,
+        __init__=_make_init(names, field_defaults),
+        __eq__=_make_eq(names),
+        __ne__=lambda self, other: not self == other,
+        __hash__=None,
+        __repr__=_make_repr(names))
+    return type(component_type)(
+        component_type.__name__, component_type.__bases__, namespace)
+
+
+def _field_order(component_type, attributes, inherited):
+    order = component_type.__dict__.get('__fields__')
+    if order is None:
+        # Redefined fields keep their place, so only new ones need ordering.
+        if len([name for name in attributes if name not in inherited]) > 1:
+            raise ValueError('{0} must list its fields in __fields__'.format(
+                component_type.__name__))
+        return list(attributes)
+    order = tuple(order)
+    if len(set(order)) != len(order) or set(order) != set(attributes):
+        raise ValueError(
+            '__fields__ of {0} must name each of its fields once'.format(
+                component_type.__name__))
+    return order
+
+
+def _is_field(name, value):
+    return not (
+        name.startswith('__') or
+        name in ('storage', 'pool', 'field_defaults') or
+        callable(value) or
+        isinstance(value, (property, classmethod, staticmethod)))
+
+
+def _make_init(names, field_defaults):
+    # The method is compiled rather than looping over the fields, so that it
+    # runs as fast as a hand-written one.
+    namespace = dict(
+        ('_default_' + name, default) for name, default in field_defaults)
+    source = 'def __init__(self{0}):\n{1}    pass\n'.format(
+        ''.join(', {0}=_default_{0}'.format(name) for name in names),
+        ''.join('    self.{0} = {0}\n'.format(name) for name in names))
+    six.exec_(source, namespace)
+    return namespace['__init__']
+
+
+def _make_eq(names):
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        for name in names:
+            if getattr(self, name) != getattr(other, name):
+                return False
+        return True
+    return __eq__
+
+
+def _make_repr(names):
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, ', '.join(
+            '{0}={1!r}'.format(name, getattr(self, name)) for name in names))
+    return __repr__
 
 
 @six.add_metaclass(ABCMeta)
@@ -34,6 +213,17 @@ class System(object):
     """An object that represents an operation on a set of objects from the game
     database. The :meth:`update` method must be implemented.
     """
+    reads = None
+    """Component types which the system reads but does not modify, as a
+    collection of types. Along with :attr:`writes`, this lets
+    :class:`ecs.parallel.ParallelSystemManager` run systems concurrently when
+    their accesses don't conflict. ``None``, the default, means undeclared:
+    the system is then assumed to conflict with every other system."""
+    writes = None
+    """Component types which the system modifies, as a collection of types.
+    Adding or removing components counts as modifying them. See
+    :attr:`reads`."""
+
     def __init__(self):
         self.entity_manager = None
         """This system's entity manager. It is set for each system when it is
@@ -49,6 +239,16 @@ class System(object):
         :meth:`ecs.managers.SystemManager.update()`. Must be a non-negative
         integer with 0 being the highest priority."""
 
+    @property
+    def commands(self):
+        """Get the command buffer of this system's system manager, in which
+        structural changes are recorded to be applied later. See
+        :mod:`ecs.commands`.
+
+        :rtype: :class:`ecs.commands.CommandBuffer`
+        """
+        return self.system_manager.commands
+
     @abstractmethod
     def update(self, dt):
         """Run the system for this frame. This method is called by the system
@@ -0,0 +1,332 @@
+"""System manager running non-conflicting systems concurrently."""
+
+from abc import abstractmethod
+
+try:
+    from concurrent.futures import (
+        ProcessPoolExecutor, ThreadPoolExecutor, wait)
+except ImportError:  # Python 2 without the futures backport
+    ProcessPoolExecutor = ThreadPoolExecutor = None
+
+from ecs.columns import attach_columns
+from ecs.commands import SYNC_FRAME, SYNC_SYSTEM
+from ecs.managers import SystemManager
+from ecs.models import System
+
+
+class ProcessSystem(System):
+    """System whose work is done by a :meth:`kernel` operating on the NumPy
+    columns of the columnar component types (see :mod:`ecs.columns`) it
+    declares in :attr:`reads` and :attr:`writes`. A
+    :class:`ParallelSystemManager` runs it in a worker process, on columns
+    moved to shared memory, so that CPU-bound work is not held back by the
+    GIL and no entity state is pickled. Under any other system manager, the
+    kernel runs in the calling process.
+
+    The kernel must be picklable, e.g. a static method:
+
+    .. code-block:: python
+
+        class Integration(ProcessSystem):
+            reads = (Velocity,)
+            writes = (Position,)
+
+            @staticmethod
+            def kernel(columns, dt):
+                columns[Position]['x'] += columns[Velocity]['dx'] * dt
+
+    The columns of types which are only read are read-only. Row ``i`` of
+    every column belongs to the entity whose index is ``i``, so the columns
+    of different types line up.
+    """
+    reads = ()
+    writes = ()
+
+    @staticmethod
+    @abstractmethod
+    def kernel(columns, dt):
+        """Run the system for this frame. It must be implemented as a static
+        method.
+
+        :param columns: mapping of each declared component type to a mapping
+            of field name to the array of its live rows
+        :type columns: :class:`dict`
+        :param dt: delta time, or elapsed time for this frame
+        :type dt: :class:`float`
+        """
+
+    def _component_types(self):
+        """Return ``(component type, writable)`` pairs of the declared
+        types.
+        """
+        writes = tuple(self.writes)
+        return [(type_, True) for type_ in writes] + [
+            (type_, False) for type_ in self.reads if type_ not in writes]
+
+    def update(self, dt):
+        """Run the kernel in this process."""
+        columns = {}
+        for component_type, writable in self._component_types():
+            store = self.entity_manager.columns(component_type)
+            arrays = columns[component_type] = dict(
+                (name, store.column(name))
+                for name, _ in component_type.fields)
+            if not writable:
+                for array in arrays.values():
+                    array.flags.writeable = False
+        self.kernel(columns, dt)
+
+    def shared_columns(self):
+        """Move the declared column stores to shared memory, if they aren't
+        already, and return what a worker process needs to attach to them.
+        The stores are referenced by the system until the next call, so that
+        those of types without components, which aren't part of the entity
+        manager, keep their shared memory while the worker uses it.
+
+        :return: ``(component type, descriptors, writable)`` tuples
+        :rtype: :class:`list`
+        """
+        shared_columns = []
+        stores = []
+        for component_type, writable in self._component_types():
+            store = self.entity_manager.columns(component_type)
+            store.share()
+            stores.append(store)
+            shared_columns.append(
+                (component_type, store.shared_columns(), writable))
+        self._shared_stores = stores
+        return shared_columns
+
+
+def _run_kernel(kernel, shared_columns, steps):
+    """Run a :class:`ProcessSystem` kernel in a worker process, once for
+    each delta time of ``steps``.
+    """
+    columns = {}
+    for component_type, descriptors, writable in shared_columns:
+        arrays = columns[component_type] = attach_columns(
+            component_type, descriptors)
+        if not writable:
+            for array in arrays.values():
+                array.flags.writeable = False
+    for dt in steps:
+        kernel(columns, dt)
+
+
+def _run_steps(system, steps):
+    for dt in steps:
+        system.update(dt)
+
+
+def systems_conflict(system_a, system_b):
+    """Return whether two systems may not run at the same time, based on
+    their declared :attr:`ecs.models.System.reads` and
+    :attr:`ecs.models.System.writes`. Systems which don't declare both are
+    assumed to conflict with everything.
+
+    :type system_a: :class:`ecs.models.System`
+    :type system_b: :class:`ecs.models.System`
+    :rtype: :class:`bool`
+    """
+    for system in (system_a, system_b):
+        if system.reads is None or system.writes is None:
+            return True
+    writes_a = frozenset(system_a.writes)
+    writes_b = frozenset(system_b.writes)
+    return bool(
+        writes_a & writes_b or
+        writes_a.intersection(system_b.reads) or
+        writes_b.intersection(system_a.reads))
+
+
+class ParallelSystemManager(SystemManager):
+    """System manager which runs systems whose declared component accesses
+    don't conflict at the same time, on a thread pool.
+
+    A dependency graph is built from the systems' declarations: each system
+    depends on every system of higher priority (or of the same priority but
+    added earlier) with which it conflicts. Systems are then grouped into
+    stages, each one holding the systems whose dependencies all belong to
+    earlier stages. Stages run one after another, the systems of a stage
+    concurrently. Conflicting systems therefore still run in priority order.
+
+    Running on threads only pays off for systems which release the GIL, e.g.
+    by spending their time in NumPy, or on a free-threaded Python.
+    :class:`ProcessSystem` instances are instead run in worker processes,
+    working directly on shared memory. Since systems of a stage don't write
+    the same component types, their writes are all in place, in a
+    deterministic state, once the stage is done.
+
+    Since the entity manager is not thread-safe, concurrently running systems
+    must not add or remove components or entities themselves. They record
+    such changes in :attr:`commands` instead, which are applied after each
+    stage, or once at the end of the frame if ``sync`` is
+    :data:`ecs.commands.SYNC_FRAME`.
+    """
+    def __init__(self, entity_manager, executor=None, max_workers=None,
+                 process_executor=None, max_processes=None,
+                 sync=SYNC_SYSTEM):
+        """:param entity_manager: this manager's entity manager
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param executor: executor on which to run systems, by default a
+            :class:`concurrent.futures.ThreadPoolExecutor` created on first
+            use and owned by this manager
+        :type executor: :class:`concurrent.futures.Executor`
+        :param max_workers: number of threads of the default executor, by
+            default enough to run the widest stage at once
+        :type max_workers: :class:`int`
+        :param process_executor: executor on which to run
+            :class:`ProcessSystem` kernels, by default a
+            :class:`concurrent.futures.ProcessPoolExecutor` created on first
+            use and owned by this manager
+        :type process_executor: :class:`concurrent.futures.Executor`
+        :param max_processes: number of processes of the default process
+            executor
+        :type max_processes: :class:`int`
+        :param sync: when recorded commands are applied, one of
+            :data:`ecs.commands.SYNC_POINTS`; both :data:`SYNC_SYSTEM` and
+            :data:`SYNC_PRIORITY` apply them after each stage
+        :type sync: :class:`str`
+        """
+        super(ParallelSystemManager, self).__init__(entity_manager, sync)
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._max_workers = max_workers
+        self._process_executor = process_executor
+        self._owns_process_executor = process_executor is None
+        self._max_processes = max_processes
+        self._stages = None
+        # Number of threads of the default executor.
+        self._executor_size = 0
+
+    def _systems_changed(self):
+        super(ParallelSystemManager, self)._systems_changed()
+        self._stages = None
+
+    @property
+    def stages(self):
+        """Get the stages in which the enabled systems are run, computed
+        whenever systems are added, removed, enabled or disabled.
+
+        :return: stages in run order, each a tuple of systems which run
+            concurrently
+        :rtype: :class:`list` of :class:`tuple` of :class:`ecs.models.System`
+        """
+        if self._stages is None:
+            self._stages = self._schedule()
+            # The default thread pool is sized after the stages, and only
+            # replaced when too small, so that toggling systems is cheap.
+            if (self._owns_executor and self._executor is not None and
+                    self._max_workers is None and
+                    self._threads_needed() > self._executor_size):
+                self._executor.shutdown()
+                self._executor = None
+        return self._stages
+
+    def _schedule(self):
+        systems = [system for system in self._systems
+                   if system not in self._disabled]
+        stage_numbers = []
+        stages = []
+        for i, system in enumerate(systems):
+            number = 1 + max([-1] + [
+                stage_numbers[j] for j in range(i)
+                if systems_conflict(systems[j], system)])
+            stage_numbers.append(number)
+            if number == len(stages):
+                stages.append([])
+            stages[number].append(system)
+        return [tuple(stage) for stage in stages]
+
+    def _get_executor(self):
+        if self._executor is None:
+            if ThreadPoolExecutor is None:
+                raise ImportError(
+                    'concurrent.futures is required to run systems in '
+                    'parallel')
+            self._executor_size = self._max_workers or self._threads_needed()
+            self._executor = ThreadPoolExecutor(self._executor_size)
+        return self._executor
+
+    def _threads_needed(self):
+        """Return the number of threads needed to run the widest stage at
+        once, the calling thread running one of its systems.
+        """
+        return max([1] + [
+            sum(1 for system in stage
+                if not isinstance(system, ProcessSystem)) - 1
+            for stage in self.stages])
+
+    def _get_process_executor(self):
+        if self._process_executor is None:
+            if ProcessPoolExecutor is None:
+                raise ImportError(
+                    'concurrent.futures is required to run systems in '
+                    'parallel')
+            self._process_executor = ProcessPoolExecutor(self._max_processes)
+        return self._process_executor
+
+    def _submit(self, system, steps):
+        if isinstance(system, ProcessSystem):
+            return self._get_process_executor().submit(
+                _run_kernel, system.kernel, system.shared_columns(), steps)
+        return self._get_executor().submit(_run_steps, system, steps)
+
+    def update(self, dt):
+        """Run each system's ``update()`` method for this frame, stage by
+        stage. The systems of a stage run concurrently: every
+        :class:`ProcessSystem` in a worker process, the other systems on
+        threads, except for one of them which the calling thread runs itself.
+        An exception raised by a system is re-raised once the whole stage is
+        done. Recorded commands are applied after each stage, or at the end
+        of the frame.
+
+        :param dt: delta time, or elapsed time for this frame
+        :type dt: :class:`float`
+        """
+        commands = self._commands
+        sync_stages = self._sync != SYNC_FRAME
+        self._frame += 1
+        for stage in self.stages:
+            self._run_stage(stage, dt)
+            if commands and sync_stages:
+                commands.flush()
+        if commands:
+            commands.flush()
+
+    def _run_stage(self, stage, dt):
+        schedules = self._schedules
+        steps = {}
+        for system in stage:
+            schedule = schedules.get(system)
+            steps[system] = (dt,) if schedule is None else schedule.plan(dt)
+        stage = [system for system in stage if steps[system]]
+        inline_system = None
+        for system in stage:
+            if not isinstance(system, ProcessSystem):
+                inline_system = system
+                break
+        if len(stage) == 1 and inline_system is not None:
+            _run_steps(inline_system, steps[inline_system])
+            return
+        futures = [self._submit(system, steps[system]) for system in stage
+                   if system is not inline_system]
+        try:
+            if inline_system is not None:
+                _run_steps(inline_system, steps[inline_system])
+        finally:
+            wait(futures)
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        """Shut down the executors created by this manager, if any. They are
+        created again if the manager is updated afterwards.
+        """
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if (self._owns_process_executor and
+                self._process_executor is not None):
+            self._process_executor.shutdown()
+            self._process_executor = None
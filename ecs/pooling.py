@@ -0,0 +1,101 @@
+"""Recycling of component instances.
+
+Components which are created and thrown away at a high rate, such as
+projectiles or particles, may be pooled to cut allocations and garbage
+collections. An entity manager returns the pooled components it removes to
+the pool of their type, from which new ones are taken:
+
+.. code-block:: python
+
+    @pooled(capacity=10000)
+    @slotted
+    class Projectile(Component):
+        __fields__ = ('x', 'y')
+        x = 0.0
+        y = 0.0
+
+    entity_manager.add_component(entity, Projectile.pool.acquire(x, y))
+
+A recycled instance is initialized again by calling its ``__init__()``, so
+``__init__()`` must set every attribute. :func:`pooled` must be applied
+after :func:`ecs.models.slotted`, which replaces the class. Components
+returned to the pool must not be used anymore, so references to them must
+not be kept after they are removed from the entity manager.
+"""
+
+
+class ComponentPool(object):
+    """Free list of instances of one component type, reused by
+    :meth:`acquire` instead of allocating new ones.
+    """
+    __slots__ = ('component_type', 'capacity', '_free')
+
+    def __init__(self, component_type, capacity):
+        """:param component_type: type of the pooled components
+        :type component_type: :class:`type` which is
+            :class:`ecs.models.Component` subclass
+        :param capacity: maximum number of free instances kept
+        :type capacity: :class:`int`
+        """
+        self.component_type = component_type
+        self.capacity = capacity
+        """Maximum number of free instances kept. Instances released once
+        the pool is full are left to the garbage collector."""
+        self._free = []
+
+    def __len__(self):
+        """Return the number of free instances."""
+        return len(self._free)
+
+    def acquire(self, *args, **kwargs):
+        """Return a component, recycled if a free one is available, and
+        initialized with the given arguments.
+
+        :rtype: :class:`ecs.models.Component`
+        """
+        if self._free:
+            component_instance = self._free.pop()
+            component_instance.__init__(*args, **kwargs)
+            return component_instance
+        return self.component_type(*args, **kwargs)
+
+    def release(self, component_instance):
+        """Return a component which is not used anymore to the pool, unless
+        it is full. Instances of other types, e.g. of subclasses, are not
+        kept.
+
+        :param component_instance: component to recycle
+        :type component_instance: :class:`ecs.models.Component`
+        """
+        if (len(self._free) < self.capacity and
+                type(component_instance) is self.component_type):
+            self._free.append(component_instance)
+
+    def _recycle(self, entity, component_instance):
+        """Release a component removed from an entity, as an
+        :meth:`ecs.managers.EntityManager.on_remove` hook.
+        """
+        self.release(component_instance)
+
+    def clear(self):
+        """Drop the free instances."""
+        del self._free[:]
+
+    def __repr__(self):
+        return '<{0} of {1}: {2}/{3}>'.format(
+            type(self).__name__, self.component_type.__name__,
+            len(self._free), self.capacity)
+
+
+def pooled(capacity):
+    """Return a class decorator giving a component type a
+    :class:`ComponentPool` of the given capacity, as its
+    :attr:`ecs.models.Component.pool` attribute.
+
+    :param capacity: maximum number of free instances kept
+    :type capacity: :class:`int`
+    """
+    def decorate(component_type):
+        component_type.pool = ComponentPool(component_type, capacity)
+        return component_type
+    return decorate
@@ -0,0 +1,243 @@
+"""Opt-in instrumentation of system managers.
+
+Profiling is enabled with :meth:`ecs.managers.SystemManager.enable_profiling`,
+which replaces the ``update()`` methods of the manager and of its systems by
+timing wrappers. Nothing is checked in the frame loop: once profiling is
+disabled, the original methods are restored and cost exactly what they did
+before.
+
+.. code-block:: python
+
+    def report(profiler):
+        for name, timings in sorted(profiler.summary()['systems'].items()):
+            print(name, timings['wall']['p95'])
+
+    system_manager.enable_profiling(report=report, report_interval=300)
+"""
+
+import math
+import time
+from collections import deque
+
+import six
+
+_wall_clock = getattr(time, 'perf_counter', time.time)
+# CPU time of the calling thread where available, so that systems run on a
+# thread pool are measured separately.
+_cpu_clock = (getattr(time, 'thread_time', None) or
+              getattr(time, 'process_time', None) or time.clock)
+_process_cpu_clock = getattr(time, 'process_time', None) or _cpu_clock
+
+
+class RollingTimings(object):
+    """Durations of the latest samples of a measurement, from which
+    percentiles are computed on demand.
+    """
+    __slots__ = ('_samples',)
+
+    def __init__(self, window):
+        """:param window: number of latest samples kept
+        :type window: :class:`int`
+        """
+        self._samples = deque(maxlen=window)
+
+    def record(self, duration):
+        """Add a sample, dropping the oldest one if the window is full.
+
+        :param duration: duration in seconds
+        :type duration: :class:`float`
+        """
+        self._samples.append(duration)
+
+    def __len__(self):
+        return len(self._samples)
+
+    @property
+    def last(self):
+        """Get the latest sample, or ``None`` if there are none.
+
+        :rtype: :class:`float`
+        """
+        return self._samples[-1] if self._samples else None
+
+    @property
+    def max(self):
+        """Get the largest sample in the window, or ``None`` if there are
+        none.
+
+        :rtype: :class:`float`
+        """
+        return max(self._samples) if self._samples else None
+
+    def percentile(self, percent):
+        """Return the nearest-rank percentile of the samples in the window,
+        or ``None`` if there are none.
+
+        :param percent: percentile, between 0 and 100
+        :type percent: :class:`float`
+        :rtype: :class:`float`
+        """
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        rank = int(math.ceil(percent / 100.0 * len(samples)))
+        return samples[min(max(rank, 1), len(samples)) - 1]
+
+    def summary(self):
+        """Return the statistics of the window.
+
+        :return: mapping of ``'count'``, ``'p50'``, ``'p95'``, ``'p99'`` and
+            ``'max'`` to their values
+        :rtype: :class:`dict`
+        """
+        return {
+            'count': len(self._samples),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+    def __repr__(self):
+        return '{0}(count={1}, p50={2}, max={3})'.format(
+            type(self).__name__, len(self._samples), self.percentile(50),
+            self.max)
+
+
+class SystemTimings(object):
+    """Wall and CPU time of the latest runs of one system, or frames."""
+    __slots__ = ('wall', 'cpu')
+
+    def __init__(self, window):
+        """:param window: number of latest samples kept
+        :type window: :class:`int`
+        """
+        self.wall = RollingTimings(window)
+        """Wall time, as :class:`RollingTimings`."""
+        self.cpu = RollingTimings(window)
+        """CPU time, as :class:`RollingTimings`."""
+
+    def summary(self):
+        """Return the statistics of both measurements.
+
+        :return: mapping of ``'wall'`` and ``'cpu'`` to the summary of each
+            :class:`RollingTimings`
+        :rtype: :class:`dict`
+        """
+        return {'wall': self.wall.summary(), 'cpu': self.cpu.summary()}
+
+
+class Profiler(object):
+    """Timings of the frames of a system manager and of each of its systems.
+    Profilers are not to be instantiated directly; use
+    :meth:`ecs.managers.SystemManager.enable_profiling` instead.
+    """
+    def __init__(self, system_manager, window=300, report=None,
+                 report_interval=None):
+        """:param system_manager: profiled system manager
+        :type system_manager: :class:`ecs.managers.SystemManager`
+        :param window: number of latest frames kept for statistics
+        :type window: :class:`int`
+        :param report: callable called with this profiler every
+            ``report_interval`` frames
+        :type report: callable
+        :param report_interval: number of frames between reports, by default
+            ``window``
+        :type report_interval: :class:`int`
+        """
+        self.system_manager = system_manager
+        self.window = window
+        self.report = report
+        self.report_interval = report_interval or window
+        self.frames = 0
+        """Number of frames run since profiling was enabled."""
+        self.frame = SystemTimings(window)
+        """Timings of whole frames. Their CPU time is that of the process, so
+        it includes the work of systems run on other threads."""
+        self.systems = {}
+        """Mapping of system type to its :class:`SystemTimings`."""
+        # Instance attributes shadowed by the wrappers, if any, by object.
+        self._shadowed = {}
+
+    def install(self):
+        """Wrap the ``update()`` methods of the manager and its systems."""
+        self._wrap(self.system_manager, self._frame_wrapper)
+        for system in self.system_manager.systems:
+            self.system_added(system)
+
+    def uninstall(self):
+        """Restore the ``update()`` methods of the manager and its
+        systems.
+        """
+        for system in self.system_manager.systems:
+            self.system_removed(system)
+        self._unwrap(self.system_manager)
+
+    def system_added(self, system):
+        """Start timing a system added to the manager."""
+        timings = self.systems.get(type(system))
+        if timings is None:
+            timings = self.systems[type(system)] = SystemTimings(self.window)
+        self._wrap(system, lambda update: _timed(update, timings))
+
+    def system_removed(self, system):
+        """Stop timing a system removed from the manager. Its timings are
+        kept.
+        """
+        self._unwrap(system)
+
+    def _wrap(self, obj, wrapper):
+        self._shadowed[id(obj)] = vars(obj).get('update')
+        obj.update = wrapper(obj.update)
+
+    def _unwrap(self, obj):
+        shadowed = self._shadowed.pop(id(obj), None)
+        if shadowed is None:
+            del obj.update
+        else:
+            obj.update = shadowed
+
+    def _frame_wrapper(self, update):
+        wall = self.frame.wall.record
+        cpu = self.frame.cpu.record
+
+        def profiled_update(dt):
+            wall_start = _wall_clock()
+            cpu_start = _process_cpu_clock()
+            update(dt)
+            cpu(_process_cpu_clock() - cpu_start)
+            wall(_wall_clock() - wall_start)
+            self.frames += 1
+            if (self.report is not None and
+                    self.frames % self.report_interval == 0):
+                self.report(self)
+        return profiled_update
+
+    def summary(self):
+        """Return the statistics of frames and systems over the window.
+
+        :return: mapping of ``'frames'`` to the number of frames run,
+            ``'frame'`` to the summary of frame timings, and ``'systems'``
+            to a mapping of system type name to the summary of its timings
+        :rtype: :class:`dict`
+        """
+        return {
+            'frames': self.frames,
+            'frame': self.frame.summary(),
+            'systems': dict(
+                (system_type.__name__, timings.summary())
+                for system_type, timings in six.iteritems(self.systems)),
+        }
+
+
+def _timed(update, timings):
+    wall = timings.wall.record
+    cpu = timings.cpu.record
+
+    def timed_update(dt):
+        wall_start = _wall_clock()
+        cpu_start = _cpu_clock()
+        update(dt)
+        cpu(_cpu_clock() - cpu_start)
+        wall(_wall_clock() - wall_start)
+    return timed_update
@@ -0,0 +1,432 @@
+"""Replication of the state of an entity manager to remote clients.
+
+A :class:`ReplicationServer` keeps, for each client, the state of the
+replicated components as last sent to it, and encodes compact binary
+messages holding only what differs from it: the entities which appeared and
+disappeared, the components which were removed, and for each changed
+component, a bit mask of its changed fields followed by their new values.
+Fields are quantized to integers, and each value is sent as the difference
+with the previous one, as a variable-length integer. A
+:class:`ReplicationClient` applies these messages to its own entity manager:
+
+.. code-block:: python
+
+    schema = ReplicationSchema()
+    schema.register(Position, precision={'x': 0.01, 'y': 0.01})
+    schema.register(Health)
+
+    server = ReplicationServer(world, schema)
+    server.add_client(client_id)
+    ...
+    connection.send(server.encode(client_id))  # each tick
+
+    client = ReplicationClient(client_world, schema)
+    ...
+    client.apply(connection.receive())
+
+Changes are found with the change tracking of the server's entity manager
+(see :mod:`ecs.changes`), so encoding costs time proportional to the number
+of changes, and components modified in place must be marked changed to be
+replicated. Messages must be delivered reliably and in order, since each one
+is relative to the previous one.
+"""
+
+import six
+
+from ecs.columns import ColumnarComponent
+
+
+def _write_varint(out, value):
+    """Append a non-negative integer, 7 bits per byte."""
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_signed(out, value):
+    """Append a signed integer, zigzag-encoded so that small magnitudes
+    take few bytes.
+    """
+    _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+class _Reader(object):
+    __slots__ = ('_data', '_position')
+
+    def __init__(self, data):
+        self._data = bytearray(data)
+        self._position = 0
+
+    def varint(self):
+        value = shift = 0
+        while True:
+            byte = self._data[self._position]
+            self._position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def signed(self):
+        value = self.varint()
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+    def at_end(self):
+        return self._position == len(self._data)
+
+
+class _ReplicatedType(object):
+    """Replication settings of one component type."""
+    __slots__ = ('component_type', 'type_id', 'fields', 'steps')
+
+    def __init__(self, component_type, type_id, fields, precision):
+        self.component_type = component_type
+        self.type_id = type_id
+        self.fields = tuple(fields)
+        self.steps = tuple(precision.get(name) for name in self.fields)
+
+    def quantize(self, component_instance):
+        """Return the quantized values of the fields of a component."""
+        values = []
+        for name, step in six.moves.zip(self.fields, self.steps):
+            value = getattr(component_instance, name)
+            if step is None:
+                quantized = int(value)
+                if quantized != value:
+                    raise ValueError(
+                        "field `{0}' of {1} needs a precision to hold "
+                        "{2!r}".format(
+                            name, self.component_type.__name__, value))
+            else:
+                quantized = int(round(value / step))
+            values.append(quantized)
+        return tuple(values)
+
+    def dequantize(self, values):
+        """Return the field values of quantized values, by field name."""
+        return dict(
+            (name, value if step is None else value * step)
+            for name, step, value
+            in six.moves.zip(self.fields, self.steps, values))
+
+
+class ReplicationSchema(object):
+    """Component types to replicate, along with the fields and precision of
+    each. A server and its clients must register the same types in the same
+    order.
+    """
+    def __init__(self):
+        self._types = []
+        self._by_type = {}
+
+    @property
+    def component_types(self):
+        """Get the registered component types, in order of registration.
+
+        :rtype: :class:`tuple` of :class:`type`
+        """
+        return tuple(
+            replicated.component_type for replicated in self._types)
+
+    def register(self, component_type, fields=None, precision=None):
+        """Replicate the components of a type.
+
+        :param component_type: type of the replicated components, which
+            must be constructible from its fields given by name
+        :type component_type: :class:`type` which is
+            :class:`ecs.models.Component` subclass
+        :param fields: names of the replicated fields, by default all the
+            fields of a columnar or :func:`ecs.models.slotted` type
+        :type fields: sequence of :class:`str`
+        :param precision: mapping of field name to the step to which its
+            values are rounded. Fields without a step must hold integers,
+            or booleans, which clients receive as integers.
+        :type precision: :class:`dict`
+        :raises: :exc:`ValueError` when the type is already registered, or
+            when its fields can't be guessed, or for an unknown field in
+            ``precision``
+        """
+        if component_type in self._by_type:
+            raise ValueError('{0} is already registered'.format(
+                component_type.__name__))
+        if fields is None:
+            if issubclass(component_type, ColumnarComponent):
+                fields = [name for name, _ in component_type.fields]
+            elif hasattr(component_type, 'field_defaults'):
+                fields = [name for name, _ in component_type.field_defaults]
+            else:
+                raise ValueError('fields of {0} must be given'.format(
+                    component_type.__name__))
+        precision = precision or {}
+        for name in precision:
+            if name not in fields:
+                raise ValueError("{0} has no replicated field `{1}'".format(
+                    component_type.__name__, name))
+        replicated = _ReplicatedType(
+            component_type, len(self._types), fields, precision)
+        self._types.append(replicated)
+        self._by_type[component_type] = replicated
+
+    def __len__(self):
+        return len(self._types)
+
+
+class _ClientState(object):
+    __slots__ = ('tick', 'baseline')
+
+    def __init__(self):
+        # Change tick up to which the client is up to date, or None before
+        # the first message.
+        self.tick = None
+        # Quantized values last sent, by entity then component type.
+        self.baseline = {}
+
+
+class ReplicationServer(object):
+    """Encoder of the messages bringing each client up to date with an
+    entity manager.
+    """
+    def __init__(self, entity_manager, schema):
+        """:param entity_manager: entity manager to replicate
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param schema: replicated component types, which the entity manager
+            starts tracking
+        :type schema: :class:`ReplicationSchema`
+        """
+        self.entity_manager = entity_manager
+        self.schema = schema
+        entity_manager.track_changes(*schema.component_types)
+        self._clients = {}
+
+    def add_client(self, client_id):
+        """Start replicating to a client. Its first message holds the whole
+        replicated state.
+
+        :param client_id: key of the client
+        """
+        self._clients[client_id] = _ClientState()
+
+    def remove_client(self, client_id):
+        """Stop replicating to a client.
+
+        :param client_id: key of the client
+        """
+        del self._clients[client_id]
+
+    @property
+    def tick(self):
+        """Get the change tick up to which every client is up to date, or
+        ``None`` if one of them hasn't received anything yet. Changes up to
+        it may be discarded, see
+        :meth:`ecs.managers.EntityManager.discard_changes`.
+
+        :rtype: :class:`int`
+        """
+        ticks = [state.tick for state in six.itervalues(self._clients)]
+        if None in ticks or not ticks:
+            return None
+        return min(ticks)
+
+    def encode(self, client_id):
+        """Return the message bringing a client up to date, and consider
+        the client up to date.
+
+        :param client_id: key of the client
+        :rtype: :class:`bytes`
+        """
+        state = self._clients[client_id]
+        entity_manager = self.entity_manager
+        baseline = state.baseline
+        # Entities dropped from the baseline, and entities added to it which
+        # the client didn't know.
+        dropped = set()
+        created = []
+        sections = []
+        for replicated in self.schema._types:
+            component_type = replicated.component_type
+            if state.tick is None:
+                removed = ()
+                updated = [
+                    entity for entity, _
+                    in entity_manager.pairs_for_type(component_type)]
+            else:
+                removed = entity_manager.removed(component_type, state.tick)
+                updated = (
+                    entity_manager.added(component_type, state.tick) +
+                    entity_manager.changed(component_type, state.tick))
+            removed = self._remove(baseline, component_type, removed, dropped)
+            sections.append((replicated, removed, self._update(
+                baseline, replicated, updated, dropped, created)))
+        state.tick = entity_manager.change_tick
+
+        out = bytearray()
+        _write_varint(out, len(created))
+        for entity in created:
+            _write_varint(out, hash(entity))
+        _write_varint(out, len(dropped))
+        for entity in dropped:
+            _write_varint(out, hash(entity))
+        for replicated, removed, updates in sections:
+            # The components of destroyed entities go with them.
+            removed = [entity for entity in removed if entity not in dropped]
+            if not removed and not updates:
+                continue
+            _write_varint(out, replicated.type_id)
+            _write_varint(out, len(removed))
+            for entity in removed:
+                _write_varint(out, hash(entity))
+            _write_varint(out, len(updates))
+            for entity, mask, deltas in updates:
+                _write_varint(out, hash(entity))
+                _write_varint(out, mask)
+                for delta in deltas:
+                    _write_signed(out, delta)
+        return bytes(out)
+
+    @staticmethod
+    def _remove(baseline, component_type, entities, dropped):
+        """Drop removed components from a client's baseline, and add the
+        entities left without replicated components to ``dropped``.
+
+        :return: the entities which had the component
+        """
+        removed = []
+        for entity in entities:
+            components = baseline.get(entity)
+            if components is None or component_type not in components:
+                continue
+            del components[component_type]
+            if not components:
+                del baseline[entity]
+                dropped.add(entity)
+            removed.append(entity)
+        return removed
+
+    def _update(self, baseline, replicated, entities, dropped, created):
+        """Update a client's baseline with the current components of the
+        entities. Entities added to the baseline are appended to
+        ``created``, unless they were in ``dropped``, which they are then
+        removed from.
+
+        :return: ``(entity, dirty mask, value deltas)`` tuples for the
+            components which differ from the baseline
+        """
+        entity_manager = self.entity_manager
+        component_type = replicated.component_type
+        updates = []
+        seen = set()
+        for entity in entities:
+            if entity in seen:
+                continue
+            seen.add(entity)
+            values = replicated.quantize(
+                entity_manager.component_for_entity(entity, component_type))
+            components = baseline.get(entity)
+            if components is None:
+                components = baseline[entity] = {}
+                if entity in dropped:
+                    dropped.remove(entity)
+                else:
+                    created.append(entity)
+            previous = components.get(component_type)
+            if previous is None:
+                mask = (1 << len(values)) - 1
+                deltas = values
+            else:
+                mask = 0
+                deltas = []
+                for i, (value, old) in enumerate(
+                        six.moves.zip(values, previous)):
+                    if value != old:
+                        mask |= 1 << i
+                        deltas.append(value - old)
+                if not mask:
+                    continue
+            components[component_type] = values
+            updates.append((entity, mask, deltas))
+        return updates
+
+
+class ReplicationClient(object):
+    """Applier of the messages of a :class:`ReplicationServer` to a local
+    entity manager. Replicated entities are mapped to local ones, created
+    by the client.
+    """
+    def __init__(self, entity_manager, schema):
+        """:param entity_manager: local entity manager
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param schema: replicated component types, registered as on the
+            server
+        :type schema: :class:`ReplicationSchema`
+        """
+        self.entity_manager = entity_manager
+        self.schema = schema
+        # Local entity and quantized values of each component, by GUID of
+        # the server's entity.
+        self._entities = {}
+        self._values = {}
+
+    def entity(self, server_guid):
+        """Return the local entity standing for a server's entity.
+
+        :param server_guid: GUID of the server's entity, i.e. its hash
+        :type server_guid: :class:`int`
+        :rtype: :class:`ecs.models.Entity`
+        :raises: :exc:`KeyError` when the entity isn't replicated
+        """
+        return self._entities[server_guid]
+
+    def apply(self, message):
+        """Apply a message of the server.
+
+        :param message: message returned by
+            :meth:`ReplicationServer.encode`
+        :type message: :class:`bytes`
+        """
+        entity_manager = self.entity_manager
+        reader = _Reader(message)
+        for _ in range(reader.varint()):
+            guid = reader.varint()
+            self._entities[guid] = entity_manager.create_entity()
+            self._values[guid] = {}
+        for _ in range(reader.varint()):
+            guid = reader.varint()
+            entity_manager.remove_entity(self._entities.pop(guid))
+            del self._values[guid]
+        while not reader.at_end():
+            replicated = self.schema._types[reader.varint()]
+            component_type = replicated.component_type
+            for _ in range(reader.varint()):
+                guid = reader.varint()
+                entity_manager.remove_component(
+                    self._entities[guid], component_type)
+                del self._values[guid][component_type]
+            for _ in range(reader.varint()):
+                self._apply_update(reader, replicated)
+
+    def _apply_update(self, reader, replicated):
+        entity_manager = self.entity_manager
+        component_type = replicated.component_type
+        guid = reader.varint()
+        entity = self._entities[guid]
+        mask = reader.varint()
+        components = self._values[guid]
+        previous = components.get(component_type)
+        if previous is None:
+            values = tuple(reader.signed() for _ in replicated.fields)
+            entity_manager.add_component(
+                entity, component_type(**replicated.dequantize(values)))
+        else:
+            values = list(previous)
+            for i in range(len(values)):
+                if mask & 1 << i:
+                    values[i] += reader.signed()
+            component_instance = entity_manager.component_for_entity(
+                entity, component_type)
+            dequantized = replicated.dequantize(values)
+            for i, name in enumerate(replicated.fields):
+                if mask & 1 << i:
+                    setattr(component_instance, name, dequantized[name])
+            entity_manager.mark_changed(entity, component_type)
+        components[component_type] = tuple(values)
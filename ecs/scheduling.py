@@ -0,0 +1,234 @@
+"""Schedules of systems which don't run exactly once per frame.
+
+A system added to a :class:`ecs.managers.SystemManager` with a
+``fixed_step`` runs with that same delta time, as many times as the elapsed
+time allows, which keeps physics stable whatever the frame rate. A system
+added with an ``interval`` of N only runs every Nth frame, with the time
+elapsed since its previous run:
+
+.. code-block:: python
+
+    system_manager.add_system(Physics(), fixed_step=1.0 / 120)
+    system_manager.add_system(AIPlanning(), interval=4)
+    system_manager.add_system(Pathfinding(), interval=4)
+
+Systems sharing an interval are given different phases, when possible, so
+that they don't all run during the same frame.
+
+Systems with too many entities to process in one frame, such as pathfinding
+or level of detail updates, may instead subclass :class:`SlicedSystem`, which
+processes entities until its time budget for the frame is spent, and resumes
+where it stopped on the next frame.
+"""
+
+from abc import abstractmethod
+import time
+
+from ecs.exceptions import NonexistentComponentTypeForEntity
+from ecs.models import System
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class FixedStep(object):
+    """Schedule running a system in steps of fixed duration. Elapsed time
+    accumulates until it is worth one or more steps. When the frame took so
+    long that more than ``max_steps`` steps are due, the extra time is
+    dropped, so that a slow frame doesn't make the next ones slower still.
+    """
+    __slots__ = ('step', 'max_steps', 'accumulator')
+
+    def __init__(self, step, max_steps=5):
+        """:param step: duration of a step
+        :type step: :class:`float`
+        :param max_steps: maximum number of steps run in a frame
+        :type max_steps: :class:`int`
+        """
+        if step <= 0 or max_steps < 1:
+            raise ValueError('step and max_steps must be positive')
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        """Elapsed time not yet consumed by steps."""
+
+    @property
+    def alpha(self):
+        """Get the fraction of a step accumulated since the last step, by
+        which rendering may interpolate between the last two states.
+
+        :rtype: :class:`float`
+        """
+        return self.accumulator / self.step
+
+    def plan(self, dt):
+        """Return the delta times of the runs due this frame.
+
+        :param dt: elapsed time for this frame
+        :type dt: :class:`float`
+        :rtype: :class:`tuple` of :class:`float`
+        """
+        step = self.step
+        accumulator = self.accumulator + dt
+        steps = int(accumulator // step)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            accumulator = accumulator % step
+        else:
+            accumulator -= steps * step
+        self.accumulator = accumulator
+        return (step,) * steps
+
+
+class Interval(object):
+    """Schedule running a system every ``interval`` frames, with the time
+    elapsed since its previous run.
+    """
+    __slots__ = ('interval', 'phase', 'elapsed', '_countdown')
+
+    def __init__(self, interval, phase=0, frame=0):
+        """:param interval: number of frames between runs
+        :type interval: :class:`int`
+        :param phase: the system runs during the frames whose number modulo
+            ``interval`` is ``phase``
+        :type phase: :class:`int`
+        :param frame: number of the next frame
+        :type frame: :class:`int`
+        """
+        if interval < 1 or not 0 <= phase < interval:
+            raise ValueError(
+                'interval must be positive and phase lower than interval')
+        self.interval = interval
+        self.phase = phase
+        self.elapsed = 0.0
+        """Time elapsed since the previous run."""
+        self._countdown = (phase - frame) % interval
+
+    def plan(self, dt):
+        """Return the delta time of the run due this frame, if any.
+
+        :param dt: elapsed time for this frame
+        :type dt: :class:`float`
+        :rtype: :class:`tuple` of :class:`float`
+        """
+        self.elapsed += dt
+        if self._countdown:
+            self._countdown -= 1
+            return ()
+        self._countdown = self.interval - 1
+        elapsed = self.elapsed
+        self.elapsed = 0.0
+        return (elapsed,)
+
+
+class SlicedSystem(System):
+    """System spreading passes over the entities having all of
+    :attr:`component_types` across frames. Each frame, :meth:`process` is
+    called for the next entities of the pass until :attr:`budget` is spent;
+    the pass resumes there on the next frame, and a new one starts once it
+    is done:
+
+    .. code-block:: python
+
+        class LevelOfDetail(SlicedSystem):
+            component_types = (Position, Mesh)
+            budget = 0.001
+
+            def process(self, dt, entity, position, mesh):
+                mesh.level = level_for_distance(position, self.camera)
+
+    The entities of a pass are those matching when it starts. Entities which
+    lose one of the components before their turn are skipped, and those
+    which gain them wait for the next pass. Components are looked up when
+    processed, so replaced components are never stale.
+    """
+    component_types = ()
+    """Component types which the processed entities have, in the order in
+    which their components are given to :meth:`process`."""
+    budget = 0.002
+    """Time in seconds which the system may spend per frame. At least one
+    entity is processed per frame, so passes always progress."""
+    check_interval = 16
+    """Number of entities processed between reads of the clock."""
+
+    def __init__(self):
+        super(SlicedSystem, self).__init__()
+        self._pass = None
+        self._position = 0
+
+    @property
+    def progress(self):
+        """Get the fraction of the current pass already done.
+
+        :rtype: :class:`float`
+        """
+        if not self._pass:
+            return 0.0
+        return float(self._position) / len(self._pass)
+
+    def entities(self):
+        """Return the entities to process during a new pass, by default those
+        having all of :attr:`component_types`. It may be overridden to
+        process them in another order, e.g. nearest first.
+
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        entity_manager = self.entity_manager
+        if len(self.component_types) == 1:
+            return [entity for entity, _ in
+                    entity_manager.pairs_for_type(self.component_types[0])]
+        return [row[0] for row in
+                entity_manager.query(*self.component_types)]
+
+    @abstractmethod
+    def process(self, dt, entity, *components):
+        """Process one entity.
+
+        :param dt: delta time of the current frame
+        :type dt: :class:`float`
+        :param entity: the entity
+        :type entity: :class:`ecs.models.Entity`
+        :param components: the entity's components of
+            :attr:`component_types`
+        :type components: :class:`ecs.models.Component`
+        """
+
+    def end_pass(self, dt):
+        """Called once every entity of a pass has been processed. Does
+        nothing by default.
+
+        :param dt: delta time of the current frame
+        :type dt: :class:`float`
+        """
+
+    def update(self, dt):
+        """Process entities of the current pass, or of a new one, until the
+        budget for this frame is spent or the pass is done.
+        """
+        entities = self._pass
+        if entities is None:
+            entities = self._pass = self.entities()
+            self._position = 0
+        deadline = _clock() + self.budget
+        component_for_entity = self.entity_manager.component_for_entity
+        component_types = self.component_types
+        process = self.process
+        check_interval = self.check_interval
+        position = self._position
+        end = len(entities)
+        while position < end:
+            stop = min(position + check_interval, end)
+            for entity in entities[position:stop]:
+                try:
+                    components = [
+                        component_for_entity(entity, component_type)
+                        for component_type in component_types]
+                except NonexistentComponentTypeForEntity:
+                    continue
+                process(dt, entity, *components)
+            position = stop
+            if _clock() >= deadline:
+                break
+        self._position = position
+        if position >= end:
+            self._pass = None
+            self.end_pass(dt)
@@ -0,0 +1,580 @@
+"""Binary snapshots of the state of an entity manager.
+
+A snapshot stores each component type as a block of columns, one per field,
+next to the array of the IDs of the entities possessing a component of the
+type:
+
+.. code-block:: python
+
+    save_snapshot(entity_manager, 'world.snap')
+    ...
+    with Snapshot('world.snap') as snapshot:
+        entity_manager = snapshot.restore()
+
+A snapshot file is memory-mapped when opened, and only its header is read.
+The blocks of a component type are decoded when the type is requested, by
+:meth:`Snapshot.table`, :meth:`Snapshot.columns` or
+:meth:`Snapshot.restore`, so component types which are never requested are
+never materialized, and :meth:`Snapshot.restore` may be given a subset of
+the types.
+
+Fields are stored as NumPy arrays when their values allow it, so that
+restoring them is mostly a matter of copying memory:
+
+- The fields of :class:`ecs.columns.ColumnarComponent` types are copied
+  from and to their column stores with one vectorized operation each.
+- The fields of :func:`ecs.models.slotted` types are stored as arrays when
+  their values are numbers or strings, and pickled otherwise.
+- Other component types are pickled as lists of instances.
+
+Rather than saving full snapshots often, a :class:`DeltaRecorder` records
+what changed between frames in the same format, which :func:`rebuild`
+applies to a base snapshot to get back the state of any recorded frame,
+e.g. for rollback or replay.
+
+Component types are referred to by module and qualified name, so they must
+be importable when the snapshot is loaded. NumPy is required.
+"""
+
+import importlib
+import io
+import itertools
+import json
+import mmap
+import struct
+from collections import OrderedDict
+
+import six
+from six.moves import cPickle as pickle
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ecs.columns import ColumnarComponent
+from ecs.managers import EntityManager
+from ecs.models import Entity
+
+MAGIC = b'ECSSNAP1'
+DELTA_MAGIC = b'ECSDELT1'
+_HEADER = struct.Struct('<8sQQ')
+# Blocks start on multiples of this, so that arrays mapped from the file are
+# aligned for any dtype.
+_ALIGNMENT = 64
+
+_COLUMNS = 'columns'
+_FIELDS = 'fields'
+_OBJECTS = 'objects'
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('NumPy is required for snapshots')
+
+
+def _type_name(component_type):
+    return '{0}:{1}'.format(
+        component_type.__module__,
+        getattr(component_type, '__qualname__', component_type.__name__))
+
+
+def _resolve_type(name):
+    module_name, qualname = name.split(':')
+    obj = importlib.import_module(module_name)
+    for attribute in qualname.split('.'):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+class _Writer(object):
+    """Writer of aligned data blocks to a snapshot file."""
+    def __init__(self, f):
+        self._f = f
+        self._offset = _HEADER.size
+
+    def _pad(self):
+        padding = -self._offset % _ALIGNMENT
+        self._f.write(b'\0' * padding)
+        self._offset += padding
+
+    def write(self, data):
+        """Write a block and return its ``(offset, size)``."""
+        self._pad()
+        offset = self._offset
+        self._f.write(data)
+        self._offset += len(data)
+        return offset, len(data)
+
+    def write_array(self, array):
+        """Write an array and return its description."""
+        array = numpy.ascontiguousarray(array)
+        offset, size = self.write(array.tobytes())
+        return {'dtype': array.dtype.str, 'shape': list(array.shape),
+                'offset': offset}
+
+    def write_pickle(self, obj):
+        """Write a pickled object and return its description."""
+        offset, size = self.write(
+            pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        return {'pickle': True, 'offset': offset, 'size': size}
+
+    def write_values(self, values):
+        """Write the values of a field as an array if NumPy can hold them
+        without resorting to objects, otherwise pickled.
+        """
+        # Values of mixed types, e.g. ints and floats, would all be converted
+        # to the same one.
+        if len(set(six.moves.map(type, values))) == 1:
+            try:
+                array = numpy.asarray(values)
+            except ValueError:
+                pass
+            else:
+                if array.ndim == 1 and array.dtype.kind not in 'OVMm':
+                    return self.write_array(array)
+        return self.write_pickle(values)
+
+
+def save_snapshot(entity_manager, path):
+    """Write a snapshot of all components and entities of an entity
+    manager.
+
+    :param entity_manager: entity manager to save
+    :type entity_manager: :class:`ecs.managers.EntityManager`
+    :param path: path of the snapshot file, which is overwritten
+    :type path: :class:`str`
+    """
+    _require_numpy()
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, 0, 0))
+        writer = _Writer(f)
+        header = {
+            'generations': writer.write_array(numpy.asarray(
+                entity_manager._generations, numpy.uint32)),
+            'free_indices': writer.write_array(numpy.asarray(
+                list(entity_manager._free_indices), numpy.uint32)),
+            'types': [],
+        }
+        for component_type, table in six.iteritems(entity_manager.database):
+            header['types'].append(_write_block(
+                writer, entity_manager, component_type, list(table),
+                table.__getitem__))
+        _write_header(f, writer, MAGIC, header)
+
+
+def _write_header(f, writer, magic, header):
+    offset, size = writer.write(json.dumps(header).encode('utf-8'))
+    f.seek(0)
+    f.write(_HEADER.pack(magic, offset, size))
+
+
+def _write_block(writer, entity_manager, component_type, entities,
+                 get_component):
+    """Write the components of some entities and return the description of
+    the block.
+
+    :param get_component: callable returning the component of an entity
+    """
+    block = {
+        'type': _type_name(component_type),
+        'entities': _write_entities(writer, entities),
+    }
+    if issubclass(component_type, ColumnarComponent):
+        store = entity_manager.columns(component_type)
+        rows = store.rows_for(entities)
+        block['kind'] = _COLUMNS
+        block['fields'] = [
+            [name, writer.write_array(store.column(name)[rows])]
+            for name, _ in component_type.fields]
+    elif hasattr(component_type, 'field_defaults'):
+        instances = [get_component(entity) for entity in entities]
+        block['kind'] = _FIELDS
+        block['fields'] = [
+            [name, writer.write_values(
+                [getattr(instance, name) for instance in instances])]
+            for name, _ in component_type.field_defaults]
+    else:
+        block['kind'] = _OBJECTS
+        block['instances'] = writer.write_pickle(
+            [get_component(entity) for entity in entities])
+    return block
+
+
+def _write_entities(writer, entities):
+    return writer.write_array(numpy.fromiter(
+        (hash(entity) for entity in entities), numpy.uint64, len(entities)))
+
+
+def _read_header(buffer, magic):
+    """Return the header of a snapshot or delta.
+
+    :raises: :exc:`ValueError` when the buffer doesn't start with
+        ``magic``
+    """
+    if len(buffer) < _HEADER.size:
+        raise ValueError('truncated header')
+    found, offset, size = _HEADER.unpack_from(buffer)
+    if found != magic:
+        raise ValueError('expected {0!r}, found {1!r}'.format(magic, found))
+    return json.loads(bytes(buffer[offset:offset + size]).decode('utf-8'))
+
+
+def _array(buffer, description):
+    """Return an array described by :meth:`_Writer.write_array`, backed by
+    the buffer.
+    """
+    dtype = numpy.dtype(description['dtype'])
+    shape = tuple(description['shape'])
+    count = 1
+    for dimension in shape:
+        count *= dimension
+    return numpy.frombuffer(
+        buffer, dtype, count, description['offset']).reshape(shape)
+
+
+def _values(buffer, description):
+    if description.get('pickle'):
+        offset = description['offset']
+        return pickle.loads(
+            bytes(buffer[offset:offset + description['size']]))
+    return _array(buffer, description)
+
+
+def _entities(buffer, description):
+    return list(six.moves.map(Entity, _array(buffer, description).tolist()))
+
+
+def _columns(buffer, component_type, block):
+    if block['kind'] == _OBJECTS:
+        raise TypeError('{0} has no stored fields'.format(
+            component_type.__name__))
+    return dict(
+        (name, _values(buffer, description))
+        for name, description in block['fields'])
+
+
+def _instances(buffer, component_type, block):
+    if block['kind'] == _OBJECTS:
+        return _values(buffer, block['instances'])
+    columns = _columns(buffer, component_type, block)
+    names = [name for name, _ in block['fields']]
+    values = [_tolist(columns[name]) for name in names]
+    if block['kind'] == _COLUMNS:
+        return [component_type(**dict(zip(names, row)))
+                for row in six.moves.zip(*values)]
+    return [component_type(*row) for row in six.moves.zip(*values)]
+
+
+def _add_block(entity_manager, buffer, component_type, block):
+    """Add the components of a block to an entity manager, the fields of
+    columnar types being copied into their column store directly.
+    """
+    entities = _entities(buffer, block['entities'])
+    if block['kind'] == _COLUMNS:
+        entity_manager.add_components_bulk(
+            component_type, entities,
+            columns=_columns(buffer, component_type, block))
+    else:
+        entity_manager.add_components_bulk(
+            component_type, entities,
+            _instances(buffer, component_type, block))
+
+
+class Snapshot(object):
+    """Snapshot file written by :func:`save_snapshot`, memory-mapped and
+    decoded lazily, one component type at a time.
+    """
+    def __init__(self, path):
+        """:param path: path of the snapshot file
+        :type path: :class:`str`
+        :raises: :exc:`ValueError` when the file is not a snapshot
+        """
+        _require_numpy()
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header = _read_header(self._map, MAGIC)
+        except ValueError:
+            self._map.close()
+            raise ValueError('{0} is not a snapshot'.format(path))
+        self._header = header
+        self._blocks = dict(
+            (_resolve_type(block['type']), block)
+            for block in header['types'])
+        # Decoded tables, by component type.
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_, value, traceback):
+        self.close()
+
+    def close(self):
+        """Unmap the file.
+
+        :raises: :exc:`BufferError` while arrays returned by
+            :meth:`columns` are still referenced
+        """
+        self._map.close()
+
+    @property
+    def component_types(self):
+        """Get the component types in this snapshot.
+
+        :rtype: :class:`list` of :class:`type`
+        """
+        return list(self._blocks)
+
+    def entities(self, component_type):
+        """Return the entities possessing a component of
+        ``component_type``.
+
+        :param component_type: a component type in this snapshot
+        :type component_type: :class:`type`
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        :raises: :exc:`KeyError` when the type is not in this snapshot
+        """
+        return _entities(
+            self._map, self._blocks[component_type]['entities'])
+
+    def columns(self, component_type):
+        """Return the fields of a columnar or slotted component type as
+        arrays mapped from the file, in the order of :meth:`entities`,
+        without decoding them. Fields which are not stored as arrays are
+        unpickled.
+
+        :param component_type: a component type in this snapshot
+        :type component_type: :class:`type`
+        :return: mapping of field name to values
+        :rtype: :class:`dict`
+        :raises: :exc:`KeyError` when the type is not in this snapshot,
+            :exc:`TypeError` when its fields are not stored separately
+        """
+        return _columns(
+            self._map, component_type, self._blocks[component_type])
+
+    def table(self, component_type):
+        """Return the components of ``component_type``, decoded on first
+        request and then cached. Columnar components are returned as
+        standalone instances.
+
+        :param component_type: a component type in this snapshot
+        :type component_type: :class:`type`
+        :return: mapping of entity to component
+        :rtype: :class:`dict`
+        :raises: :exc:`KeyError` when the type is not in this snapshot
+        """
+        try:
+            return self._tables[component_type]
+        except KeyError:
+            pass
+        table = self._tables[component_type] = dict(six.moves.zip(
+            self.entities(component_type), _instances(
+                self._map, component_type, self._blocks[component_type])))
+        return table
+
+    def restore(self, entity_manager=None, component_types=None):
+        """Load the entities and components of this snapshot into an entity
+        manager which has none. The components are decoded anew rather than
+        taken from :meth:`table`, so that restored managers don't share
+        them. Only the blocks of the restored component types are decoded;
+        the fields of columnar types are copied into their column stores
+        directly.
+
+        :param entity_manager: empty entity manager to fill, by default a
+            new :class:`ecs.managers.EntityManager`
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param component_types: component types to restore, by default all
+            of them
+        :type component_types: iterable of :class:`type`
+        :return: the entity manager
+        :rtype: :class:`ecs.managers.EntityManager`
+        """
+        if entity_manager is None:
+            entity_manager = EntityManager()
+        entity_manager._load_entities(
+            _array(self._map, self._header['generations']).tolist(),
+            _array(self._map, self._header['free_indices']).tolist())
+        if component_types is None:
+            component_types = self._blocks
+        for component_type in component_types:
+            _add_block(entity_manager, self._map, component_type,
+                       self._blocks[component_type])
+        return entity_manager
+
+    def __repr__(self):
+        return '<{0} of {1} component types>'.format(
+            type(self).__name__, len(self._blocks))
+
+
+class DeltaRecorder(object):
+    """Recorder of the changes made to an entity manager between calls to
+    :meth:`record`, each returned as a compact binary delta. A delta holds
+    the changes to the entity allocation state, and, for each recorded
+    component type, the entities which lost their component and the
+    current component of the entities which were given one or whose
+    component changed, encoded as in snapshots.
+
+    Changes are found with the change tracking of the entity manager (see
+    :mod:`ecs.changes`), so components modified in place must be marked
+    changed to be recorded. The first delta holds the changes since the
+    recorder was created, so saving a base snapshot along with creating the
+    recorder allows rebuilding every recorded frame with :func:`rebuild`:
+
+    .. code-block:: python
+
+        save_snapshot(entity_manager, 'base.snap')
+        recorder = DeltaRecorder(entity_manager, [Position, Health])
+        ...
+        deltas.append(recorder.record())  # each frame
+        ...
+        with Snapshot('base.snap') as base:
+            frame = rebuild(base, deltas[:42])
+    """
+    def __init__(self, entity_manager, component_types):
+        """:param entity_manager: entity manager whose changes are recorded
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param component_types: component types whose changes are
+            recorded, which the entity manager starts tracking
+        :type component_types: iterable of :class:`type`
+        """
+        _require_numpy()
+        self.entity_manager = entity_manager
+        self.component_types = tuple(component_types)
+        entity_manager.track_changes(*self.component_types)
+        self._tick = entity_manager.change_tick
+        self._generations = numpy.asarray(
+            entity_manager._generations, numpy.uint32)
+        self._free_count = len(entity_manager._free_indices)
+        self._released = entity_manager._released
+
+    @property
+    def tick(self):
+        """Get the change tick up to which changes have been recorded. Once
+        every other reader has caught up with it, the entity manager may
+        discard the changes, see
+        :meth:`ecs.managers.EntityManager.discard_changes`.
+
+        :rtype: :class:`int`
+        """
+        return self._tick
+
+    def record(self):
+        """Return the changes made since the previous delta.
+
+        :rtype: :class:`bytes`
+        """
+        entity_manager = self.entity_manager
+        f = io.BytesIO()
+        f.write(_HEADER.pack(DELTA_MAGIC, 0, 0))
+        writer = _Writer(f)
+        generations = numpy.asarray(
+            entity_manager._generations, numpy.uint32)
+        previous = self._generations
+        changed = numpy.flatnonzero(
+            generations[:len(previous)] != previous).astype(numpy.uint32)
+        changed = numpy.concatenate([changed, numpy.arange(
+            len(previous), len(generations), dtype=numpy.uint32)])
+        taken_free, released = self._free_changes()
+        header = {
+            'next_index': len(generations),
+            'indices': writer.write_array(changed),
+            'generations': writer.write_array(generations[changed]),
+            'taken_free': taken_free,
+            'released': writer.write_array(
+                numpy.asarray(released, numpy.uint32)),
+            'types': [],
+        }
+        since = self._tick
+        for component_type in self.component_types:
+            removed = entity_manager.removed(component_type, since)
+            updated = list(OrderedDict.fromkeys(
+                entity_manager.added(component_type, since) +
+                entity_manager.changed(component_type, since)))
+            if not removed and not updated:
+                continue
+            table = dict(
+                (entity, entity_manager.component_for_entity(
+                    entity, component_type))
+                for entity in updated)
+            block = _write_block(
+                writer, entity_manager, component_type, updated,
+                table.__getitem__)
+            block['removed'] = _write_entities(writer, removed)
+            header['types'].append(block)
+        _write_header(f, writer, DELTA_MAGIC, header)
+        self._tick = entity_manager.change_tick
+        self._generations = generations
+        return f.getvalue()
+
+    def _free_changes(self):
+        """Return the number of free indices taken since the previous delta,
+        oldest first, and the indices released since and still free. The
+        free indices being a queue, this describes the changes to it without
+        writing it whole.
+        """
+        entity_manager = self.entity_manager
+        free_indices = entity_manager._free_indices
+        released_count = entity_manager._released - self._released
+        taken = min(
+            self._free_count + released_count - len(free_indices),
+            self._free_count)
+        # The free indices left from the previous delta come first.
+        released = list(itertools.islice(
+            reversed(free_indices),
+            len(free_indices) - (self._free_count - taken)))
+        released.reverse()
+        self._free_count = len(free_indices)
+        self._released = entity_manager._released
+        return taken, released
+
+
+def apply_delta(entity_manager, delta):
+    """Apply a delta returned by :meth:`DeltaRecorder.record` to an entity
+    manager in the state the recorded one was in before the delta.
+
+    :param entity_manager: entity manager to update
+    :type entity_manager: :class:`ecs.managers.EntityManager`
+    :param delta: delta to apply
+    :type delta: :class:`bytes`
+    :raises: :exc:`ValueError` when ``delta`` is not a delta
+    """
+    _require_numpy()
+    buffer = memoryview(delta)
+    header = _read_header(buffer, DELTA_MAGIC)
+    entity_manager._patch_entities(
+        header['next_index'],
+        _array(buffer, header['indices']).tolist(),
+        _array(buffer, header['generations']).tolist(),
+        header['taken_free'],
+        _array(buffer, header['released']).tolist())
+    for block in header['types']:
+        component_type = _resolve_type(block['type'])
+        for entity in _entities(buffer, block['removed']):
+            entity_manager.remove_component(entity, component_type)
+        _add_block(entity_manager, buffer, component_type, block)
+
+
+def rebuild(base, deltas, entity_manager=None):
+    """Return an entity manager in the state of a recorded frame, restored
+    from a base snapshot and the deltas recorded since.
+
+    :param base: snapshot saved when the recorder was created
+    :type base: :class:`Snapshot`
+    :param deltas: deltas recorded up to the frame, in order
+    :type deltas: iterable of :class:`bytes`
+    :param entity_manager: empty entity manager to fill, by default a new
+        :class:`ecs.managers.EntityManager`
+    :type entity_manager: :class:`ecs.managers.EntityManager`
+    :rtype: :class:`ecs.managers.EntityManager`
+    """
+    entity_manager = base.restore(entity_manager)
+    for delta in deltas:
+        apply_delta(entity_manager, delta)
+    return entity_manager
+
+
+def _tolist(values):
+    return values.tolist() if hasattr(values, 'tolist') else values
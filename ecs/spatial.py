@@ -0,0 +1,287 @@
+"""Spatial index of the entities having a position-like component.
+
+Proximity queries which compare every pair of entities take quadratic time.
+An entity manager can instead keep the entities having a component of a
+given type in a uniform grid, from the component's coordinate fields, so
+that radius, box and nearest-neighbour queries only visit nearby cells:
+
+.. code-block:: python
+
+    index = entity_manager.spatial_index(Position, cell_size=10.0)
+    ...
+    for entity in index.within_radius((x, y), 5.0):
+        pass # do something
+
+The index follows components as they are added, replaced and removed. A
+component moved in place is only noticed once it is marked changed, with
+:meth:`ecs.managers.EntityManager.mark_changed` or
+:meth:`ecs.managers.EntityManager.modify_component`, like for any other
+reader of changes (see :mod:`ecs.changes`). Changes are applied when the
+index is next queried, so moving an entity many times between queries costs
+one update. Changes must therefore not be discarded with
+:meth:`ecs.managers.EntityManager.discard_changes` beyond the
+:attr:`SpatialIndex.tick` of the index. When the index is the only reader of
+the changes, it discards them itself as it applies them.
+
+The cell size is best around the typical query radius: much smaller, and
+queries visit many empty cells; much larger, and they check many far
+entities.
+"""
+
+import heapq
+import itertools
+import math
+
+import six
+
+
+class SpatialIndex(object):
+    """Uniform grid of the entities having a component of one type, kept up
+    to date by an entity manager. Instances are not to be created directly;
+    use :meth:`ecs.managers.EntityManager.spatial_index` instead.
+    """
+    def __init__(self, entity_manager, component_type, cell_size, fields):
+        """:param entity_manager: the indexed entity manager
+        :type entity_manager: :class:`ecs.managers.EntityManager`
+        :param component_type: type of the position-like components
+        :type component_type: :class:`type` which is
+            :class:`ecs.models.Component` subclass
+        :param cell_size: side of the grid's cells
+        :type cell_size: :class:`float`
+        :param fields: names of the components' coordinate attributes
+        :type fields: :class:`tuple` of :class:`str`
+        """
+        if cell_size <= 0:
+            raise ValueError('cell_size must be positive')
+        self.component_type = component_type
+        self.cell_size = cell_size
+        self.fields = tuple(fields)
+        self._entity_manager = entity_manager
+        # Position of each entity, and entities of each occupied cell.
+        self._positions = {}
+        self._cells = {}
+        entity_manager.track_changes(component_type)
+        self.tick = entity_manager.change_tick
+        """Change tick up to which moves are applied."""
+        for entity, component in entity_manager.pairs_for_type(
+                component_type):
+            self._insert(entity, component)
+        entity_manager.on_add(component_type, self._insert)
+        entity_manager.on_remove(component_type, self._remove)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, entity):
+        return entity in self._positions
+
+    def __repr__(self):
+        return '<{0} of {1}: {2} entities in {3} cells>'.format(
+            type(self).__name__, self.component_type.__name__,
+            len(self._positions), len(self._cells))
+
+    def _detach(self):
+        """Stop following the entity manager."""
+        self._entity_manager.remove_hook(self.component_type, self._insert)
+        self._entity_manager.remove_hook(self.component_type, self._remove)
+
+    def _cell(self, position):
+        cell_size = self.cell_size
+        return tuple(int(math.floor(coordinate / cell_size))
+                     for coordinate in position)
+
+    def _insert(self, entity, component):
+        """Index or move the entity, as an
+        :meth:`ecs.managers.EntityManager.on_add` hook.
+        """
+        position = tuple(getattr(component, name) for name in self.fields)
+        cell = self._cell(position)
+        previous = self._positions.get(entity)
+        if previous is not None:
+            previous_cell = self._cell(previous)
+            if previous_cell != cell:
+                self._discard(entity, previous_cell)
+                self._cells.setdefault(cell, set()).add(entity)
+        else:
+            self._cells.setdefault(cell, set()).add(entity)
+        self._positions[entity] = position
+
+    def _remove(self, entity, component):
+        """Drop the entity, as an :meth:`ecs.managers.EntityManager.on_remove`
+        hook.
+        """
+        position = self._positions.pop(entity, None)
+        if position is not None:
+            self._discard(entity, self._cell(position))
+
+    def _discard(self, entity, cell):
+        entities = self._cells[cell]
+        entities.discard(entity)
+        if not entities:
+            del self._cells[cell]
+
+    def refresh(self):
+        """Apply the moves marked since the last refresh. Queries do so
+        first, so it is only needed before reading :meth:`position`.
+        """
+        entity_manager = self._entity_manager
+        if entity_manager.change_tick == self.tick:
+            return
+        component_for_entity = entity_manager.component_for_entity
+        component_type = self.component_type
+        for entity in entity_manager.changed(component_type, self.tick):
+            self._insert(entity, component_for_entity(entity, component_type))
+        self.tick = entity_manager.change_tick
+        entity_manager._discard_indexed_changes(component_type, self.tick)
+
+    def position(self, entity):
+        """Return the indexed position of the entity.
+
+        :type entity: :class:`ecs.models.Entity`
+        :rtype: :class:`tuple` of :class:`float`
+        :raises: :class:`KeyError` when the entity is not indexed
+        """
+        return self._positions[entity]
+
+    def within_box(self, low, high):
+        """Return the entities whose position lies in the axis-aligned box
+        between the ``low`` and ``high`` corners, inclusive.
+
+        :param low: lowest coordinates of the box
+        :type low: sequence of :class:`float`
+        :param high: highest coordinates of the box
+        :type high: sequence of :class:`float`
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        self.refresh()
+        positions = self._positions
+        found = []
+        for entities in self._cells_between(low, high):
+            for entity in entities:
+                position = positions[entity]
+                if all(lo <= coordinate <= hi for lo, coordinate, hi
+                       in zip(low, position, high)):
+                    found.append(entity)
+        return found
+
+    def within_radius(self, center, radius):
+        """Return the entities whose position is at most ``radius`` away
+        from ``center``.
+
+        :param center: coordinates of the center
+        :type center: sequence of :class:`float`
+        :param radius: maximum distance
+        :type radius: :class:`float`
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        self.refresh()
+        positions = self._positions
+        squared_radius = radius * radius
+        found = []
+        for entities in self._cells_between(
+                [coordinate - radius for coordinate in center],
+                [coordinate + radius for coordinate in center]):
+            for entity in entities:
+                if _squared_distance(
+                        center, positions[entity]) <= squared_radius:
+                    found.append(entity)
+        return found
+
+    def nearest(self, point, k=1, max_distance=None):
+        """Return the ``k`` entities nearest to ``point``, nearest first.
+        Rings of cells are searched outwards until no unvisited cell may
+        hold a nearer entity.
+
+        :param point: coordinates of the point
+        :type point: sequence of :class:`float`
+        :param k: maximum number of entities returned
+        :type k: :class:`int`
+        :param max_distance: if given, entities farther away are ignored
+        :type max_distance: :class:`float`
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        self.refresh()
+        if k < 1 or not self._positions:
+            return []
+        if max_distance is None:
+            max_distance = float('inf')
+        # Max-heap, through negated distances, of the k nearest so far.
+        heap = []
+        self._search(point, k, max_distance, heap)
+        return [entity for _, _, entity in sorted(heap, reverse=True)]
+
+    def _search(self, point, k, max_distance, heap):
+        """Fill the heap of :meth:`nearest`, ring by ring."""
+        cells = self._cells
+        center = self._cell(point)
+        dimensions = len(center)
+        counter = itertools.count()
+        ring = 0
+        while (2 * ring + 1) ** dimensions < len(cells):
+            for cell in _ring(center, ring):
+                entities = cells.get(cell)
+                if entities:
+                    self._visit(entities, point, k, max_distance, heap,
+                                counter)
+            # Entities in cells beyond the ring are at least this far.
+            reach = ring * self.cell_size
+            if reach > max_distance or (
+                    len(heap) == k and -heap[0][0] <= reach * reach):
+                return
+            ring += 1
+        # Cheaper to scan the cells left than the remaining rings.
+        for cell, entities in six.iteritems(cells):
+            if max(abs(a - b) for a, b in zip(cell, center)) >= ring:
+                self._visit(entities, point, k, max_distance, heap, counter)
+
+    def _visit(self, entities, point, k, max_distance, heap, counter):
+        """Push the entities nearer than those in the heap of
+        :meth:`nearest`.
+        """
+        positions = self._positions
+        squared_max_distance = max_distance * max_distance
+        for entity in entities:
+            distance = _squared_distance(point, positions[entity])
+            if distance > squared_max_distance:
+                continue
+            item = (-distance, next(counter), entity)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    def _cells_between(self, low, high):
+        """Yield the entity sets of the occupied cells overlapping a box."""
+        cells = self._cells
+        low_cell = self._cell(low)
+        high_cell = self._cell(high)
+        ranges = [range(lo, hi + 1) for lo, hi in zip(low_cell, high_cell)]
+        count = 1
+        for cell_range in ranges:
+            count *= len(cell_range)
+        if count > len(cells):
+            # Fewer occupied cells than cells in the box.
+            for cell, entities in six.iteritems(cells):
+                if all(lo <= coordinate <= hi for lo, coordinate, hi
+                       in zip(low_cell, cell, high_cell)):
+                    yield entities
+            return
+        for cell in itertools.product(*ranges):
+            entities = cells.get(cell)
+            if entities:
+                yield entities
+
+
+def _squared_distance(a, b):
+    return sum((x - y) * (x - y) for x, y in zip(a, b))
+
+
+def _ring(center, radius):
+    """Yield the cells at Chebyshev distance ``radius`` from ``center``."""
+    if radius == 0:
+        yield center
+        return
+    for offset in itertools.product(
+            range(-radius, radius + 1), repeat=len(center)):
+        if max(abs(delta) for delta in offset) == radius:
+            yield tuple(c + d for c, d in zip(center, offset))
@@ -0,0 +1,131 @@
+"""Alternative tables in which an entity manager may store components.
+
+The table used for a component type is chosen by the type's
+:attr:`ecs.models.Component.storage` attribute:
+
+.. code-block:: python
+
+    class Projectile(Component):
+        storage = SparseSet
+"""
+
+try:
+    from collections.abc import ItemsView, MutableMapping
+except ImportError:  # Python 2
+    from collections import ItemsView, MutableMapping
+
+import six
+
+
+class SparseSet(MutableMapping):
+    """Table mapping entities to components as a sparse set: a sparse map
+    from entity to position in two dense lists, one of entities and one of
+    components. Removing an entity moves the last entry into its place, so
+    adding and removing are O(1), the dense lists are iterated without
+    hash-table overhead however much the table churns, and ``len()`` is
+    cheap.
+
+    Like a :class:`dict`, iterating over the table while entities are added
+    to or removed from it raises :exc:`RuntimeError`.
+    """
+    def __init__(self, component_type=None):
+        """:param component_type: type of the stored components
+        :type component_type: :class:`type`
+        """
+        self.component_type = component_type
+        self._positions = {}
+        self._entities = []
+        self._components = []
+        # Incremented whenever an entity is added or removed, to detect
+        # changes during iteration.
+        self._version = 0
+
+    @property
+    def entities(self):
+        """Get the dense list of entities. Direct modification is not
+        permitted.
+
+        :rtype: :class:`list` of :class:`ecs.models.Entity`
+        """
+        return self._entities
+
+    @property
+    def components(self):
+        """Get the dense list of components, in the order of
+        :attr:`entities`. Direct modification is not permitted.
+
+        :rtype: :class:`list` of :class:`ecs.models.Component`
+        """
+        return self._components
+
+    def __getitem__(self, entity):
+        return self._components[self._positions[entity]]
+
+    def __setitem__(self, entity, component_instance):
+        position = self._positions.get(entity)
+        if position is None:
+            self._positions[entity] = len(self._entities)
+            self._entities.append(entity)
+            self._components.append(component_instance)
+            self._version += 1
+        else:
+            self._components[position] = component_instance
+
+    def __delitem__(self, entity):
+        position = self._positions.pop(entity)
+        self._version += 1
+        last_entity = self._entities.pop()
+        last_component = self._components.pop()
+        if position != len(self._entities):
+            self._entities[position] = last_entity
+            self._components[position] = last_component
+            self._positions[last_entity] = position
+
+    def __contains__(self, entity):
+        return entity in self._positions
+
+    def __iter__(self):
+        version = self._version
+        for entity in self._entities:
+            if self._version != version:
+                break
+            yield entity
+        self._check_version(version)
+
+    def __len__(self):
+        return len(self._entities)
+
+    def items(self):
+        """Return a view on the ``(entity, component_instance)`` pairs, whose
+        iteration walks the dense lists.
+
+        :rtype: :class:`collections.abc.ItemsView`
+        """
+        return _SparseSetItems(self)
+
+    def iteritems(self):
+        """Return an iterator over ``(entity, component_instance)`` pairs,
+        walking the dense lists.
+        """
+        version = self._version
+        for item in six.moves.zip(self._entities, self._components):
+            if self._version != version:
+                break
+            yield item
+        self._check_version(version)
+
+    def _check_version(self, version):
+        if self._version != version:
+            raise RuntimeError(
+                '{0} changed size during iteration'.format(
+                    type(self).__name__))
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, dict(self.items()))
+
+
+class _SparseSetItems(ItemsView):
+    __slots__ = ()
+
+    def __iter__(self):
+        return self._mapping.iteritems()
@@ -0,0 +1,71 @@
+"""Persistent query results maintained by an entity manager."""
+
+import six
+
+
+class QueryView(object):
+    """Result set of :meth:`ecs.managers.EntityManager.query` which the
+    entity manager keeps up to date as components are added and removed.
+    Iterating over a view therefore costs time proportional to the number of
+    matching entities only. Views are not to be instantiated directly; use
+    :meth:`ecs.managers.EntityManager.view` instead.
+
+    A view is only maintained while something references it, so a view for a
+    recurring query should be kept around (for example on the system which
+    uses it) rather than requested anew each frame.
+    """
+    __slots__ = ('_component_types', '_rows', '__weakref__')
+
+    def __init__(self, component_types, rows):
+        """:param component_types: types of the components in each row
+        :type component_types: :class:`tuple` of :class:`type`
+        :param rows: initial rows of the view
+        :type rows: iterable of ``(entity, component_instance, ...)`` tuples
+        """
+        self._component_types = component_types
+        self._rows = dict((row[0], row) for row in rows)
+
+    @property
+    def component_types(self):
+        """Get the component types of this view.
+
+        :return: component types, in row order
+        :rtype: :class:`tuple` of :class:`type`
+        """
+        return self._component_types
+
+    def __iter__(self):
+        """Return an iterator over ``(entity, component_instance, ...)``
+        tuples, as :meth:`ecs.managers.EntityManager.query` does.
+        """
+        return six.itervalues(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, entity):
+        return entity in self._rows
+
+    def __repr__(self):
+        return '{0}({1})'.format(
+            type(self).__name__,
+            ', '.join(type_.__name__ for type_ in self._component_types))
+
+    def _entity_changed(self, entity, database):
+        """Re-evaluate whether the entity belongs to this view after one of
+        its components of a type in this view was added or replaced.
+        """
+        row = [entity]
+        for component_type in self._component_types:
+            table = database.get(component_type)
+            if table is None or entity not in table:
+                self._rows.pop(entity, None)
+                return
+            row.append(table[entity])
+        self._rows[entity] = tuple(row)
+
+    def _entity_removed(self, entity):
+        """Drop the entity after one of its components of a type in this
+        view was removed.
+        """
+        self._rows.pop(entity, None)
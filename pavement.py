@@ -112,6 +112,13 @@ def test_all():
     raise SystemExit(retcode)
 
 
+@task
+def benchmark():
+    """Run the benchmarks and compare them with the stored baseline."""
+    from benchmarks.suite import main
+    raise SystemExit(main([]))
+
+
 @task
 def commit():
     """Commit only if all the tests pass."""
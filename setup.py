@@ -36,6 +36,7 @@ sys.path.append('.')
 CODE_DIRECTORY = 'ecs'
 DOCS_DIRECTORY = 'docs'
 TESTS_DIRECTORY = 'tests'
+BENCHMARKS_DIRECTORY = 'benchmarks'
 PYTEST_FLAGS = ['--doctest-modules']
 
 # Import metadata. Normally this would just be:
@@ -234,8 +235,15 @@ setup_dict = dict(
         'Topic :: Games/Entertainment',
         'Topic :: Software Development :: Libraries :: Application Frameworks',
     ],
-    packages=find_packages(exclude=(TESTS_DIRECTORY,)),
-    install_requires=['six==1.5.2'],
+    packages=find_packages(
+        exclude=(TESTS_DIRECTORY, BENCHMARKS_DIRECTORY)),
+    install_requires=['six==1.5.2'] + (
+        # Backport of collections.OrderedDict.
+        ['ordereddict==1.1'] if sys.version_info < (2, 7) else []),
+    extras_require={
+        # Packed column storage of ecs.columns.ColumnarComponent.
+        'columns': ['numpy'],
+    },
     # Allow tests to be run with `python setup.py test'.
     tests_require=[
         'pytest==2.5.1',
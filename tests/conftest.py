@@ -0,0 +1,6 @@
+import sys
+
+collect_ignore = []
+if sys.version_info < (3, 5):
+    # Coroutines defined with async def are a syntax error.
+    collect_ignore.append('test_aio.py')
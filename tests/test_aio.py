@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+from pytest import fixture, raises
+
+from ecs.aio import AsyncSystem, AsyncSystemManager
+from ecs.managers import EntityManager, SystemManager
+from ecs.models import Component, System
+
+
+class Health(Component):
+    pass
+
+
+class Recorder(System):
+    def __init__(self, log):
+        super(Recorder, self).__init__()
+        self.log = log
+
+    def update(self, dt):
+        self.log.append((type(self).__name__, dt, threading.current_thread()))
+
+
+class Input(Recorder):
+    pass
+
+
+class Physics(Recorder):
+    pass
+
+
+class Persistence(AsyncSystem):
+    def __init__(self, log):
+        super(Persistence, self).__init__()
+        self.log = log
+
+    async def update(self, dt):
+        await asyncio.sleep(0)
+        self.log.append(('Persistence', dt, threading.current_thread()))
+        self.commands.create_entity(Health())
+
+
+@fixture
+def log():
+    return []
+
+
+@fixture
+def manager(log):
+    manager = AsyncSystemManager(EntityManager())
+    manager.add_system(Input(log), priority=0, offload=False)
+    manager.add_system(Persistence(log), priority=1)
+    manager.add_system(Physics(log), priority=2)
+    return manager
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_update_async(manager, log):
+    run(manager.update_async(0.5))
+    main = threading.current_thread()
+    assert [(name, dt) for name, dt, _ in log] == [
+        ('Input', 0.5), ('Persistence', 0.5), ('Physics', 0.5)]
+    assert [thread is main for _, _, thread in log] == [True, True, False]
+    assert len(list(manager._entity_manager.pairs_for_type(Health))) == 1
+
+
+def test_sync_update_rejected(manager, log):
+    with raises(TypeError):
+        manager.update(0.5)
+    assert log == []
+
+
+def test_async_system_requires_async_manager(log):
+    manager = SystemManager(EntityManager())
+    system = Persistence(log)
+    with raises(TypeError):
+        manager.add_system(system)
+    assert system.system_manager is None
+    assert manager.systems == []
+
+
+def test_schedules(manager, log):
+    manager.remove_system(Physics)
+    manager.add_system(Physics(log), priority=2, fixed_step=0.2)
+    run(manager.update_async(0.5))
+    assert [name for name, _, _ in log].count('Physics') == 2
+
+
+def test_remove_system(manager, log):
+    manager.remove_system(Input)
+    assert manager._inline == set(
+        system for system in manager.systems
+        if isinstance(system, Persistence))
+
+
+def test_run(manager, log):
+    run(manager.run(rate=1000, max_frames=3))
+    assert [name for name, _, _ in log].count('Physics') == 3
+    assert all(dt >= 0 for _, dt, _ in log)
+
+
+def test_stop(manager, log):
+    class Stop(System):
+        def update(self, dt):
+            self.system_manager.stop()
+    manager.add_system(Stop(), priority=3)
+    run(manager.run(rate=1000))
+    assert len(log) == 3
+
+
+def test_profiling(manager, log):
+    profiler = manager.enable_profiling()
+    run(manager.update_async(0.5))
+    assert len(log) == 3
+    assert len(profiler.systems[Physics].wall) == 1
@@ -0,0 +1,79 @@
+import gc
+
+from pytest import fixture
+
+from ecs.archetypes import ArchetypeEntityManager, ArchetypeView
+from ecs.models import Component
+
+from tests import test_managers
+
+
+class TestArchetypeEntityManager(test_managers.TestEntityManager):
+    """Run the :class:`ecs.managers.EntityManager` tests against the
+    archetype storage engine, which has the same public API.
+    """
+    @fixture
+    def manager(self):
+        return ArchetypeEntityManager()
+
+    class TestView(test_managers.TestEntityManager.TestView):
+        def test_dropped_when_unreferenced(self, manager, component_types):
+            manager.view(component_types[3])
+            gc.collect()
+            assert len(manager._views) == 0
+
+        def test_is_archetype_view(self, view):
+            assert isinstance(view, ArchetypeView)
+
+    def test_archetypes(self, manager, entities, component_types):
+        assert sorted(
+            (sorted(type_.__name__ for type_ in archetype.component_types),
+             archetype.entities)
+            for archetype in manager.archetypes) == [
+            (['Component0'], [entities[0], entities[1]]),
+            (['Component0', 'Component4'], [entities[3]]),
+            (['Component3'], [entities[4]])]
+
+    def test_rows_stay_dense(self, manager, entities, components,
+                             component_types):
+        manager.remove_component(entities[0], component_types[0])
+        archetype = manager._entity_archetypes[entities[1]]
+        assert archetype.entities == [entities[1]]
+        assert archetype.columns[component_types[0]] == [components[5]]
+
+    def test_move_between_archetypes(self, manager, entities, components,
+                                     component_types):
+        new_component = component_types[2]()
+        manager.add_component(entities[3], new_component)
+        assert set(manager.components_for_entity(entities[3])) == set(
+            [components[0], components[4], new_component])
+        manager.remove_component(entities[3], component_types[0])
+        assert set(manager.components_for_entity(entities[3])) == set(
+            [components[4], new_component])
+
+    def test_view_picks_up_new_archetypes(self, manager, entities,
+                                          components, component_types):
+        view = manager.view(component_types[0])
+        extra_type = type('Extra', (Component,), {})
+        extra = extra_type()
+        manager.add_component(entities[0], extra)
+        assert len(view) == 3
+        assert (entities[0], components[0]) in list(view)
+
+    def test_iteration_is_not_disturbed_by_changes(
+            self, manager, entities, components, component_types):
+        extra_type = type('Extra', (Component,), {})
+        visited = []
+        for entity, component in manager.pairs_for_type(component_types[0]):
+            visited.append(entity)
+            manager.add_component(entity, extra_type())
+        assert len(visited) == 3
+        assert set(visited) == set([entities[0], entities[1], entities[3]])
+
+    def test_database_is_a_copy(self, manager, entities, component_types):
+        manager.database[component_types[0]].clear()
+        assert len(list(manager.pairs_for_type(component_types[0]))) == 3
+
+    def test_no_entity_manager_tables(self, manager):
+        assert not hasattr(manager, '_database')
+        assert not hasattr(manager, '_entity_types')
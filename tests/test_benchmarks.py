@@ -0,0 +1,40 @@
+import json
+
+from benchmarks import suite
+
+
+class TestBenchmarks(object):
+    def test_run_benchmarks(self):
+        results = suite.run_benchmarks(['dict', 'archetype'], [50], 2)
+        assert len(results) == 2 * len(suite.SCENARIOS)
+        assert all(time >= 0 for time in results.values())
+        assert 'archetype/system_update/50' in results
+
+    def test_compare(self):
+        baseline = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+        results = {'a': 1.1, 'b': 1.5, 'd': 9.0}
+        assert suite.compare(results, baseline, 0.2) == [('b', 1.0, 1.5)]
+
+    def test_main_against_baseline(self, tmpdir):
+        baseline = str(tmpdir.join('baseline.json'))
+        output = str(tmpdir.join('results.json'))
+        args = ['--sizes', '20', '--repeat', '1', '--only', 'query',
+                '--baseline', baseline]
+        assert suite.main(args + ['--save-baseline']) == 0
+        with open(baseline) as f:
+            saved = json.load(f)
+        assert sorted(saved['results']) == [
+            'archetype/query/20', 'dict/query/20']
+        for key in saved['results']:
+            saved['results'][key] = 1e-12
+        with open(baseline, 'w') as f:
+            json.dump(saved, f)
+        assert suite.main(args + ['--output', output]) == 1
+        with open(output) as f:
+            assert len(json.load(f)['results']) == 2
+
+    def test_main_without_baseline(self, tmpdir):
+        args = ['--sizes', '20', '--repeat', '1', '--only', 'query',
+                '--baseline', str(tmpdir.join('missing.json'))]
+        assert suite.main(args) == 2
+        assert suite.main(args + ['--no-compare']) == 0
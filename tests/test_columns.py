@@ -0,0 +1,236 @@
+from pytest import fixture, raises
+import pytest
+
+from ecs.archetypes import ArchetypeEntityManager
+from ecs.columns import ColumnarComponent, ColumnProxy, ComponentColumns
+from ecs.managers import EntityManager
+from ecs.models import Component
+
+numpy = pytest.importorskip('numpy')
+
+
+class Position(ColumnarComponent):
+    fields = (('x', 'f8'), ('y', 'f8'))
+
+
+class Health(ColumnarComponent):
+    fields = (('points', 'i4'),)
+
+
+class TestColumnarComponent(object):
+    def test_positional_and_keyword_values(self):
+        position = Position(1.0, y=2.0)
+        assert (position.x, position.y) == (1.0, 2.0)
+
+    def test_default_values(self):
+        assert Position().x == 0
+
+    def test_unknown_field(self):
+        with raises(TypeError):
+            Position(z=1.0)
+
+    def test_too_many_values(self):
+        with raises(TypeError):
+            Position(1.0, 2.0, 3.0)
+
+
+class TestEntityManagerColumns(object):
+    @fixture
+    def manager(self):
+        return EntityManager()
+
+    @fixture
+    def entities(self, manager):
+        entities = [manager.create_entity() for _ in range(40)]
+        for i, entity in enumerate(entities):
+            manager.add_component(entity, Position(i, -i))
+        return entities
+
+    def test_table_is_column_store(self, manager, entities):
+        assert isinstance(manager.database[Position], ComponentColumns)
+        assert manager.columns(Position) is manager.database[Position]
+        assert len(manager.columns(Position)) == 40
+
+    def test_columns(self, manager, entities):
+        store = manager.columns(Position)
+        assert list(store.column('x')) == list(range(40))
+        assert store.entities == entities
+
+    def test_vectorized_update(self, manager, entities):
+        store = manager.columns(Position)
+        store.column('x')[:] += 0.5
+        assert manager.component_for_entity(entities[7], Position).x == 7.5
+
+    def test_proxy(self, manager, entities):
+        proxy = manager.component_for_entity(entities[3], Position)
+        assert isinstance(proxy, ColumnProxy)
+        assert proxy.entity == entities[3]
+        assert (proxy.x, proxy.y) == (3, -3)
+        proxy.y = 10
+        assert manager.columns(Position).column('y')[3] == 10
+
+    def test_detach(self, manager, entities):
+        position = manager.component_for_entity(
+            entities[3], Position).detach()
+        assert type(position) is Position
+        assert (position.x, position.y) == (3, -3)
+
+    def test_replace_component(self, manager, entities):
+        manager.add_component(entities[3], Position(100, 200))
+        assert len(manager.columns(Position)) == 40
+        assert manager.component_for_entity(entities[3], Position).x == 100
+
+    def test_remove_zeroes_row(self, manager, entities):
+        manager.remove_component(entities[3], Position)
+        manager.remove_entity(entities[10])
+        store = manager.columns(Position)
+        assert len(store) == 38
+        assert set(store.entities) == set(entities) - set(
+            [entities[3], entities[10]])
+        assert store.column('x')[3] == 0
+        assert not store.mask[3]
+        for entity, position in manager.pairs_for_type(Position):
+            assert position.x == entities.index(entity)
+            assert position.y == -entities.index(entity)
+
+    def test_rows_follow_entity_indices(self, manager, entities):
+        manager.remove_entity(entities[3])
+        entity = manager.create_entity()
+        manager.add_component(entity, Position(100, 200))
+        assert manager.columns(Position).column('x')[3] == 100
+
+    def test_columns_of_different_types_line_up(self, manager, entities):
+        manager.add_component(entities[7], Health(7))
+        manager.add_component(entities[2], Health(2))
+        positions = manager.columns(Position)
+        health = manager.columns(Health)
+        assert len(health.column('points')) == len(positions.column('x'))
+        positions.column('x')[:] += health.column('points')
+        assert manager.component_for_entity(entities[7], Position).x == 14
+        assert manager.component_for_entity(entities[2], Position).x == 4
+        assert manager.component_for_entity(entities[5], Position).x == 5
+        assert list(health.mask.nonzero()[0]) == [2, 7]
+
+    def test_invalid_value_leaves_store_unchanged(self, manager, entities):
+        entity = manager.create_entity()
+        with raises(ValueError):
+            manager.add_component(entity, Position('abc'))
+        assert entity not in manager.columns(Position)
+        assert not manager.has_component(entity, Position)
+        manager.remove_component(entity, Position)
+        with raises(ValueError):
+            manager.add_component(entities[3], Position(1, 'abc'))
+        assert manager.component_for_entity(entities[3], Position).x == 3
+
+    def test_invalid_first_component_leaves_nothing(self, manager):
+        manager.track_changes(Health)
+        tick = manager.change_tick
+        entity = manager.create_entity()
+        with raises(ValueError):
+            manager.add_component(entity, Health('abc'))
+        assert manager.added(Health, tick) == []
+        assert list(manager.pairs_for_type(Health)) == []
+        assert Health not in manager.database
+        manager.add_component(entity, Health(3))
+        assert manager.added(Health, tick) == [entity]
+
+    def test_replaced_component_given_to_remove_hooks(
+            self, manager, entities):
+        removed = []
+        manager.on_remove(Position, lambda entity, position: removed.append(
+            (entity, position.x, position.y)))
+        manager.add_component(entities[3], Position(10, 20))
+        assert removed == [(entities[3], 3, -3)]
+        assert manager.component_for_entity(entities[3], Position).x == 10
+
+    def test_add_proxy(self, manager, entities):
+        proxy = manager.component_for_entity(entities[3], Position)
+        entity = manager.create_entity()
+        manager.add_component(entity, proxy)
+        assert manager.component_for_entity(entity, Position).y == -3
+        assert type(proxy) not in manager.database
+        assert len(manager.columns(Position)) == 41
+
+    def test_add_components_bulk_columns(self, manager, entities):
+        particles = manager.create_entities(1000)
+        manager.add_components_bulk(
+            Position, particles, columns={'x': numpy.arange(1000.0)})
+        store = manager.columns(Position)
+        assert len(store) == 1040
+        assert manager.component_for_entity(particles[10], Position).x == 10
+        assert manager.component_for_entity(particles[10], Position).y == 0
+        assert store.column('x')[particles[999].index] == 999
+        assert len(list(manager.query(Position))) == 1040
+
+    def test_add_components_bulk_instances(self, manager, entities):
+        manager.add_components_bulk(
+            Health, entities[:3], [Health(i) for i in range(3)])
+        assert [manager.component_for_entity(entity, Health).points
+                for entity in entities[:3]] == [0, 1, 2]
+
+    def test_add_components_bulk_invalid(self, manager, entities):
+        particles = manager.create_entities(3)
+        with raises(ValueError):
+            manager.add_components_bulk(
+                Health, particles, columns={'points': [1, 2]})
+        with raises(TypeError):
+            manager.add_components_bulk(
+                Health, particles, columns={'hit_points': 1})
+        assert len(manager.columns(Health)) == 0
+        assert not manager.has_component(particles[0], Health)
+
+    def test_columns_of_non_columnar_type(self, manager):
+        with raises(TypeError):
+            manager.columns(Component)
+
+    def test_columns_of_absent_type(self, manager, entities):
+        store = manager.columns(Health)
+        assert len(store) == 0
+        assert len(store.column('points')) == 40
+        assert Health not in manager.database
+
+    def test_remove_last_component_drops_table(self, manager, entities):
+        for entity in entities:
+            manager.remove_entity(entity)
+        assert Position not in manager.database
+
+    def test_rows_for(self, manager, entities):
+        for entity in entities[::2]:
+            manager.add_component(entity, Health(int(entity.index)))
+        health = manager.columns(Health)
+        positions = manager.columns(Position)
+        rows = positions.rows_for(health.entities)
+        assert list(rows) == list(range(0, 40, 2))
+        assert list(positions.column('x')[rows]) == list(
+            health.column('points')[rows])
+        with raises(KeyError):
+            health.rows_for(entities[1:2])
+
+    def test_query_with_columnar_types(self, manager, entities):
+        manager.add_component(entities[5], Health(50))
+        assert [(entity, position.x, health.points) for
+                entity, position, health in
+                manager.query(Position, Health)] == [(entities[5], 5, 50)]
+
+    def test_empty_columns(self, manager):
+        assert len(manager.columns(Health)) == 0
+        assert len(manager.columns(Health).column('points')) == 0
+        assert Health not in manager.database
+
+
+class TestArchetypeEntityManagerColumns(TestEntityManagerColumns):
+    @fixture
+    def manager(self):
+        return ArchetypeEntityManager()
+
+    def test_table_is_column_store(self, manager, entities):
+        assert isinstance(manager.columns(Position), ComponentColumns)
+        assert manager.columns(Position) is manager.columns(Position)
+        assert len(manager.columns(Position)) == 40
+
+    def test_archetype_holds_proxies(self, manager, entities):
+        manager.add_component(entities[3], Health(3))
+        manager.columns(Position).column('x')[3] = 100
+        for entity, position, health in manager.query(Position, Health):
+            assert isinstance(position, ColumnProxy)
+            assert (position.x, health.points) == (100, 3)
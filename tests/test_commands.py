@@ -0,0 +1,145 @@
+import threading
+
+from pytest import fixture, raises
+
+from ecs.commands import (
+    CommandBuffer, SYNC_FRAME, SYNC_PRIORITY, SYNC_SYSTEM)
+from ecs.exceptions import StaleEntityError
+from ecs.managers import EntityManager, SystemManager
+from ecs.models import Component, System
+from ecs.parallel import ParallelSystemManager, ThreadPoolExecutor
+
+import pytest
+
+
+class Lifetime(Component):
+    def __init__(self, remaining):
+        self.remaining = remaining
+
+
+class Marker(Component):
+    pass
+
+
+class TestCommandBuffer(object):
+    @fixture
+    def entity_manager(self):
+        return EntityManager()
+
+    @fixture
+    def commands(self, entity_manager):
+        return CommandBuffer(entity_manager)
+
+    def test_commands_are_deferred(self, entity_manager, commands):
+        entity = commands.create_entity(Lifetime(1), Marker())
+        assert len(commands) == 2
+        assert not entity_manager.has_component(entity, Marker)
+        commands.flush()
+        assert len(commands) == 0
+        assert entity_manager.has_component(entity, Lifetime)
+        assert entity_manager.has_component(entity, Marker)
+
+    def test_concurrent_creation(self, entity_manager, commands):
+        created = []
+
+        def create():
+            created.extend(commands.create_entity(Marker())
+                           for _ in range(500))
+        threads = [threading.Thread(target=create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(entity.index for entity in created)) == 2000
+        commands.flush()
+        assert len(list(entity_manager.pairs_for_type(Marker))) == 2000
+
+    def test_commands_are_applied_in_order(self, entity_manager, commands):
+        entity = entity_manager.create_entity()
+        commands.add_component(entity, Marker())
+        commands.remove_component(entity, Marker)
+        commands.add_component(entity, Lifetime(1))
+        commands.remove_entity(entity)
+        commands.flush()
+        assert not entity_manager.is_alive(entity)
+        assert entity_manager.database == {}
+
+    def test_structural_changes_while_iterating(
+            self, entity_manager, commands):
+        for i in range(10):
+            entity_manager.add_component(
+                entity_manager.create_entity(), Lifetime(i % 2))
+        for entity, lifetime in entity_manager.pairs_for_type(Lifetime):
+            if lifetime.remaining == 0:
+                commands.remove_entity(entity)
+            else:
+                commands.add_component(entity, Marker())
+        commands.flush()
+        assert len(entity_manager.database[Lifetime]) == 5
+        assert len(entity_manager.database[Marker]) == 5
+
+    def test_failed_command_keeps_the_rest(self, entity_manager, commands):
+        entity = entity_manager.create_entity()
+        entity_manager.remove_entity(entity)
+        other = entity_manager.create_entity()
+        commands.add_component(entity, Marker())
+        commands.add_component(other, Marker())
+        with raises(StaleEntityError):
+            commands.flush()
+        assert len(commands) == 1
+        commands.flush()
+        assert entity_manager.has_component(other, Marker)
+
+    def test_clear(self, entity_manager, commands):
+        commands.create_entity(Marker())
+        commands.clear()
+        commands.flush()
+        assert entity_manager.database == {}
+
+
+def make_system(name, log):
+    def update(self, dt):
+        log.append((name, len(self.entity_manager.database.get(Marker, ()))))
+        self.commands.create_entity(Marker())
+    return type(name, (System,), {'update': update})()
+
+
+class TestSystemManagerSync(object):
+    def run(self, manager_type, sync, **kwargs):
+        log = []
+        manager = manager_type(EntityManager(), sync=sync, **kwargs)
+        manager.add_system(make_system('A', log), priority=0)
+        manager.add_system(make_system('B', log), priority=0)
+        manager.add_system(make_system('C', log), priority=1)
+        try:
+            manager.update(0)
+        finally:
+            if hasattr(manager, 'shutdown'):
+                manager.shutdown()
+        assert len(manager.commands) == 0
+        return log
+
+    def test_sync_after_each_system(self):
+        assert self.run(SystemManager, SYNC_SYSTEM) == [
+            ('A', 0), ('B', 1), ('C', 2)]
+
+    def test_sync_after_each_priority(self):
+        assert self.run(SystemManager, SYNC_PRIORITY) == [
+            ('A', 0), ('B', 0), ('C', 2)]
+
+    def test_sync_after_frame(self):
+        assert self.run(SystemManager, SYNC_FRAME) == [
+            ('A', 0), ('B', 0), ('C', 0)]
+
+    def test_invalid_sync(self):
+        with raises(ValueError):
+            SystemManager(EntityManager(), sync='never')
+
+    @pytest.mark.skipif(
+        ThreadPoolExecutor is None, reason='requires concurrent.futures')
+    def test_parallel_sync_after_each_stage(self):
+        # Undeclared systems conflict, so each one is a stage of its own.
+        assert self.run(ParallelSystemManager, SYNC_SYSTEM) == [
+            ('A', 0), ('B', 1), ('C', 2)]
+        assert self.run(ParallelSystemManager, SYNC_FRAME) == [
+            ('A', 0), ('B', 0), ('C', 0)]
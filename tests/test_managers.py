@@ -1,3 +1,4 @@
+import gc
 import re
 import random
 
@@ -6,11 +7,12 @@ import pytest
 usefixtures = pytest.mark.usefixtures
 from mock import MagicMock, sentinel
 
-from ecs.models import Component, System
+from ecs.commands import SYNC_FRAME
+from ecs.models import Component, Entity, System
 from ecs.managers import EntityManager, SystemManager
 from ecs.exceptions import (
     NonexistentComponentTypeForEntity, DuplicateSystemTypeError,
-    SystemAlreadyAddedToManagerError)
+    StaleEntityError, SystemAlreadyAddedToManagerError)
 
 from tests.helpers import assert_exc_info_msg
 
@@ -49,6 +51,67 @@ class TestEntityManager(object):
         entities = set([manager.create_entity() for _ in range(num)])
         assert len(entities) == num
 
+    class TestEntityRecycling(object):
+        def test_index_is_reused(self, manager, entities):
+            manager.remove_entity(entities[3])
+            entity = manager.create_entity()
+            assert entity.index == entities[3].index
+            assert entity.generation == entities[3].generation + 1
+
+        def test_reused_entity_is_distinct(self, manager, entities):
+            manager.remove_entity(entities[3])
+            entity = manager.create_entity()
+            assert entity != entities[3]
+            assert hash(entity) != hash(entities[3])
+
+        def test_reused_entity_has_no_components(self, manager, entities):
+            manager.remove_entity(entities[3])
+            entity = manager.create_entity()
+            assert manager.components_for_entity(entity) == ()
+
+        def test_oldest_index_reused_first(self, manager, entities):
+            manager.remove_entity(entities[4])
+            manager.remove_entity(entities[1])
+            assert manager.create_entity().index == 4
+            assert manager.create_entity().index == 1
+            assert manager.create_entity().index == 5
+
+        def test_is_alive(self, manager, entities):
+            manager.remove_entity(entities[3])
+            entity = manager.create_entity()
+            assert manager.is_alive(entity)
+            assert manager.is_alive(entities[2])
+            assert not manager.is_alive(entities[3])
+
+        def test_stale_entity_removal_is_ignored(
+                self, manager, entities, components, component_types):
+            manager.remove_entity(entities[3])
+            entity = manager.create_entity()
+            manager.add_component(entity, components[4])
+            manager.remove_entity(entities[3])
+            assert manager.component_for_entity(
+                entity, component_types[4]) is components[4]
+            assert manager.create_entity().index == 5
+
+        def test_stale_entity_cannot_get_components(
+                self, manager, entities, components):
+            manager.remove_entity(entities[3])
+            with raises(StaleEntityError):
+                manager.add_component(entities[3], components[1])
+            with raises(StaleEntityError):
+                manager.add_component(Entity(100), components[1])
+            assert not manager.has_component(
+                entities[3], type(components[1]))
+
+        def test_stale_entity_does_not_see_new_components(
+                self, manager, entities, components, component_types):
+            manager.remove_entity(entities[3])
+            entity = manager.create_entity()
+            manager.add_component(entity, components[4])
+            with raises(NonexistentComponentTypeForEntity):
+                manager.component_for_entity(entities[3], component_types[4])
+            assert manager.components_for_entity(entities[3]) == ()
+
     class TestPairsForType(object):
         def test_existing_component_type(
                 self, manager, entities, components, component_types):
@@ -61,6 +124,81 @@ class TestEntityManager(object):
                 self, manager, entities, component_types):
             assert list(manager.pairs_for_type(component_types[2])) == []
 
+    class TestQuery(object):
+        def test_single_component_type(
+                self, manager, entities, components, component_types):
+            assert sorted(manager.query(component_types[0]),
+                          key=lambda row: hash(row[0])) == [
+                (entities[0], components[0]),
+                (entities[1], components[5]),
+                (entities[3], components[0])]
+
+        def test_multiple_component_types(
+                self, manager, entities, components, component_types):
+            assert list(manager.query(
+                component_types[0], component_types[4])) == [
+                (entities[3], components[0], components[4])]
+
+        def test_order_follows_requested_types(
+                self, manager, entities, components, component_types):
+            assert list(manager.query(
+                component_types[4], component_types[0])) == [
+                (entities[3], components[4], components[0])]
+
+        def test_no_matches(self, manager, component_types):
+            assert list(manager.query(
+                component_types[0], component_types[3])) == []
+
+        def test_nonexistent_component_type(self, manager, component_types):
+            assert list(manager.query(
+                component_types[0], component_types[2])) == []
+
+        def test_no_component_types(self, manager):
+            assert list(manager.query()) == []
+
+    class TestView(object):
+        @fixture
+        def view(self, manager, component_types):
+            return manager.view(component_types[0], component_types[4])
+
+        def test_initial_rows(self, view, entities, components):
+            assert list(view) == [
+                (entities[3], components[0], components[4])]
+
+        def test_same_view_is_returned(self, manager, view, component_types):
+            assert manager.view(
+                component_types[0], component_types[4]) is view
+
+        def test_add_component(
+                self, manager, view, entities, components, component_types):
+            new_component = component_types[4]()
+            manager.add_component(entities[0], new_component)
+            assert len(view) == 2
+            assert entities[0] in view
+            assert (entities[0], components[0], new_component) in list(view)
+
+        def test_replace_component(
+                self, manager, view, entities, components, component_types):
+            new_component = component_types[0]()
+            manager.add_component(entities[3], new_component)
+            assert list(view) == [
+                (entities[3], new_component, components[4])]
+
+        def test_remove_component(
+                self, manager, view, entities, component_types):
+            manager.remove_component(entities[3], component_types[4])
+            assert list(view) == []
+
+        def test_remove_entity(self, manager, view, entities):
+            manager.remove_entity(entities[3])
+            assert list(view) == []
+
+        def test_dropped_when_unreferenced(self, manager, component_types):
+            manager.view(component_types[3])
+            gc.collect()
+            assert len(manager._views) == 0
+            assert len(manager._views_by_type[component_types[3]]) == 0
+
     class TestRemoveComponent(object):
         def test_remove_some_of_a_component(
                 self, manager, entities, components, component_types):
@@ -113,6 +251,227 @@ class TestEntityManager(object):
                 "Nonexistent component type: "
                 "`Component1' for entity: `Entity(3)'")
 
+    class TestBulk(object):
+        def test_create_entities(self, manager, entities):
+            manager.remove_entity(entities[1])
+            new_entities = manager.create_entities(3)
+            assert [entity.index for entity in new_entities] == [1, 5, 6]
+            assert new_entities[0].generation == 1
+            assert all(manager.is_alive(entity) for entity in new_entities)
+            assert manager.create_entity().index == 7
+
+        def test_add_components_bulk(self, manager, entities,
+                                     component_types):
+            new_entities = manager.create_entities(100)
+            instances = [component_types[1]() for _ in new_entities]
+            manager.add_components_bulk(
+                component_types[1], new_entities + entities[:1],
+                instances + [instances[0]])
+            assert manager.component_for_entity(
+                new_entities[42], component_types[1]) is instances[42]
+            assert manager.has_component(entities[0], component_types[1])
+            assert manager.has_component(entities[0], component_types[0])
+            assert len(list(manager.pairs_for_type(component_types[1]))) == (
+                101)
+
+        def test_bulk_updates_views(self, manager, entities, component_types):
+            view = manager.view(component_types[0], component_types[2])
+            manager.add_components_bulk(
+                component_types[2], entities[:2],
+                (component_types[2]() for _ in range(2)))
+            assert len(view) == 2
+
+        def test_bulk_rejects_stale_entities(self, manager, entities,
+                                             component_types):
+            manager.remove_entity(entities[1])
+            with raises(StaleEntityError):
+                manager.add_components_bulk(
+                    component_types[2], entities[:2],
+                    [component_types[2](), component_types[2]()])
+            assert not manager.has_component(entities[0], component_types[2])
+
+        def test_bulk_length_mismatch(self, manager, entities,
+                                      component_types):
+            with raises(ValueError):
+                manager.add_components_bulk(
+                    component_types[2], entities[:2], [component_types[2]()])
+            assert list(manager.pairs_for_type(component_types[2])) == []
+
+        def test_bulk_columns_of_non_columnar_type(
+                self, manager, entities, component_types):
+            with raises(TypeError):
+                manager.add_components_bulk(
+                    component_types[2], entities, columns={'x': 0})
+
+    class TestChanges(object):
+        @fixture
+        def tracked(self, manager, component_types):
+            manager.track_changes(component_types[0])
+            return component_types[0]
+
+        def test_added(self, manager, entities, tracked):
+            new_component = tracked()
+            manager.add_component(entities[2], new_component)
+            assert manager.added(tracked) == [entities[2]]
+            assert manager.changed(tracked) == []
+
+        def test_replaced(self, manager, entities, tracked):
+            manager.add_component(entities[3], tracked())
+            assert manager.added(tracked) == []
+            assert manager.changed(tracked) == [entities[3]]
+
+        def test_removed(self, manager, entities, tracked):
+            manager.add_component(entities[2], tracked())
+            manager.remove_component(entities[2], tracked)
+            manager.remove_entity(entities[3])
+            assert manager.added(tracked) == []
+            assert manager.removed(tracked) == [entities[2], entities[3]]
+
+        def test_readded_after_removal(self, manager, entities, tracked):
+            manager.remove_component(entities[0], tracked)
+            manager.add_component(entities[0], tracked())
+            assert manager.removed(tracked) == []
+            assert manager.added(tracked) == [entities[0]]
+
+        def test_since(self, manager, entities, tracked):
+            manager.add_component(entities[2], tracked())
+            tick = manager.change_tick
+            manager.mark_changed(entities[0], tracked)
+            manager.add_component(entities[4], tracked())
+            assert manager.added(tracked, tick) == [entities[4]]
+            assert manager.changed(tracked, tick) == [entities[0]]
+            assert manager.added(tracked) == [entities[2], entities[4]]
+            assert manager.added(tracked, manager.change_tick) == []
+
+        def test_latest_change_only(self, manager, entities, tracked):
+            manager.mark_changed(entities[0], tracked)
+            manager.mark_changed(entities[1], tracked)
+            tick = manager.change_tick
+            component = manager.modify_component(entities[0], tracked)
+            assert component is manager.component_for_entity(
+                entities[0], tracked)
+            assert manager.changed(tracked) == [entities[1], entities[0]]
+            assert manager.changed(tracked, tick) == [entities[0]]
+
+        def test_mark_changed_without_component(self, manager, entities,
+                                                tracked):
+            with raises(NonexistentComponentTypeForEntity):
+                manager.mark_changed(entities[2], tracked)
+
+        def test_bulk(self, manager, entities, tracked):
+            manager.add_components_bulk(
+                tracked, entities[2:4], [tracked(), tracked()])
+            assert manager.added(tracked) == [entities[2]]
+            assert manager.changed(tracked) == [entities[3]]
+
+        def test_untracked_type(self, manager, entities, component_types):
+            manager.mark_changed(entities[3], component_types[4])
+            with raises(ValueError):
+                manager.added(component_types[4])
+
+        def test_discard_changes(self, manager, entities, tracked):
+            manager.remove_entity(entities[0])
+            tick = manager.change_tick
+            manager.remove_entity(entities[1])
+            manager.discard_changes(tick)
+            assert manager.removed(tracked) == [entities[1]]
+
+    class TestHooks(object):
+        @fixture
+        def calls(self, manager, component_types):
+            calls = []
+            for event, register in (('add', manager.on_add),
+                                    ('remove', manager.on_remove)):
+                register(component_types[0],
+                         lambda entity, component, event=event: calls.append(
+                             (event, entity, component)))
+            return calls
+
+        def test_add(self, manager, entities, component_types, calls):
+            new_component = component_types[0]()
+            manager.add_component(entities[2], new_component)
+            assert calls == [('add', entities[2], new_component)]
+
+        def test_types_without_hooks_not_dispatched(
+                self, manager, entities, component_types, calls):
+            manager._call_add_hooks = MagicMock()
+            manager._call_remove_hooks = MagicMock()
+            manager.add_component(entities[2], component_types[1]())
+            manager.remove_component(entities[2], component_types[1])
+            manager.add_components_bulk(
+                component_types[1], entities[:2],
+                [component_types[1]() for _ in range(2)])
+            assert not manager._call_add_hooks.called
+            assert not manager._call_remove_hooks.called
+
+        def test_replace(self, manager, entities, components,
+                         component_types, calls):
+            new_component = component_types[0]()
+            manager.add_component(entities[3], new_component)
+            assert calls == [('remove', entities[3], components[0]),
+                             ('add', entities[3], new_component)]
+
+        def test_remove_component(self, manager, entities, components,
+                                  component_types, calls):
+            def check(entity, component):
+                assert manager.has_component(entity, component_types[0])
+            manager.on_remove(component_types[0], check)
+            manager.remove_component(entities[1], component_types[0])
+            manager.remove_component(entities[2], component_types[0])
+            assert calls == [('remove', entities[1], components[5])]
+
+        def test_remove_entity(self, manager, entities, components, calls):
+            manager.remove_entity(entities[3])
+            assert calls == [('remove', entities[3], components[0])]
+
+        def test_bulk(self, manager, entities, components, component_types,
+                      calls):
+            instances = [component_types[0](), component_types[0]()]
+            manager.add_components_bulk(
+                component_types[0], entities[2:4], instances)
+            assert calls == [('remove', entities[3], components[0]),
+                             ('add', entities[2], instances[0]),
+                             ('add', entities[3], instances[1])]
+
+        def test_other_types(self, manager, entities, component_types,
+                             calls):
+            manager.add_component(entities[2], component_types[1]())
+            manager.remove_entity(entities[4])
+            assert calls == []
+
+        def test_remove_hook(self, manager, entities, component_types):
+            calls = []
+            manager.on_add(component_types[1], calls.append)
+            manager.remove_hook(component_types[1], calls.append)
+            manager.add_component(entities[2], component_types[1]())
+            assert calls == []
+            assert manager._add_hooks == {}
+
+    class TestComponentsForEntity(object):
+        def test_normal_usage(self, manager, entities, components):
+            assert set(manager.components_for_entity(entities[3])) == set(
+                [components[0], components[4]])
+
+        def test_entity_without_components(self, manager, entities):
+            assert manager.components_for_entity(entities[2]) == ()
+
+        def test_after_remove_component(
+                self, manager, entities, components, component_types):
+            manager.remove_component(entities[3], component_types[0])
+            assert manager.components_for_entity(entities[3]) == (
+                components[4],)
+
+    def test_has_component(self, manager, entities, component_types):
+        assert manager.has_component(entities[3], component_types[4])
+        assert not manager.has_component(entities[3], component_types[1])
+        assert not manager.has_component(entities[2], component_types[0])
+
+    def test_remove_entity_without_components(
+            self, manager, entities, components, component_types):
+        db_before = dict(manager.database)
+        manager.remove_entity(entities[2])
+        assert db_before == manager.database
+
     def test_remove_entity(
             self, manager, entities, components, component_types):
         manager.remove_entity(entities[3])
@@ -121,6 +480,7 @@ class TestEntityManager(object):
                 entities[0]: components[0], entities[1]: components[5]},
             component_types[3]: {entities[4]: components[3]},
         }
+        assert manager.components_for_entity(entities[3]) == ()
 
 
 class TestSystemManager(object):
@@ -222,7 +582,49 @@ class TestSystemManager(object):
             manager.remove_system(system_types[0])
             assert systems[0].system_manager is None
 
+        def test_remove_among_same_priority(self, system_types):
+            manager = SystemManager(sentinel.entity_manager)
+            systems = [type_() for type_ in system_types]
+            for system in systems:
+                manager.add_system(system, priority=1)
+            manager.remove_system(system_types[2])
+            assert manager.systems == systems[:2] + systems[3:]
+            assert manager._priorities == [1] * 4
+
+    class TestEnableSystem(object):
+        def test_disabled_not_run(self, manager, systems, system_types):
+            manager.disable_system(system_types[0])
+            assert not manager.is_enabled(system_types[0])
+            manager.update(20)
+            assert not systems[0].update.called
+            assert systems[0] in manager.systems
+
+        def test_enabled_again(self, manager, systems, system_types):
+            manager.disable_system(system_types[0])
+            manager.update(20)
+            manager.enable_system(system_types[0])
+            assert manager.is_enabled(system_types[0])
+            manager.update(30)
+            systems[0].update.assert_called_once_with(30)
+
+        def test_sync_points_skip_disabled(self, system_types):
+            manager = SystemManager(sentinel.entity_manager, sync=SYNC_FRAME)
+            for type_ in system_types[:2]:
+                manager.add_system(type_())
+            manager.disable_system(system_types[1])
+            assert manager._sync_points == frozenset(manager.systems[:1])
+
     def test_update(self, manager, systems):
         manager.update(20)
         for system in systems:
             system.update.assert_called_once_with(20)
+
+    def test_update_after_profiling(self, manager, systems):
+        manager.update(20)
+        profiler = manager.enable_profiling()
+        manager.update(20)
+        manager.disable_profiling()
+        manager.update(20)
+        for system in systems:
+            assert system.update.call_count == 3
+            assert len(profiler.systems[type(system)].wall) == 1
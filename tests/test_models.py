@@ -0,0 +1,117 @@
+from pytest import raises
+
+from ecs.models import Component, Entity, slotted
+from ecs.storage import SparseSet
+
+
+@slotted
+class Position(Component):
+    storage = SparseSet
+    __fields__ = ('x', 'y')
+    x = 0.0
+    y = 0.0
+
+    def norm(self):
+        return abs(self.x) + abs(self.y)
+
+
+@slotted
+class Position3D(Position):
+    z = 0.0
+
+
+class TestEntity(object):
+    def test_equality(self):
+        assert Entity(1) == Entity(1)
+        assert not Entity(1) != Entity(1)
+        assert Entity(1) != Entity(2)
+
+
+class TestSlotted(object):
+    def test_no_instance_dict(self):
+        assert not hasattr(Position(), '__dict__')
+        assert not hasattr(Position3D(), '__dict__')
+        with raises(AttributeError):
+            Position().w = 1
+
+    def test_init(self):
+        position = Position(1.0, y=2.0)
+        assert (position.x, position.y) == (1.0, 2.0)
+        assert Position().x == 0.0
+        with raises(TypeError):
+            Position(1.0, 2.0, 3.0)
+
+    def test_fields(self):
+        assert Position.field_defaults == (('x', 0.0), ('y', 0.0))
+        assert Position3D.__slots__ == ('z',)
+        assert Position3D(1.0, 2.0, 3.0).z == 3.0
+
+    def test_methods_and_settings_are_kept(self):
+        assert Position(1.0, -2.0).norm() == 3.0
+        assert Position.storage is SparseSet
+        assert issubclass(Position, Component)
+
+    def test_eq(self):
+        assert Position(1.0, 2.0) == Position(1.0, 2.0)
+        assert Position(1.0, 2.0) != Position(1.0, 3.0)
+        assert Position(1.0, 2.0) != Position3D(1.0, 2.0)
+        with raises(TypeError):
+            hash(Position())
+
+    def test_repr(self):
+        assert repr(Position3D(1.0, 2.0)) == 'Position3D(x=1.0, y=2.0, z=0.0)'
+
+    def test_mutable_default(self):
+        with raises(ValueError):
+            @slotted
+            class Inventory(Component):
+                items = []
+
+    def test_redefined_base_field(self):
+        @slotted
+        class Position3DOrigin(Position3D):
+            x = 5.0
+
+        position = Position3DOrigin(z=1.0)
+        assert (position.x, position.y, position.z) == (5.0, 0.0, 1.0)
+        assert Position3DOrigin.__slots__ == ()
+        assert [name for name, _ in Position3DOrigin.field_defaults] == [
+            'x', 'y', 'z']
+
+    def test_declared_order(self):
+        @slotted
+        class Color(Component):
+            __fields__ = ('red', 'green', 'blue')
+            blue = 0
+            green = 0
+            red = 0
+
+        assert [name for name, _ in Color.field_defaults] == [
+            'red', 'green', 'blue']
+        assert repr(Color(1, 2)) == 'Color(red=1, green=2, blue=0)'
+
+    def test_order_required(self):
+        with raises(ValueError):
+            @slotted
+            class Color(Component):
+                red = 0
+                green = 0
+
+    def test_order_must_match_fields(self):
+        with raises(ValueError):
+            @slotted
+            class Color(Component):
+                __fields__ = ('red', 'green', 'blue')
+                red = 0
+                green = 0
+        with raises(ValueError):
+            @slotted
+            class Size(Component):
+                __fields__ = ('width', 'width')
+                width = 0
+
+    def test_own_slots_rejected(self):
+        class Declared(Component):
+            __slots__ = ('z',)
+        with raises(ValueError):
+            slotted(Declared)
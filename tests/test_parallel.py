@@ -0,0 +1,331 @@
+import os
+import threading
+
+from pytest import fixture, raises
+import pytest
+
+from ecs.columns import ColumnarComponent, SharedMemory
+from ecs.managers import EntityManager, SystemManager
+from ecs.models import Component, System
+from ecs.parallel import (
+    ParallelSystemManager, ProcessSystem, ThreadPoolExecutor,
+    systems_conflict)
+
+requires_futures = pytest.mark.skipif(
+    ThreadPoolExecutor is None, reason='requires concurrent.futures')
+
+
+class Position(Component):
+    pass
+
+
+class Velocity(Component):
+    pass
+
+
+class Health(Component):
+    pass
+
+
+def make_system(name, reads, writes, update=None):
+    def default_update(self, dt):
+        self.calls.append(dt)
+    system = type(name, (System,), {
+        'reads': reads, 'writes': writes,
+        'update': update or default_update})()
+    system.calls = []
+    return system
+
+
+class TestSystemsConflict(object):
+    def test_disjoint(self):
+        assert not systems_conflict(
+            make_system('A', (Position,), (Velocity,)),
+            make_system('B', (Position,), (Health,)))
+
+    def test_shared_reads(self):
+        assert not systems_conflict(
+            make_system('A', (Position,), ()),
+            make_system('B', (Position,), ()))
+
+    def test_write_read(self):
+        assert systems_conflict(
+            make_system('A', (), (Position,)),
+            make_system('B', (Position,), ()))
+
+    def test_read_write(self):
+        assert systems_conflict(
+            make_system('A', (Position,), ()),
+            make_system('B', (), (Position,)))
+
+    def test_write_write(self):
+        assert systems_conflict(
+            make_system('A', (), (Position,)),
+            make_system('B', (), (Position,)))
+
+    def test_undeclared(self):
+        assert systems_conflict(
+            make_system('A', None, None),
+            make_system('B', (), ()))
+
+
+@requires_futures
+class TestParallelSystemManager(object):
+    @fixture
+    def manager(self, request):
+        manager = ParallelSystemManager(None, max_workers=4)
+        request.addfinalizer(manager.shutdown)
+        return manager
+
+    @fixture
+    def systems(self, manager):
+        systems = [
+            make_system('Movement', (Velocity,), (Position,)),
+            make_system('Regeneration', (), (Health,)),
+            make_system('Render', (Position, Health), ()),
+            make_system('Undeclared', None, None),
+            make_system('Steering', (), (Velocity,)),
+        ]
+        for system in systems:
+            manager.add_system(system)
+        return systems
+
+    def test_stages(self, manager, systems):
+        assert manager.stages == [
+            (systems[0], systems[1]),
+            (systems[2],),
+            (systems[3],),
+            (systems[4],)]
+
+    def test_disabled_systems_not_staged(self, manager, systems):
+        manager.disable_system(type(systems[3]))
+        assert manager.stages == [
+            (systems[0], systems[1]),
+            (systems[2], systems[4])]
+        manager.update(1)
+        assert systems[3].calls == []
+        assert systems[4].calls == [1]
+
+    def test_priority_orders_conflicting_systems(self, manager):
+        movement = make_system('Movement', (Velocity,), (Position,))
+        regeneration = make_system('Regeneration', (), (Health,))
+        steering = make_system('Steering', (), (Velocity,))
+        manager.add_system(movement, priority=1)
+        manager.add_system(regeneration, priority=1)
+        manager.add_system(steering, priority=0)
+        assert manager.stages == [
+            (steering, regeneration),
+            (movement,)]
+
+    def test_pool_sized_after_widest_stage(self):
+        manager = ParallelSystemManager(None)
+        manager.add_system(make_system('Movement', (Velocity,), (Position,)))
+        manager.add_system(make_system('Regeneration', (), (Health,)))
+        try:
+            manager.update(20)
+            assert manager._executor._max_workers == 1
+            manager.add_system(make_system('Sound', (), ()))
+            manager.update(20)
+            assert manager._executor._max_workers == 2
+        finally:
+            manager.shutdown()
+
+    def test_pool_kept_when_toggling_systems(self):
+        manager = ParallelSystemManager(None)
+        for name in ('Movement', 'Regeneration', 'Sound'):
+            manager.add_system(make_system(name, (), ()))
+        try:
+            manager.update(20)
+            executor = manager._executor
+            for system_type in [type(system) for system in manager.systems]:
+                manager.disable_system(system_type)
+                manager.update(20)
+                manager.enable_system(system_type)
+                manager.update(20)
+            assert manager._executor is executor
+        finally:
+            manager.shutdown()
+
+    def test_update_runs_every_system(self, manager, systems):
+        manager.update(20)
+        for system in systems:
+            assert system.calls == [20]
+
+    @pytest.mark.skipif(
+        not hasattr(threading, 'Barrier'), reason='requires threading.Barrier')
+    def test_stage_runs_concurrently(self, manager):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def update(self, dt):
+            barrier.wait()
+            self.calls.append(dt)
+        systems = [make_system('A', (), (Position,), update),
+                   make_system('B', (), (Velocity,), update)]
+        for system in systems:
+            manager.add_system(system)
+        manager.update(20)
+        for system in systems:
+            assert system.calls == [20]
+
+    def test_exception_is_propagated(self, manager):
+        def update(self, dt):
+            raise ValueError(self)
+        manager.add_system(make_system('A', (), (Position,)))
+        manager.add_system(make_system('B', (), (Velocity,), update))
+        with raises(ValueError):
+            manager.update(20)
+
+
+class Point(ColumnarComponent):
+    fields = (('x', 'f8'), ('y', 'f8'))
+
+
+class Speed(ColumnarComponent):
+    fields = (('dx', 'f8'), ('dy', 'f8'))
+
+
+class Mass(ColumnarComponent):
+    fields = (('kg', 'f8'),)
+
+
+class Integration(ProcessSystem):
+    reads = (Speed,)
+    writes = (Point,)
+
+    @staticmethod
+    def kernel(columns, dt):
+        columns[Point]['x'] += columns[Speed]['dx'] * dt
+        columns[Point]['y'] += columns[Speed]['dy'] * dt
+
+
+class Growth(ProcessSystem):
+    reads = ()
+    writes = (Mass,)
+
+    @staticmethod
+    def kernel(columns, dt):
+        columns[Mass]['kg'] *= 2
+
+
+class Process(ColumnarComponent):
+    fields = (('pid', 'i8'),)
+
+
+class ProcessIdentification(ProcessSystem):
+    reads = ()
+    writes = (Process,)
+
+    @staticmethod
+    def kernel(columns, dt):
+        columns[Process]['pid'][:] = os.getpid()
+
+
+class Drag(ProcessSystem):
+    reads = (Process,)
+    writes = (Point,)
+
+    @staticmethod
+    def kernel(columns, dt):
+        columns[Point]['x'] -= columns[Process]['pid'] + dt
+
+
+class ReadOnlyViolation(ProcessSystem):
+    reads = (Speed,)
+    writes = ()
+
+    @staticmethod
+    def kernel(columns, dt):
+        columns[Speed]['dx'][:] = 0
+
+
+@requires_futures
+@pytest.mark.skipif(
+    SharedMemory is None, reason='requires multiprocessing.shared_memory')
+class TestProcessSystem(object):
+    @fixture
+    def entity_manager(self):
+        pytest.importorskip('numpy')
+        entity_manager = EntityManager()
+        for i in range(100):
+            entity = entity_manager.create_entity()
+            entity_manager.add_component(entity, Point(i, -i))
+            entity_manager.add_component(entity, Speed(1, 2))
+            entity_manager.add_component(entity, Mass(i))
+        return entity_manager
+
+    @fixture
+    def manager(self, request, entity_manager):
+        manager = ParallelSystemManager(entity_manager, max_processes=2)
+        request.addfinalizer(manager.shutdown)
+        for system in (Integration(), Growth()):
+            manager.add_system(system)
+        return manager
+
+    def check_updated(self, entity_manager):
+        for entity, point, mass in entity_manager.query(Point, Mass):
+            assert point.x == entity.index + 0.5
+            assert point.y == -entity.index + 1
+            assert mass.kg == 2 * entity.index
+
+    def test_same_stage(self, manager):
+        assert len(manager.stages) == 1
+
+    def test_update_in_worker_processes(self, manager, entity_manager):
+        manager.update(0.5)
+        assert entity_manager.columns(Point).shared
+        assert entity_manager.columns(Mass).shared
+        self.check_updated(entity_manager)
+
+    def test_columns_grow_between_frames(self, manager, entity_manager):
+        manager.update(0)
+        for _ in range(200):
+            entity = entity_manager.create_entity()
+            entity_manager.add_component(entity, Point(0, 0))
+            entity_manager.add_component(entity, Speed(1, 1))
+            entity_manager.add_component(entity, Mass(1))
+        manager.update(1)
+        assert list(entity_manager.columns(Mass).column('kg')[-200:]) == (
+            [2] * 200)
+        assert list(entity_manager.columns(Point).column('x')[-200:]) == (
+            [1] * 200)
+
+    def test_single_system_stage_runs_in_worker_process(
+            self, request, entity_manager):
+        for entity in list(entity_manager.database[Point]):
+            entity_manager.add_component(entity, Process())
+        manager = ParallelSystemManager(entity_manager, max_processes=1)
+        request.addfinalizer(manager.shutdown)
+        manager.add_system(ProcessIdentification())
+        assert len(manager.stages) == 1
+        manager.update(0)
+        pids = set(entity_manager.columns(Process).column('pid'))
+        assert len(pids) == 1
+        assert pids.pop() not in (0, os.getpid())
+
+    def test_type_without_components(self, request, entity_manager):
+        manager = ParallelSystemManager(entity_manager, max_processes=1)
+        request.addfinalizer(manager.shutdown)
+        manager.add_system(Drag())
+        manager.update(1)
+        assert list(entity_manager.columns(Point).column('x')) == [
+            i - 1 for i in range(100)]
+
+    def test_kernel_is_required(self):
+        class NoKernel(ProcessSystem):
+            writes = (Point,)
+        with raises(TypeError):
+            NoKernel()
+
+    def test_update_in_calling_process(self, entity_manager):
+        manager = SystemManager(entity_manager)
+        manager.add_system(Integration())
+        manager.add_system(Growth())
+        manager.update(0.5)
+        assert not entity_manager.columns(Point).shared
+        self.check_updated(entity_manager)
+
+    def test_read_only_columns(self, entity_manager):
+        manager = SystemManager(entity_manager)
+        manager.add_system(ReadOnlyViolation())
+        with raises(ValueError):
+            manager.update(0)
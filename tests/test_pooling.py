@@ -0,0 +1,101 @@
+from pytest import fixture, raises
+
+from ecs.managers import EntityManager
+from ecs.archetypes import ArchetypeEntityManager
+from ecs.models import Component
+from ecs.pooling import ComponentPool, pooled
+
+
+@pooled(capacity=2)
+class Projectile(Component):
+    __slots__ = ('speed',)
+
+    def __init__(self, speed=0):
+        self.speed = speed
+
+
+class Rocket(Projectile):
+    pass
+
+
+class TestComponentPool(object):
+    @fixture
+    def pool(self):
+        return ComponentPool(Projectile, 2)
+
+    def test_acquire_new(self, pool):
+        projectile = pool.acquire(speed=3)
+        assert isinstance(projectile, Projectile)
+        assert projectile.speed == 3
+
+    def test_acquire_recycled(self, pool):
+        projectile = Projectile(1)
+        pool.release(projectile)
+        assert len(pool) == 1
+        assert pool.acquire(5) is projectile
+        assert projectile.speed == 5
+        assert len(pool) == 0
+
+    def test_capacity(self, pool):
+        for _ in range(3):
+            pool.release(Projectile())
+        assert len(pool) == 2
+
+    def test_other_types_are_not_kept(self, pool):
+        pool.release(Rocket())
+        assert len(pool) == 0
+
+    def test_clear(self, pool):
+        pool.release(Projectile())
+        pool.clear()
+        assert len(pool) == 0
+
+
+class TestEntityManagerPooling(object):
+    @fixture(params=[EntityManager, ArchetypeEntityManager])
+    def manager(self, request):
+        Projectile.pool.clear()
+        return request.param()
+
+    def test_removed_components_are_recycled(self, manager):
+        entities = manager.create_entities(3)
+        projectiles = [Projectile.pool.acquire(i) for i in range(3)]
+        for entity, projectile in zip(entities, projectiles):
+            manager.add_component(entity, projectile)
+        manager.remove_component(entities[0], Projectile)
+        manager.remove_entity(entities[1])
+        manager.add_component(entities[2], Projectile())
+        assert len(Projectile.pool) == 2
+        assert Projectile.pool.acquire() in projectiles
+
+    def test_readded_component_is_kept(self, manager):
+        entity = manager.create_entity()
+        projectile = Projectile()
+        manager.add_component(entity, projectile)
+        manager.add_component(entity, projectile)
+        assert len(Projectile.pool) == 0
+
+    def test_subclass_is_not_pooled(self, manager):
+        entity = manager.create_entity()
+        manager.add_component(entity, Rocket())
+        manager.remove_entity(entity)
+        assert len(Projectile.pool) == 0
+        assert Rocket not in manager._remove_hooks
+
+    def test_failed_bulk_replacement_is_not_recycled(self, manager):
+        entity = manager.create_entity()
+        projectile = Projectile(1)
+        manager.add_component(entity, projectile)
+        with raises(ValueError):
+            manager.add_components_bulk(
+                Projectile, [entity], [Projectile(2), Projectile(3)])
+        assert manager.component_for_entity(entity, Projectile) is projectile
+        assert len(Projectile.pool) == 0
+
+    def test_bulk_replacement_is_recycled(self, manager):
+        entity = manager.create_entity()
+        projectile = Projectile(1)
+        manager.add_component(entity, projectile)
+        manager.add_components_bulk(Projectile, [entity], [Projectile(2)])
+        assert manager.component_for_entity(entity, Projectile).speed == 2
+        assert Projectile.pool.acquire() is projectile
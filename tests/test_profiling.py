@@ -0,0 +1,106 @@
+from pytest import fixture
+
+from ecs.managers import EntityManager, SystemManager
+from ecs.models import System
+from ecs.profiling import Profiler, RollingTimings
+
+
+class Physics(System):
+    def __init__(self):
+        super(Physics, self).__init__()
+        self.calls = []
+
+    def update(self, dt):
+        self.calls.append(dt)
+
+
+class Render(Physics):
+    pass
+
+
+class TestRollingTimings(object):
+    @fixture
+    def timings(self):
+        timings = RollingTimings(100)
+        for i in range(1, 101):
+            timings.record(float(i))
+        return timings
+
+    def test_percentiles(self, timings):
+        assert timings.percentile(50) == 50
+        assert timings.percentile(95) == 95
+        assert timings.percentile(99) == 99
+        assert timings.percentile(0) == 1
+        assert timings.max == 100
+
+    def test_window(self, timings):
+        timings.record(0.5)
+        assert len(timings) == 100
+        assert timings.percentile(0) == 0.5
+        assert timings.last == 0.5
+
+    def test_empty(self):
+        timings = RollingTimings(10)
+        assert timings.summary() == {
+            'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+
+class TestSystemManagerProfiling(object):
+    @fixture
+    def manager(self):
+        manager = SystemManager(EntityManager())
+        manager.add_system(Physics())
+        return manager
+
+    def test_disabled_by_default(self, manager):
+        assert manager.profiler is None
+        assert 'update' not in vars(manager)
+        assert 'update' not in vars(manager.systems[0])
+
+    def test_records_frames_and_systems(self, manager):
+        profiler = manager.enable_profiling()
+        assert isinstance(profiler, Profiler)
+        for _ in range(3):
+            manager.update(0.5)
+        assert manager.systems[0].calls == [0.5] * 3
+        assert profiler.frames == 3
+        assert len(profiler.frame.wall) == 3
+        assert len(profiler.systems[Physics].cpu) == 3
+        summary = profiler.summary()
+        assert summary['frames'] == 3
+        assert summary['systems']['Physics']['wall']['count'] == 3
+        assert summary['frame']['wall']['max'] >= 0
+
+    def test_enable_twice(self, manager):
+        assert manager.enable_profiling() is manager.enable_profiling()
+
+    def test_disable_restores_methods(self, manager):
+        profiler = manager.enable_profiling()
+        manager.disable_profiling()
+        assert manager.profiler is None
+        assert 'update' not in vars(manager)
+        assert 'update' not in vars(manager.systems[0])
+        manager.update(0.5)
+        assert profiler.frames == 0
+        assert manager.systems[0].calls == [0.5]
+
+    def test_systems_added_and_removed_while_enabled(self, manager):
+        profiler = manager.enable_profiling()
+        render = Render()
+        manager.add_system(render)
+        manager.update(0.5)
+        assert len(profiler.systems[Render].wall) == 1
+        manager.remove_system(Render)
+        assert 'update' not in vars(render)
+        manager.update(0.5)
+        assert len(profiler.systems[Render].wall) == 1
+        assert len(profiler.systems[Physics].wall) == 2
+
+    def test_report(self, manager):
+        reports = []
+        manager.enable_profiling(
+            window=10, report=lambda profiler: reports.append(
+                profiler.frames), report_interval=4)
+        for _ in range(9):
+            manager.update(0.5)
+        assert reports == [4, 8]
@@ -0,0 +1,146 @@
+from pytest import fixture, raises
+
+from ecs.managers import EntityManager
+from ecs.models import Component, slotted
+from ecs.replication import (
+    ReplicationClient, ReplicationSchema, ReplicationServer)
+
+
+@slotted
+class Position(Component):
+    __fields__ = ('x', 'y')
+    x = 0.0
+    y = 0.0
+
+
+@slotted
+class Health(Component):
+    __fields__ = ('points', 'alive')
+    points = 100
+    alive = True
+
+
+class Secret(Component):
+    pass
+
+
+@fixture
+def schema():
+    schema = ReplicationSchema()
+    schema.register(Position, precision={'x': 0.01, 'y': 0.01})
+    schema.register(Health)
+    return schema
+
+
+class TestReplicationSchema(object):
+    def test_fields_of_plain_type_must_be_given(self, schema):
+        with raises(ValueError):
+            schema.register(Secret)
+
+    def test_duplicate(self, schema):
+        with raises(ValueError):
+            schema.register(Health)
+
+    def test_unknown_precision_field(self):
+        with raises(ValueError):
+            ReplicationSchema().register(Position, precision={'z': 1})
+
+
+class TestReplication(object):
+    @fixture
+    def world(self):
+        world = EntityManager()
+        for i in range(20):
+            entity = world.create_entity()
+            world.add_component(entity, Position(i * 1.5, -i))
+            if i % 2:
+                world.add_component(entity, Health(i))
+            world.add_component(entity, Secret())
+        return world
+
+    @fixture
+    def server(self, world, schema):
+        server = ReplicationServer(world, schema)
+        server.add_client('a')
+        return server
+
+    @fixture
+    def client(self, schema):
+        return ReplicationClient(EntityManager(), schema)
+
+    def sync(self, server, client):
+        # Loopback transport: messages are delivered in order.
+        message = server.encode('a')
+        client.apply(message)
+        return message
+
+    def assert_replicated(self, world, client):
+        for component_type in (Position, Health):
+            expected = dict(
+                (hash(entity), component) for entity, component
+                in world.pairs_for_type(component_type))
+            actual = dict(
+                (guid, client.entity_manager.component_for_entity(
+                    client.entity(guid), component_type))
+                for guid in expected)
+            assert len(list(client.entity_manager.pairs_for_type(
+                component_type))) == len(expected)
+            for guid, component in expected.items():
+                for name, _ in component_type.field_defaults:
+                    assert abs(getattr(actual[guid], name) -
+                               getattr(component, name)) < 0.01
+        assert list(client.entity_manager.pairs_for_type(Secret)) == []
+
+    def test_initial_state(self, world, server, client):
+        self.sync(server, client)
+        self.assert_replicated(world, client)
+
+    def test_no_changes(self, server, client):
+        self.sync(server, client)
+        assert self.sync(server, client) == b'\0\0'
+
+    def test_changes(self, world, server, client):
+        self.sync(server, client)
+        entities = [entity for entity, _ in world.pairs_for_type(Position)]
+        world.modify_component(entities[0], Position).x += 0.5
+        world.add_component(entities[1], Health(5, False))
+        world.remove_component(entities[3], Health)
+        world.remove_entity(entities[4])
+        spawned = world.create_entity()
+        world.add_component(spawned, Health(7))
+        message = self.sync(server, client)
+        self.assert_replicated(world, client)
+        assert len(message) < 40
+
+    def test_unchanged_fields_are_not_sent(self, world, server, client):
+        self.sync(server, client)
+        entity = next(iter(world.pairs_for_type(Position)))[0]
+        world.modify_component(entity, Position).x += 0.001
+        assert self.sync(server, client) == b'\0\0'
+        world.modify_component(entity, Position).y += 1
+        assert len(self.sync(server, client)) == 9
+
+    def test_entity_losing_and_regaining_components(
+            self, world, server, client):
+        self.sync(server, client)
+        entity = next(iter(world.pairs_for_type(Position)))[0]
+        local = client.entity(hash(entity))
+        world.remove_component(entity, Position)
+        world.add_component(entity, Health(1))
+        self.sync(server, client)
+        assert client.entity(hash(entity)) == local
+        self.assert_replicated(world, client)
+
+    def test_clients_have_their_own_baseline(self, world, server, schema):
+        self.sync(server, ReplicationClient(EntityManager(), schema))
+        late = ReplicationClient(EntityManager(), schema)
+        server.add_client('b')
+        late.apply(server.encode('b'))
+        self.assert_replicated(world, late)
+        assert server.tick == world.change_tick
+
+    def test_integer_field_without_precision(self, world, server):
+        entity = world.create_entity()
+        world.add_component(entity, Health(1.5))
+        with raises(ValueError):
+            server.encode('a')
@@ -0,0 +1,225 @@
+from pytest import fixture, raises
+import pytest
+
+from ecs.archetypes import ArchetypeEntityManager
+from ecs.managers import EntityManager, SystemManager
+from ecs.models import Component, System
+from ecs.parallel import ParallelSystemManager, ThreadPoolExecutor
+from ecs.scheduling import FixedStep, Interval, SlicedSystem
+
+
+class Position(Component):
+    def __init__(self, x=0):
+        self.x = x
+
+
+class Path(Component):
+    pass
+
+
+def make_system(name):
+    def update(self, dt):
+        self.calls.append((self.system_manager.frame_number, dt))
+    system = type(name, (System,), {
+        'reads': (), 'writes': (), 'update': update})()
+    system.calls = []
+    return system
+
+
+def close(a, b):
+    return abs(a - b) < 1e-9
+
+
+class TestFixedStep(object):
+    def test_accumulates(self):
+        schedule = FixedStep(0.25)
+        assert schedule.plan(0.1) == ()
+        assert schedule.plan(0.2) == (0.25,)
+        assert close(schedule.alpha, 0.2)
+        assert schedule.plan(0.5) == (0.25, 0.25)
+        assert close(schedule.accumulator, 0.05)
+
+    def test_drops_excess_steps(self):
+        schedule = FixedStep(0.1, max_steps=3)
+        assert schedule.plan(1.05) == (0.1, 0.1, 0.1)
+        assert close(schedule.accumulator, 0.05)
+
+    def test_invalid(self):
+        with raises(ValueError):
+            FixedStep(0)
+        with raises(ValueError):
+            FixedStep(0.1, max_steps=0)
+
+
+class TestInterval(object):
+    def test_runs_every_nth_frame(self):
+        schedule = Interval(3, phase=1)
+        assert [schedule.plan(1.0) for _ in range(7)] == [
+            (), (2.0,), (), (), (3.0,), (), ()]
+
+    def test_phase_relative_to_frame(self):
+        schedule = Interval(3, phase=1, frame=5)
+        assert [schedule.plan(1.0) for _ in range(3)] == [(), (), (3.0,)]
+
+    def test_invalid(self):
+        with raises(ValueError):
+            Interval(0)
+        with raises(ValueError):
+            Interval(2, phase=2)
+
+
+@pytest.fixture(params=[SystemManager, ParallelSystemManager])
+def manager(request):
+    if request.param is ParallelSystemManager:
+        if ThreadPoolExecutor is None:
+            pytest.skip('requires concurrent.futures')
+    manager = request.param(EntityManager())
+    if isinstance(manager, ParallelSystemManager):
+        request.addfinalizer(manager.shutdown)
+    manager.frame_number = 0
+    update = manager.update
+
+    def counted_update(dt):
+        update(dt)
+        manager.frame_number += 1
+    manager.counted_update = counted_update
+    return manager
+
+
+class TestSystemManager(object):
+    def test_fixed_step(self, manager):
+        system = make_system('Physics')
+        manager.add_system(system, fixed_step=0.1, max_steps=2)
+        for dt in (0.05, 0.1, 0.5):
+            manager.counted_update(dt)
+        assert [dt for _, dt in system.calls] == [0.1, 0.1, 0.1]
+        assert [frame for frame, _ in system.calls] == [1, 2, 2]
+        assert close(manager.schedule(type(system)).alpha, 0.5)
+
+    def test_interval_gets_elapsed_time(self, manager):
+        system = make_system('AI')
+        manager.add_system(system, interval=2)
+        for _ in range(4):
+            manager.counted_update(0.5)
+        assert system.calls == [(0, 0.5), (2, 1.0)]
+
+    def test_intervals_spread(self, manager):
+        systems = [make_system('AI' + str(i)) for i in range(4)]
+        for system in systems[:3]:
+            manager.add_system(system, interval=2)
+        manager.counted_update(1.0)
+        manager.add_system(systems[3], interval=2)
+        for _ in range(4):
+            manager.counted_update(1.0)
+        frames = [[frame for frame, _ in system.calls] for system in systems]
+        assert frames == [[0, 2, 4], [1, 3], [0, 2, 4], [1, 3]]
+
+    def test_unscheduled_systems_run_every_frame(self, manager):
+        system = make_system('Render')
+        manager.add_system(system)
+        manager.add_system(make_system('AI'), interval=3)
+        manager.counted_update(1.0)
+        manager.counted_update(1.0)
+        assert system.calls == [(0, 1.0), (1, 1.0)]
+        assert manager.schedule(type(system)) is None
+
+    def test_removed_schedule(self, manager):
+        system = make_system('AI')
+        manager.add_system(system, interval=3)
+        manager.remove_system(type(system))
+        assert manager._schedules == {}
+
+    def test_exclusive_rates(self, manager):
+        system = make_system('AI')
+        with raises(ValueError):
+            manager.add_system(system, fixed_step=0.1, interval=2)
+        with raises(ValueError):
+            manager.add_system(system, interval=0)
+        assert system.system_manager is None
+
+
+class Pathfinding(SlicedSystem):
+    component_types = (Position, Path)
+    budget = 0.002
+    check_interval = 2
+
+    def __init__(self, clock):
+        super(Pathfinding, self).__init__()
+        self.clock = clock
+        self.processed = []
+        self.passes = 0
+
+    def process(self, dt, entity, position, path):
+        assert isinstance(path, Path)
+        self.processed.append((entity, position.x))
+        self.clock.now += 0.0005
+
+    def end_pass(self, dt):
+        self.passes += 1
+
+
+class Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSlicedSystem(object):
+    @fixture(params=[EntityManager, ArchetypeEntityManager])
+    def entity_manager(self, request):
+        return request.param()
+
+    @fixture
+    def entities(self, entity_manager):
+        entities = []
+        for i in range(7):
+            entity = entity_manager.create_entity()
+            entity_manager.add_component(entity, Position(i))
+            entity_manager.add_component(entity, Path())
+            entities.append(entity)
+        entity_manager.add_component(entity_manager.create_entity(), Path())
+        return entities
+
+    @fixture
+    def system(self, entity_manager, entities, monkeypatch):
+        clock = Clock()
+        monkeypatch.setattr('ecs.scheduling._clock', clock)
+        system = Pathfinding(clock)
+        SystemManager(entity_manager).add_system(system)
+        return system
+
+    def test_resumes_across_frames(self, system, entities):
+        system.update(0.1)
+        assert len(system.processed) == 4
+        assert close(system.progress, 4.0 / 7)
+        system.update(0.1)
+        assert set(system.processed) == set(
+            (entity, i) for i, entity in enumerate(entities))
+        assert len(system.processed) == 7
+        assert system.passes == 1
+        assert system.progress == 0.0
+
+    def test_processes_at_least_a_batch(self, system):
+        system.budget = 0
+        system.update(0.1)
+        assert len(system.processed) == 2
+
+    def test_changes_during_pass(self, system, entity_manager, entities):
+        system.update(0.1)
+        done = set(entity for entity, _ in system.processed)
+        remaining = [entity for entity in entities if entity not in done]
+        entity_manager.remove_entity(remaining[0])
+        entity_manager.remove_component(remaining[1], Path)
+        entity_manager.add_component(remaining[2], Position(42))
+        added = entity_manager.create_entity()
+        entity_manager.add_component(added, Position(8))
+        entity_manager.add_component(added, Path())
+        system.update(0.1)
+        assert len(system.processed) == 5
+        assert (remaining[2], 42) in system.processed
+        assert system.passes == 1
+        system.update(0.1)
+        system.update(0.1)
+        assert (added, 8) in system.processed
+        assert system.passes == 2
@@ -0,0 +1,212 @@
+from pytest import fixture, raises
+import pytest
+
+from ecs.archetypes import ArchetypeEntityManager
+from ecs.columns import ColumnarComponent
+from ecs.managers import EntityManager
+from ecs.models import Component, slotted
+
+numpy = pytest.importorskip('numpy')
+
+from ecs.snapshots import (  # NOQA
+    DeltaRecorder, Snapshot, apply_delta, rebuild, save_snapshot)
+
+
+class Position(ColumnarComponent):
+    fields = (('x', 'f8'), ('y', 'f8'))
+
+
+@slotted
+class Health(Component):
+    __fields__ = ('points', 'name', 'tags')
+    points = 100
+    name = ''
+    tags = ()
+
+
+class Inventory(Component):
+    def __init__(self, items):
+        self.items = items
+
+    def __eq__(self, other):
+        return self.items == other.items
+
+
+@fixture(params=[EntityManager, ArchetypeEntityManager])
+def manager_type(request):
+    return request.param
+
+
+@fixture
+def world(manager_type):
+    manager = manager_type()
+    entities = manager.create_entities(10)
+    manager.remove_entity(entities[3])
+    del entities[3]
+    for i, entity in enumerate(entities):
+        manager.add_component(entity, Position(i, -i))
+        if i % 2:
+            manager.add_component(
+                entity, Health(i, 'unit{0}'.format(i), (i,)))
+        if i % 3 == 0:
+            manager.add_component(entity, Inventory(['sword'] * i))
+    return manager
+
+
+@fixture
+def path(tmpdir):
+    return str(tmpdir.join('world.snap'))
+
+
+def assert_same_world(restored, manager):
+    assert restored.create_entity() == manager.create_entity()
+    for component_type in (Health, Inventory):
+        assert (dict(restored.pairs_for_type(component_type)) ==
+                dict(manager.pairs_for_type(component_type)))
+    for name in ('x', 'y'):
+        assert numpy.array_equal(restored.columns(Position).column(name),
+                                 manager.columns(Position).column(name))
+
+
+class TestSnapshot(object):
+    def test_restore(self, world, path, manager_type):
+        save_snapshot(world, path)
+        with Snapshot(path) as snapshot:
+            restored = snapshot.restore(manager_type())
+        assert_same_world(restored, world)
+
+    def test_component_types(self, world, path):
+        save_snapshot(world, path)
+        with Snapshot(path) as snapshot:
+            assert set(snapshot.component_types) == set(
+                [Position, Health, Inventory])
+
+    def test_lazy_decoding(self, world, path):
+        save_snapshot(world, path)
+        with Snapshot(path) as snapshot:
+            restored = snapshot.restore(component_types=[Health])
+            assert snapshot._tables == {}
+            table = snapshot.table(Inventory)
+            assert list(snapshot._tables) == [Inventory]
+        assert list(restored.pairs_for_type(Position)) == []
+        assert len(list(restored.pairs_for_type(Health))) == 4
+        assert table == dict(world.pairs_for_type(Inventory))
+
+    def test_columns_are_mapped(self, world, path):
+        save_snapshot(world, path)
+        snapshot = Snapshot(path)
+        columns = snapshot.columns(Health)
+        assert sorted(columns['points'].tolist()) == [1, 3, 5, 7]
+        assert sorted(columns['tags']) == [(1,), (3,), (5,), (7,)]
+        assert not columns['points'].flags.writeable
+        del columns
+        snapshot.close()
+
+    def test_columns_of_pickled_type(self, world, path):
+        save_snapshot(world, path)
+        with Snapshot(path) as snapshot:
+            with raises(TypeError):
+                snapshot.columns(Inventory)
+
+    def test_restore_into_used_manager(self, world, path):
+        save_snapshot(world, path)
+        with Snapshot(path) as snapshot:
+            with raises(ValueError):
+                snapshot.restore(world)
+
+    def test_not_a_snapshot(self, path):
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with raises(ValueError):
+            Snapshot(path)
+
+    def test_empty_world(self, path):
+        save_snapshot(EntityManager(), path)
+        with Snapshot(path) as snapshot:
+            restored = snapshot.restore()
+        assert restored.database == {}
+        assert restored.create_entity().index == 0
+
+
+class TestDeltas(object):
+    @fixture
+    def recorder(self, world, path):
+        save_snapshot(world, path)
+        return DeltaRecorder(world, [Position, Health, Inventory])
+
+    def step(self, world, frame):
+        entities = [entity for entity, _ in world.pairs_for_type(Position)]
+        world.remove_entity(entities[frame])
+        spawned = world.create_entity()
+        world.add_component(spawned, Position(100 + frame, 0))
+        world.add_component(spawned, Health(frame, 'spawned', ()))
+        healthy = [entity for entity, _ in world.pairs_for_type(Health)]
+        world.modify_component(healthy[0], Health).points += 10
+        world.add_component(entities[-2], Inventory(['shield'] * frame))
+
+    def test_rebuild_every_frame(self, world, path, recorder,
+                                 manager_type):
+        states = []
+        deltas = []
+        for frame in range(3):
+            self.step(world, frame)
+            deltas.append(recorder.record())
+            save_snapshot(world, path + str(frame))
+            states.append(path + str(frame))
+        with Snapshot(path) as base:
+            for frame, state in enumerate(states):
+                rebuilt = rebuild(base, deltas[:frame + 1], manager_type())
+                with Snapshot(state) as snapshot:
+                    assert_same_world(rebuilt, snapshot.restore())
+
+    def test_delta_only_holds_changes(self, world, recorder):
+        entity = world.create_entity()
+        world.add_component(entity, Health(1, 'new', ()))
+        delta = recorder.record()
+        assert len(delta) < 1024
+        assert len(recorder.record()) < len(delta)
+
+    def test_destroyed_entities_lose_unrecorded_components(
+            self, world, path, manager_type):
+        save_snapshot(world, path)
+        recorder = DeltaRecorder(world, [Health])
+        entity = next(iter(world.pairs_for_type(Inventory)))[0]
+        world.remove_entity(entity)
+        with Snapshot(path) as base:
+            rebuilt = rebuild(base, [recorder.record()], manager_type())
+        assert not rebuilt.is_alive(entity)
+        assert (dict(rebuilt.pairs_for_type(Inventory)) ==
+                dict(world.pairs_for_type(Inventory)))
+
+    def test_free_indices_follow_frames(self, world, path, recorder,
+                                        manager_type):
+        deltas = []
+        for frame in range(4):
+            for entity in world.create_entities(frame):
+                world.add_component(entity, Health(frame, '', ()))
+            healthy = [entity for entity, _ in world.pairs_for_type(Health)]
+            for entity in healthy[:3 - frame]:
+                world.remove_entity(entity)
+            deltas.append(recorder.record())
+        with Snapshot(path) as base:
+            rebuilt = rebuild(base, deltas, manager_type())
+        assert list(rebuilt._free_indices) == list(world._free_indices)
+        assert rebuilt._generations == world._generations
+        assert_same_world(rebuilt, world)
+
+    def test_free_indices_not_rewritten(self, world, recorder):
+        for entity in world.create_entities(5000):
+            world.remove_entity(entity)
+        recorder.record()
+        assert len(recorder.record()) < 1024
+
+    def test_unmarked_changes_are_not_recorded(self, world, path, recorder):
+        entity, health = next(iter(world.pairs_for_type(Health)))
+        health.points = -1
+        with Snapshot(path) as base:
+            rebuilt = rebuild(base, [recorder.record()])
+        assert rebuilt.component_for_entity(entity, Health).points != -1
+
+    def test_not_a_delta(self, world, path):
+        with raises(ValueError):
+            apply_delta(world, b'ECSSNAP1' + b'\0' * 16)
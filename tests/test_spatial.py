@@ -0,0 +1,178 @@
+import math
+import random
+
+from pytest import fixture, raises
+
+from ecs.archetypes import ArchetypeEntityManager
+from ecs.managers import EntityManager
+from ecs.models import Component
+
+
+class Position(Component):
+    def __init__(self, x, y, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+def distance(a, b):
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+@fixture(params=[EntityManager, ArchetypeEntityManager])
+def entity_manager(request):
+    return request.param()
+
+
+@fixture
+def rng():
+    return random.Random(7)
+
+
+@fixture
+def positions(entity_manager, rng):
+    positions = {}
+    for _ in range(300):
+        position = (rng.uniform(-50, 50), rng.uniform(-50, 50))
+        entity = entity_manager.create_entity()
+        entity_manager.add_component(entity, Position(*position))
+        positions[entity] = position
+    return positions
+
+
+@fixture
+def index(entity_manager, positions):
+    return entity_manager.spatial_index(Position, cell_size=8.0)
+
+
+def test_existing_entities_indexed(index, positions):
+    assert len(index) == len(positions)
+    for entity, position in positions.items():
+        assert index.position(entity) == position
+
+
+def test_same_index_returned(entity_manager, index):
+    assert entity_manager.spatial_index(Position) is index
+
+
+def test_cell_size_required(entity_manager):
+    with raises(ValueError):
+        entity_manager.spatial_index(Position)
+
+
+def test_within_radius(index, positions, rng):
+    for _ in range(20):
+        center = (rng.uniform(-60, 60), rng.uniform(-60, 60))
+        radius = rng.uniform(0, 30)
+        assert set(index.within_radius(center, radius)) == set(
+            entity for entity, position in positions.items()
+            if distance(center, position) <= radius)
+
+
+def test_within_box(index, positions, rng):
+    for _ in range(20):
+        low = (rng.uniform(-60, 20), rng.uniform(-60, 20))
+        high = (low[0] + rng.uniform(0, 40), low[1] + rng.uniform(0, 100))
+        assert set(index.within_box(low, high)) == set(
+            entity for entity, (x, y) in positions.items()
+            if low[0] <= x <= high[0] and low[1] <= y <= high[1])
+
+
+def test_nearest(index, positions, rng):
+    for k in (1, 5, 50, 400):
+        point = (rng.uniform(-60, 60), rng.uniform(-60, 60))
+        expected = sorted(
+            positions, key=lambda entity: distance(point, positions[entity]))
+        assert index.nearest(point, k) == expected[:k]
+
+
+def test_nearest_max_distance(index, positions):
+    found = index.nearest((0, 0), k=1000, max_distance=10)
+    assert set(found) == set(
+        entity for entity, position in positions.items()
+        if distance((0, 0), position) <= 10)
+
+
+def test_nearest_empty(entity_manager):
+    index = entity_manager.spatial_index(Position, cell_size=1.0)
+    assert index.nearest((0, 0)) == []
+
+
+def test_moves_marked_changed(entity_manager, index, positions):
+    entity = next(iter(positions))
+    position = entity_manager.modify_component(entity, Position)
+    position.x, position.y = 1000.0, 1000.0
+    assert index.within_radius((1000, 1000), 1) == [entity]
+    assert index.nearest((999, 999)) == [entity]
+
+
+def test_unmarked_moves_ignored(entity_manager, index, positions):
+    entity = next(iter(positions))
+    entity_manager.component_for_entity(entity, Position).x = 1000.0
+    assert index.within_radius((1000, positions[entity][1]), 1) == []
+
+
+def test_replaced_component(entity_manager, index, positions):
+    entity = next(iter(positions))
+    entity_manager.add_component(entity, Position(-500, -500))
+    assert index.within_box((-501, -501), (-499, -499)) == [entity]
+    assert len(index) == len(positions)
+
+
+def test_added_and_removed(entity_manager, index, positions):
+    entity = entity_manager.create_entity()
+    entity_manager.add_component(entity, Position(500, 500))
+    assert index.nearest((501, 501)) == [entity]
+    entity_manager.remove_entity(entity)
+    removed = next(iter(positions))
+    entity_manager.remove_component(removed, Position)
+    assert entity not in index
+    assert removed not in index
+    assert len(index) == len(positions) - 1
+
+
+def test_remove_spatial_index(entity_manager, index):
+    entity_manager.remove_spatial_index(Position)
+    entity = entity_manager.create_entity()
+    entity_manager.add_component(entity, Position(0, 0))
+    assert entity not in index
+    assert entity_manager.spatial_index(Position, 2.0) is not index
+
+
+def test_three_dimensions(entity_manager, rng):
+    positions = {}
+    for _ in range(100):
+        position = tuple(rng.uniform(-20, 20) for _ in range(3))
+        entity = entity_manager.create_entity()
+        entity_manager.add_component(entity, Position(*position))
+        positions[entity] = position
+    index = entity_manager.spatial_index(
+        Position, cell_size=5.0, fields=('x', 'y', 'z'))
+    assert set(index.within_radius((0, 0, 0), 12)) == set(
+        entity for entity, position in positions.items()
+        if distance((0, 0, 0), position) <= 12)
+    expected = sorted(
+        positions, key=lambda entity: distance((3, 3, 3), positions[entity]))
+    assert index.nearest((3, 3, 3), 10) == expected[:10]
+
+
+def test_own_change_log_discarded(entity_manager, index):
+    for _ in range(1000):
+        entity = entity_manager.create_entity()
+        entity_manager.add_component(entity, Position(0, 0))
+        entity_manager.remove_entity(entity)
+        index.nearest((0, 0))
+    assert len(entity_manager._changes[Position]) == 0
+    entity_manager.remove_spatial_index(Position)
+    assert Position not in entity_manager._changes
+
+
+def test_shared_change_log_kept(entity_manager, index, positions):
+    entity_manager.track_changes(Position)
+    tick = entity_manager.change_tick
+    entity = next(iter(positions))
+    entity_manager.remove_entity(entity)
+    index.nearest((0, 0))
+    assert entity_manager.removed(Position, tick) == [entity]
+    entity_manager.remove_spatial_index(Position)
+    assert Position in entity_manager._changes
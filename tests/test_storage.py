@@ -0,0 +1,111 @@
+from pytest import fixture, raises
+
+from ecs.managers import EntityManager
+from ecs.models import Component, Entity
+from ecs.storage import SparseSet
+
+
+class Projectile(Component):
+    storage = SparseSet
+
+
+class TestSparseSet(object):
+    @fixture
+    def entities(self):
+        return [Entity(i) for i in range(5)]
+
+    @fixture
+    def table(self, entities):
+        table = SparseSet()
+        for i, entity in enumerate(entities):
+            table[entity] = i
+        return table
+
+    def test_getitem(self, table, entities):
+        assert table[entities[3]] == 3
+
+    def test_missing_entity(self, table):
+        with raises(KeyError):
+            table[Entity(10)]
+
+    def test_replace(self, table, entities):
+        table[entities[3]] = 'three'
+        assert table[entities[3]] == 'three'
+        assert len(table) == 5
+
+    def test_swap_remove(self, table, entities):
+        del table[entities[1]]
+        assert table.entities == [
+            entities[0], entities[4], entities[2], entities[3]]
+        assert table.components == [0, 4, 2, 3]
+        assert table[entities[4]] == 4
+        assert entities[1] not in table
+
+    def test_remove_last(self, table, entities):
+        del table[entities[4]]
+        assert table.entities == entities[:4]
+        assert table.components == [0, 1, 2, 3]
+
+    def test_items(self, table, entities):
+        assert list(table.items()) == list(zip(entities, range(5)))
+        assert len(table.items()) == 5
+        assert (entities[2], 2) in table.items()
+        assert list(table.items()) == list(table.items())
+
+    def test_iteritems(self, table, entities):
+        assert list(table.iteritems()) == list(zip(entities, range(5)))
+
+    def test_removal_during_iteration(self, table, entities):
+        with raises(RuntimeError):
+            for entity in table:
+                del table[entity]
+        with raises(RuntimeError):
+            for entity, _ in table.iteritems():
+                del table[entity]
+
+    def test_addition_during_iteration(self, table):
+        with raises(RuntimeError):
+            for entity, _ in table.items():
+                table[Entity(entity.index + 10)] = None
+
+    def test_replacement_during_iteration(self, table, entities):
+        for entity, component in table.items():
+            table[entity] = component * 2
+        assert table.components == [0, 2, 4, 6, 8]
+
+    def test_equals_dict(self, table, entities):
+        assert table == dict(zip(entities, range(5)))
+
+
+class TestEntityManagerSparseSet(object):
+    @fixture
+    def manager(self):
+        return EntityManager()
+
+    @fixture
+    def entities(self, manager):
+        return [manager.create_entity() for _ in range(5)]
+
+    @fixture
+    def projectiles(self, manager, entities):
+        projectiles = [Projectile() for _ in entities]
+        for entity, projectile in zip(entities, projectiles):
+            manager.add_component(entity, projectile)
+        return projectiles
+
+    def test_table_is_selected_by_component_type(self, manager, projectiles):
+        assert isinstance(manager.database[Projectile], SparseSet)
+
+    def test_pairs_for_type(self, manager, entities, projectiles):
+        manager.remove_entity(entities[0])
+        assert list(manager.pairs_for_type(Projectile)) == [
+            (entities[4], projectiles[4]),
+            (entities[1], projectiles[1]),
+            (entities[2], projectiles[2]),
+            (entities[3], projectiles[3])]
+
+    def test_remove_last_component_drops_table(
+            self, manager, entities, projectiles):
+        for entity in entities:
+            manager.remove_component(entity, Projectile)
+        assert Projectile not in manager.database